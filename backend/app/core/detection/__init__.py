@@ -4,12 +4,13 @@ Core duplicate detection engine module.
 
 from .engine import DuplicateDetectionEngine
 from .algorithms import DetectionAlgorithm
-from .models import DuplicateGroup, DuplicateFile, DetectionConfig, DetectionResults
+from .models import DetectionMode, DuplicateGroup, DuplicateFile, DetectionConfig, DetectionResults
 from .config import ConfigManager
 
 __all__ = [
     'DuplicateDetectionEngine',
     'DetectionAlgorithm', 
+    'DetectionMode',
     'DuplicateGroup',
     'DuplicateFile',
     'DetectionConfig',
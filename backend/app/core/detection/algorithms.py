@@ -3,7 +3,7 @@ Base classes and interfaces for detection algorithms.
 """
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 import time
 from .models import DuplicateGroup, DuplicateFile, DetectionConfig, AlgorithmPerformance
@@ -137,6 +137,9 @@ class AlgorithmRegistry:
     
     def __init__(self):
         self._algorithms: Dict[str, type] = {}
+        # Last instance per algorithm with the config object it was built for; algorithms keep
+        # a reference to that config, so reusing the instance for the same object stays current
+        self._instances: Dict[str, Tuple[DetectionConfig, DetectionAlgorithm]] = {}
         self.logger = logging.getLogger(self.__class__.__name__)
     
     def register(self, algorithm_class: type):
@@ -151,6 +154,7 @@ class AlgorithmRegistry:
         
         name = algorithm_class.__name__
         self._algorithms[name] = algorithm_class
+        self._instances.pop(name, None)
         self.logger.info(f"Registered algorithm: {name}")
     
     def get_algorithm(self, name: str, config: DetectionConfig) -> Optional[DetectionAlgorithm]:
@@ -162,18 +166,28 @@ class AlgorithmRegistry:
             config: Configuration for the algorithm
             
         Returns:
-            Algorithm instance or None if not found
+            Algorithm instance or None if not found; repeated calls with the same
+            config object return the same instance with its performance metrics reset
         """
+        cached = self._instances.get(name)
+        if cached is not None and cached[0] is config:
+            # Start each caller on fresh metrics; earlier callers keep the AlgorithmPerformance they read
+            cached[1].reset_performance_metrics()
+            return cached[1]
+        
         algorithm_class = self._algorithms.get(name)
         if not algorithm_class:
             self.logger.error(f"Algorithm not found: {name}")
             return None
         
         try:
-            return algorithm_class(config)
+            algorithm = algorithm_class(config)
         except Exception as e:
             self.logger.error(f"Failed to create algorithm {name}: {e}")
             return None
+        
+        self._instances[name] = (config, algorithm)
+        return algorithm
     
     def list_algorithms(self) -> List[str]:
         """Get list of registered algorithm names."""
@@ -241,12 +241,15 @@ class ResultsProcessor:
         self.logger.info(f"Consolidating {len(groups)} groups from algorithms")
         
         # Remove groups below confidence threshold
+        threshold = config.min_confidence_threshold
         filtered_groups = [
             group for group in groups 
-            if group.confidence_score >= config.min_confidence_threshold
+            if group.confidence_score >= threshold
         ]
         
         self.logger.info(f"After confidence filtering: {len(filtered_groups)} groups")
+        if not filtered_groups:
+            return []
         
         # Merge overlapping groups if cross-algorithm validation is enabled
         if config.enable_cross_algorithm_validation:
@@ -256,15 +259,13 @@ class ResultsProcessor:
         # Rank groups by confidence and evidence
         ranked_groups = self._rank_groups(filtered_groups)
         
-        # Suggest original files for each group
+        # Suggest original files for each group, then limit results per group
+        max_files = config.max_results_per_group
         for group in ranked_groups:
             self._suggest_original(group)
-        
-        # Limit results per group
-        for group in ranked_groups:
-            if len(group.files) > config.max_results_per_group:
+            if len(group.files) > max_files:
                 original_count = len(group.files)
-                group.files = group.files[:config.max_results_per_group]
+                group.files = group.files[:max_files]
                 self.logger.info(f"Limited group {group.id} from {original_count} to {len(group.files)} files")
         
         self.logger.info(f"Final consolidated results: {len(ranked_groups)} groups")
@@ -370,43 +371,33 @@ class ResultsProcessor:
         if not group.files:
             return
         
-        # Reset any existing original flags
-        for file in group.files:
-            file.is_original = False
-        
         # Scoring criteria (higher is better):
         # 1. Earliest creation/modification time (40% weight)
         # 2. Largest file size (30% weight)
         # 3. Best quality for images (20% weight)
         # 4. Path characteristics (10% weight)
         
-        best_file = None
-        best_score = float('-inf')
+        files = group.files
         
-        # Calculate min/max values for normalization
-        sizes = [f.file_size for f in group.files if f.file_size]
-        times = []
-        for f in group.files:
-            if f.created_at:
-                times.append(f.created_at.timestamp())
-            elif f.modified_at:
-                times.append(f.modified_at.timestamp())
+        # Resolve each file's timestamp once, then min/max values for normalization
+        file_times = [
+            f.created_at.timestamp() if f.created_at else
+            f.modified_at.timestamp() if f.modified_at else None
+            for f in files
+        ]
+        sizes = [f.file_size for f in files if f.file_size]
+        times = [t for t in file_times if t is not None]
         
         min_size = min(sizes) if sizes else 0
         max_size = max(sizes) if sizes else 0
         min_time = min(times) if times else 0
         max_time = max(times) if times else 0
         
-        for file in group.files:
+        scores = []
+        for file, file_time in zip(files, file_times):
             score = 0
             
             # Time score (earlier is better) - 40% weight
-            file_time = None
-            if file.created_at:
-                file_time = file.created_at.timestamp()
-            elif file.modified_at:
-                file_time = file.modified_at.timestamp()
-            
             if file_time and max_time > min_time:
                 # Normalize and invert (earlier = higher score)
                 time_score = 1.0 - (file_time - min_time) / (max_time - min_time)
@@ -428,27 +419,29 @@ class ResultsProcessor:
             path_score = self._calculate_path_score(file.file_path)
             score += path_score * 10
             
-            if score > best_score:
-                best_score = score
-                best_file = file
-        
-        # Mark the best file as original
-        if best_file:
-            best_file.is_original = True
-            best_file.detection_reasons.append("suggested_original")
-            
-            # Add specific reasons for why this file was chosen
-            reasons = []
-            if best_file.created_at or best_file.modified_at:
-                reasons.append("earliest_timestamp")
-            if best_file.file_size and best_file.file_size == max(f.file_size for f in group.files if f.file_size):
-                reasons.append("largest_size")
-            if best_file.width and best_file.height:
-                reasons.append("best_quality")
-            
-            best_file.detection_reasons.extend(reasons)
-            
-            self.logger.debug(f"Suggested original for group {group.id}: {best_file.file_name} (score: {best_score:.1f})")
+            scores.append(score)
+        
+        # First highest score wins; mark it and reset every other flag in one pass
+        best_index = max(range(len(files)), key=scores.__getitem__)
+        best_file = files[best_index]
+        best_score = scores[best_index]
+        for file in files:
+            file.is_original = file is best_file
+        
+        best_file.detection_reasons.append("suggested_original")
+        
+        # Add specific reasons for why this file was chosen
+        reasons = []
+        if best_file.created_at or best_file.modified_at:
+            reasons.append("earliest_timestamp")
+        if best_file.file_size and best_file.file_size == max_size:
+            reasons.append("largest_size")
+        if best_file.width and best_file.height:
+            reasons.append("best_quality")
+        
+        best_file.detection_reasons.extend(reasons)
+        
+        self.logger.debug(f"Suggested original for group {group.id}: {best_file.file_name} (score: {best_score:.1f})")
     
     def _calculate_path_score(self, file_path: str) -> float:
         """Calculate a score based on path characteristics."""
@@ -24,7 +24,7 @@ class DetectionMethod(Enum):
     ADVANCED_SIMILARITY = "advanced_similarity"
 
 
-@dataclass
+@dataclass(slots=True)
 class DetectionConfig:
     """Configuration for duplicate detection algorithms."""
     
@@ -81,7 +81,7 @@ class DetectionConfig:
         return errors
 
 
-@dataclass
+@dataclass(slots=True)
 class DuplicateFile:
     """Represents a file in a duplicate group."""
     
@@ -101,9 +101,20 @@ class DuplicateFile:
     confidence_score: float = 0.0
     detection_reasons: List[str] = field(default_factory=list)
     metadata: Dict[str, Any] = field(default_factory=dict)
+    
+    def __eq__(self, other):
+        """Files are the same file when they share a database id."""
+        if self is other:
+            return True
+        if not isinstance(other, DuplicateFile):
+            return NotImplemented
+        return self.file_id == other.file_id
+    
+    def __hash__(self):
+        return hash(self.file_id)
 
 
-@dataclass
+@dataclass(slots=True)
 class DuplicateGroup:
     """Represents a group of duplicate files."""
     
@@ -122,6 +133,17 @@ class DuplicateGroup:
         if len(self.files) < 2:
             raise ValueError("DuplicateGroup must contain at least two files")
     
+    def __eq__(self, other):
+        """Groups are the same group when they share an id."""
+        if self is other:
+            return True
+        if not isinstance(other, DuplicateGroup):
+            return NotImplemented
+        return self.id == other.id
+    
+    def __hash__(self):
+        return hash(self.id)
+    
     @property
     def file_count(self) -> int:
         """Number of files in the group."""
@@ -139,7 +161,7 @@ class DuplicateGroup:
         return originals[0] if originals else None
 
 
-@dataclass
+@dataclass(slots=True)
 class DetectionResults:
     """Results from a duplicate detection run."""
     
@@ -171,7 +193,7 @@ class DetectionResults:
         return self.total_duplicates_found / self.total_files_scanned * 100
 
 
-@dataclass
+@dataclass(slots=True)
 class AlgorithmPerformance:
     """Performance metrics for a detection algorithm."""
     
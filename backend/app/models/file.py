@@ -25,8 +25,9 @@ class File(Base):
     
     # Indexes for performance
     __table_args__ = (
-        Index('idx_files_sha256', 'sha256'),
-        Index('idx_files_perceptual_hash', 'perceptual_hash'),
+        Index('idx_files_sha256', 'sha256', sqlite_where=sha256.isnot(None)),
+        Index('idx_files_perceptual_hash', 'perceptual_hash', sqlite_where=perceptual_hash.isnot(None)),
+        Index('idx_files_size_sha256', 'file_size', 'sha256'),
         Index('idx_files_path', 'file_path'),
         Index('idx_files_type', 'file_type'),
     )
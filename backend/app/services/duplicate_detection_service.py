@@ -439,7 +439,7 @@ class DuplicateDetectionService:
                 # Store duplicate groups
                 for group in results.groups:
                     # Insert group
-                    conn.execute("""
+                    cursor = conn.execute("""
                         INSERT INTO duplicate_groups (
                             group_hash, duplicate_type, similarity_score,
                             detection_method, confidence_score, session_id,
@@ -455,7 +455,7 @@ class DuplicateDetectionService:
                         json.dumps(group.metadata)
                     ))
                     
-                    group_db_id = conn.lastrowid
+                    group_db_id = cursor.lastrowid
                     
                     # Insert group files
                     for file in group.files:
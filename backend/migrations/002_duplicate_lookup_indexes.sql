@@ -0,0 +1,19 @@
+-- Migration: Duplicate lookup indexes
+-- Version: 002
+-- Description: Index file size/hash lookups used by scanning and duplicate detection
+
+-- Rebuild hash indexes as partial indexes; rows without a hash never take part in lookups
+DROP INDEX IF EXISTS idx_files_sha256;
+CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files(sha256) WHERE sha256 IS NOT NULL;
+
+DROP INDEX IF EXISTS idx_files_perceptual_hash;
+CREATE INDEX IF NOT EXISTS idx_files_perceptual_hash ON files(perceptual_hash) WHERE perceptual_hash IS NOT NULL;
+
+-- Covers the size pre-check and size-then-hash duplicate lookups
+CREATE INDEX IF NOT EXISTS idx_files_size_sha256 ON files(file_size, sha256);
+
+ANALYZE files;
+
+-- Insert migration record
+INSERT OR IGNORE INTO schema_migrations (version, description, applied_at) 
+VALUES ('002', 'Duplicate lookup indexes', CURRENT_TIMESTAMP);
@@ -0,0 +1,11 @@
+-- Migration: Binary perceptual hashes
+-- Version: 003
+-- Description: Store perceptual hashes as raw bytes next to the hex text
+
+-- 256-bit average hashes do not fit a 64-bit INTEGER, so the bytes go in a BLOB.
+-- Existing rows are backfilled by the scanner on connect (SQLite < 3.41 has no unhex()).
+ALTER TABLE files ADD COLUMN perceptual_hash_bits BLOB;
+
+-- Insert migration record
+INSERT OR IGNORE INTO schema_migrations (version, description, applied_at) 
+VALUES ('003', 'Binary perceptual hashes', CURRENT_TIMESTAMP);
@@ -0,0 +1,10 @@
+-- Migration: Content hash algorithm
+-- Version: 004
+-- Description: Record which algorithm produced each file's content hash
+
+-- The sha256 column holds a BLAKE3 digest for large files scanned with --hash-algo blake3
+ALTER TABLE files ADD COLUMN hash_algo TEXT NOT NULL DEFAULT 'sha256';
+
+-- Insert migration record
+INSERT OR IGNORE INTO schema_migrations (version, description, applied_at) 
+VALUES ('004', 'Content hash algorithm', CURRENT_TIMESTAMP);
@@ -0,0 +1,10 @@
+-- Migration: Quick content fingerprint
+-- Version: 005
+-- Description: Store a digest of each file's leading bytes for --quick-hash scans
+
+-- Files whose size and fingerprint match no other file are stored without sha256
+ALTER TABLE files ADD COLUMN quick_fp INTEGER;
+
+-- Insert migration record
+INSERT OR IGNORE INTO schema_migrations (version, description, applied_at) 
+VALUES ('005', 'Quick content fingerprint', CURRENT_TIMESTAMP);
@@ -14,6 +14,8 @@ from pathlib import Path
 from typing import List, Dict, Any, Optional
 import argparse
 from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
 
 # Add backend to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
@@ -62,45 +64,30 @@ class DuplicatePreviewTool:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             
-            # Get duplicate groups
-            if mode == "exact":
-                # Find files with same SHA256
-                cursor.execute("""
-                    SELECT sha256, COUNT(*) as count, GROUP_CONCAT(id) as file_ids
-                    FROM files 
-                    WHERE sha256 IS NOT NULL 
-                    GROUP BY sha256 
-                    HAVING COUNT(*) > 1
-                    ORDER BY count DESC
-                """)
-            else:
-                # Find files with similar perceptual hashes
-                cursor.execute("""
-                    SELECT perceptual_hash, COUNT(*) as count, GROUP_CONCAT(id) as file_ids
+            # Exact mode groups files with the same SHA256, similar mode with the same perceptual hash
+            hash_column = "sha256" if mode == "exact" else "perceptual_hash"
+            
+            # Every file of every duplicate group in one pass; the window count replaces
+            # GROUP_CONCAT of ids and a second lookup per group
+            cursor.execute(f"""
+                WITH counted AS (
+                    SELECT {hash_column}, COUNT(*) OVER (PARTITION BY {hash_column}) AS count,
+                           id, file_path, file_name, file_size, file_type, width, height
                     FROM files 
-                    WHERE perceptual_hash IS NOT NULL 
-                    GROUP BY perceptual_hash 
-                    HAVING COUNT(*) > 1
-                    ORDER BY count DESC
-                """)
+                    WHERE {hash_column} IS NOT NULL
+                )
+                SELECT * FROM counted
+                WHERE count > 1
+                ORDER BY count DESC, {hash_column}, file_size ASC
+            """)
             
             groups = []
-            for row in cursor.fetchall():
-                hash_value, count, file_ids_str = row
-                file_ids = [int(fid) for fid in file_ids_str.split(',')]
-                
-                # Get file details
-                placeholders = ','.join(['?' for _ in file_ids])
-                cursor.execute(f"""
-                    SELECT id, file_path, file_name, file_size, file_type, width, height
-                    FROM files 
-                    WHERE id IN ({placeholders})
-                    ORDER BY file_size ASC
-                """, file_ids)
+            for hash_value, group_rows in groupby(cursor, key=itemgetter(0)):
+                file_rows = list(group_rows)
+                min_size = file_rows[0][5]  # Rows are ordered by size within a group
                 
                 files = []
-                for file_row in cursor.fetchall():
-                    file_id, file_path, file_name, file_size, file_type, width, height = file_row
+                for _, count, file_id, file_path, file_name, file_size, file_type, width, height in file_rows:
                     files.append({
                         "id": file_id,
                         "path": file_path,
@@ -109,9 +96,7 @@ class DuplicatePreviewTool:
                         "type": file_type,
                         "width": width,
                         "height": height,
-                        "is_original": file_size == min(f[3] for f in cursor.execute(
-                            f"SELECT file_size FROM files WHERE id IN ({placeholders})", file_ids
-                        ).fetchall())
+                        "is_original": file_size == min_size
                     })
                 
                 groups.append({
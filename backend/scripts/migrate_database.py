@@ -14,6 +14,22 @@ from pathlib import Path
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Pages copied per backup step; -1 copies the whole database in one step, which is already
+# faster than any batched loop and cannot be interleaved with writers
+BACKUP_PAGES = -1
+
+# Columns migrate_database adds to the files table
+MIGRATION_COLUMNS = (
+    ('width', 'INTEGER'),
+    ('height', 'INTEGER'),
+)
+
+def _table_columns(cursor, table_name):
+    """Column names of a table, empty if the table does not exist."""
+    # Only the name column, with the table bound as a parameter rather than formatted into SQL
+    cursor.execute("SELECT name FROM pragma_table_info(?)", (table_name,))
+    return frozenset(name for name, in cursor.fetchall())
+
 def check_column_exists(cursor, table_name, column_name):
     """
     Check if a column exists in the specified table.
@@ -27,10 +43,7 @@ def check_column_exists(cursor, table_name, column_name):
         bool: True if column exists, False otherwise
     """
     try:
-        cursor.execute(f"PRAGMA table_info({table_name})")
-        columns = cursor.fetchall()
-        column_names = [column[1] for column in columns]
-        return column_name in column_names
+        return column_name in _table_columns(cursor, table_name)
     except sqlite3.Error as e:
         logger.error(f"Error checking column existence: {e}")
         return False
@@ -39,6 +52,8 @@ def add_column_if_not_exists(cursor, table_name, column_name, column_type):
     """
     Add a column to a table if it doesn't already exist.
     
+    Kept for adding single columns; migrate_database adds all of its columns in one transaction.
+    
     Args:
         cursor: SQLite cursor object
         table_name: Name of the table
@@ -90,16 +105,23 @@ def migrate_database(db_path):
             logger.error("Files table not found in database")
             return False
         
-        # Add width column
-        if not add_column_if_not_exists(cursor, 'files', 'width', 'INTEGER'):
-            return False
-            
-        # Add height column
-        if not add_column_if_not_exists(cursor, 'files', 'height', 'INTEGER'):
-            return False
+        # Add the missing columns in one transaction, so there is a single commit
+        # and a failure leaves the table untouched; the columns are read once for all checks
+        existing = _table_columns(cursor, 'files')
+        missing = []
+        for name, column_type in MIGRATION_COLUMNS:
+            if name in existing:
+                logger.info(f"Column '{name}' already exists in table 'files', skipping")
+            else:
+                missing.append((name, column_type))
+        
+        if missing:
+            statements = "".join(f"ALTER TABLE files ADD COLUMN {name} {column_type};\n"
+                                 for name, column_type in missing)
+            cursor.executescript(f"BEGIN IMMEDIATE;\n{statements}COMMIT;")
+            for name, _ in missing:
+                logger.info(f"Successfully added column '{name}' to table 'files'")
         
-        # Commit changes
-        conn.commit()
         logger.info("Migration completed successfully")
         
         # Verify the changes
@@ -143,12 +165,14 @@ def backup_database(db_path):
         
         # Create backup using SQLite's backup API
         source_conn = sqlite3.connect(db_path)
-        backup_conn = sqlite3.connect(backup_path)
-        
-        source_conn.backup(backup_conn)
-        
-        source_conn.close()
-        backup_conn.close()
+        try:
+            backup_conn = sqlite3.connect(backup_path)
+            try:
+                source_conn.backup(backup_conn, pages=BACKUP_PAGES)
+            finally:
+                backup_conn.close()
+        finally:
+            source_conn.close()
         
         logger.info(f"Database backup created: {backup_path}")
         return backup_path
@@ -7,13 +7,18 @@ Scans directories, extracts metadata, computes hashes, and detects duplicates.
 import os
 import sys
 import hashlib
+import importlib
+import io
+import mmap
 import json
 import argparse
 import sqlite3
 import logging
+import time
 from datetime import datetime
-from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union, Any
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Union, Any
 
 # Add backend to path for imports
 sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
@@ -47,26 +52,83 @@ if not ENHANCED_DETECTION_AVAILABLE:
             self.config = config
             self.algorithm_performance = algorithm_performance or {}
 
+# Read size for file hashing; large sequential reads keep per-chunk interpreter overhead low
+HASH_CHUNK_SIZE = 1024 * 1024  # 1 MiB
+MMAP_MIN_SIZE = 16 * 1024 * 1024  # Hash files from 16 MiB up via mmap
+MMAP_MAX_SIZE = 1024 * 1024 * 1024  # 1 GiB
+PERCEPTUAL_HASH_SIZE = 16  # 16x16 average hash = 256 bits
+# Filter clauses for enhanced detection; each takes exactly one parameter so the
+# statement text only depends on which filters are set, never on their values
+DETECTION_FILTER_CLAUSES = (
+    ('file_types', " AND file_type IN (SELECT value FROM json_each(?))"),
+    ('min_size', " AND file_size >= ?"),
+    ('max_size', " AND file_size <= ?"),
+    ('path_pattern', " AND file_path LIKE ?"),
+)
+IMAGE_BUFFER_MAX_SIZE = 64 * 1024 * 1024  # Images up to 64 MiB are read once for all hashing
+BLAKE3_MIN_SIZE = 100 * 1024 * 1024  # With --hash-algo blake3, files above 100 MiB use multithreaded BLAKE3
+HASH_ALGORITHMS = ('sha256', 'blake3')
+QUICK_FINGERPRINT_SIZE = 64 * 1024  # With --quick-hash, leading bytes compared before any full hash
+INSERT_BATCH_SIZE = 1000  # Rows written per transaction during a scan
+PROGRESS_INTERVAL = 0.1  # Seconds between progress line rewrites when the percentage is unchanged
+BUSY_TIMEOUT = 5.0  # Seconds SQLite itself waits on a locked database before raising (busy_timeout=5000)
+CONNECT_ATTEMPTS = 5  # Reconnects with exponential backoff; each can also wait BUSY_TIMEOUT on a lock
+CONNECT_RETRY_DELAY = 0.01  # Seconds before the first reconnect, doubled on each retry
+# File type sets, built once instead of per file
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif', '.webp', '.ico', '.svg'})
+SUPPORTED_EXTENSIONS = IMAGE_EXTENSIONS | frozenset({
+    '.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt',  # documents
+    '.zip', '.rar', '.7z', '.tar', '.gz', '.bz2',  # archives
+    '.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm',  # video
+    '.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma',  # audio
+})
+EXIF_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp'})
+# Image types compared by the similarity searches, as an SQL IN list
+SIMILARITY_IMAGE_TYPES_SQL = "'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'"
+# (column, default) for rows written to files, in statement order; optional columns
+# are dropped when the database predates them
+INSERT_COLUMNS = (
+    ('file_path', ''), ('file_name', ''), ('file_size', 0), ('sha256', ''),
+    ('perceptual_hash', None), ('file_type', ''), ('mime_type', ''),
+    ('width', None), ('height', None), ('perceptual_hash_bits', None), ('hash_algo', 'sha256'), ('quick_fp', None),
+    ('created_at', None), ('modified_at', None), ('metadata_json', '{}'),
+)
+# Keys of each file dict returned by find_duplicates, in the order its query selects them
+DUPLICATE_FILE_KEYS = (
+    'id', 'file_path', 'file_name', 'file_size', 'sha256', 'perceptual_hash',
+    'file_type', 'mime_type', 'width', 'height',
+)
+
 # Import optional dependencies with graceful handling
 OPTIONAL_DEPENDENCIES = {}
 
-def _import_optional_dependency(name: str, package: str = None, install_name: str = None):
-    """Import optional dependency with graceful fallback."""
+def _import_optional_dependency(name: str, package: str = None, install_name: str = None, quiet: bool = False):
+    """Import optional dependency with graceful fallback; quiet skips the warning for fallback-only packages."""
     if package is None:
         package = name
     if install_name is None:
         install_name = name
     
     try:
-        module = __import__(package)
+        # import_module returns the submodule itself (PIL.Image, not PIL)
+        module = importlib.import_module(package)
         OPTIONAL_DEPENDENCIES[name] = module
         return module
     except ImportError as e:
-        print(f"Warning: Optional dependency '{name}' not available: {e}")
-        print(f"Install with: pip install {install_name}")
+        if not quiet:
+            print(f"Warning: Optional dependency '{name}' not available: {e}")
+            print(f"Install with: pip install {install_name}")
         OPTIONAL_DEPENDENCIES[name] = None
         return None
 
+def _file_extension(file_path: str) -> str:
+    """Lowercased extension of a path, matching Path(file_path).suffix without building a Path."""
+    name = os.path.basename(file_path)
+    dot = name.rfind('.')
+    if 0 < dot < len(name) - 1:
+        return name[dot:].lower()
+    return ''
+
 # Import optional dependencies
 magic = _import_optional_dependency('magic', 'magic', 'python-magic')
 imagehash = _import_optional_dependency('imagehash', 'imagehash', 'imagehash')
@@ -75,6 +137,10 @@ exifread = _import_optional_dependency('exifread', 'exifread', 'exifread')
 np = _import_optional_dependency('numpy', 'numpy', 'numpy')
 cosine_similarity = _import_optional_dependency('cosine_similarity', 'sklearn.metrics.pairwise', 'scikit-learn')
 TfidfVectorizer = _import_optional_dependency('TfidfVectorizer', 'sklearn.feature_extraction.text', 'scikit-learn')
+# pybktree only indexes similar-image search when numpy is missing
+pybktree = _import_optional_dependency('pybktree', 'pybktree', 'pybktree', quiet=np is not None)
+# blake3 is only needed for --hash-algo blake3, which warns on its own when it is missing
+blake3 = _import_optional_dependency('blake3', 'blake3', 'blake3', quiet=True)
 
 # Handle PIL Image import specifically
 if Image is None:
@@ -109,30 +175,63 @@ if TfidfVectorizer is None:
         pass
 
 
+class _ScanStats:
+    """Scan counters as slot attributes for the per-file path; still readable like the old stats dict."""
+    
+    __slots__ = (
+        'total_files', 'processed_files', 'skipped_files', 'duplicates_found', 'errors',
+        'skipped_hidden', 'skipped_system', 'skipped_large', 'skipped_zero_byte', 'skipped_corrupted',
+        'start_time', 'end_time',
+    )
+    
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+        self.start_time = None
+        self.end_time = None
+    
+    def __getitem__(self, key: str):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+    
+    def __setitem__(self, key: str, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+    
+    def __contains__(self, key) -> bool:
+        return key in self.__slots__
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Counters as a plain dictionary."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
 class FileScanner:
     """Scans folders and extracts file metadata."""
     
-    def __init__(self, db_path: str, dry_run: bool = False):
+    def __init__(self, db_path: str, dry_run: bool = False, hash_algo: str = 'sha256', quick_hash: bool = False):
         self.db_path = db_path
         self.dry_run = dry_run
+        self.hash_algo = hash_algo
+        self.quick_hash = quick_hash
         self.conn = None
         self.cursor = None
-        self.stats = {
-            'total_files': 0,
-            'processed_files': 0,
-            'skipped_files': 0,
-            'duplicates_found': 0,
-            'errors': 0,
-            'skipped_hidden': 0,
-            'skipped_system': 0,
-            'skipped_large': 0,
-            'skipped_zero_byte': 0,
-            'skipped_corrupted': 0,
-            'start_time': None,
-            'end_time': None
-        }
+        self.stats = _ScanStats()
         self.error_details = []
-        self._column_cache = {}
+        self._column_cache: FrozenSet[str] = frozenset()  # Columns of the files table, read once on connect
+        self._size_index: Optional[Dict[int, int]] = None  # file_size -> number of known files
+        self._known_hashes: Optional[Dict[Tuple[str, str], str]] = None  # (hash_algo, digest) -> first known file_path
+        self._deferred_files: Optional[Dict[Tuple[int, int], str]] = None  # (file_size, quick_fp) -> file stored without a hash
+        self._phash_tree = None  # (image rows, BK-tree) cached for find_similar_images
+        self._hash_view = memoryview(bytearray(HASH_CHUNK_SIZE))  # Reused read buffer for hashing
+        self._pending: Optional[List[Tuple[str, tuple]]] = None  # Queued (file_path, row) inserts while scanning
+        self._detection_queries: Dict[Tuple, str] = {}  # Enhanced detection SELECTs by active filters
+        self._insert_sql: Optional[str] = None  # INSERT for this database's columns, built with the column cache
+        self._insert_fields: Tuple[Tuple[str, Any], ...] = ()
+        self._insert_bits_index: Optional[int] = None
+        self._update_hash_sql: Optional[str] = None  # UPDATE storing a deferred file's hash, built with the INSERT
         self._progress_counter = 0
         self._progress_interval = 100  # Report progress every N files
         
@@ -141,6 +240,10 @@ class FileScanner:
         
         # Check and report missing dependencies
         self._check_optional_dependencies()
+        
+        if self.hash_algo == 'blake3' and not self._is_dependency_available('blake3'):
+            self.logger.warning("blake3 is not installed, hashing large files with SHA256 instead")
+            self.hash_algo = 'sha256'
     
     def _setup_logging(self):
         """Setup logging configuration for detailed error reporting."""
@@ -169,6 +272,12 @@ class FileScanner:
         
         for dep_name, dep_module in OPTIONAL_DEPENDENCIES.items():
             if dep_module is None:
+                # pybktree is only the similar-image index when numpy is missing
+                if dep_name == 'pybktree' and OPTIONAL_DEPENDENCIES.get('numpy') is not None:
+                    continue
+                # blake3 is reported by __init__ only when --hash-algo blake3 asks for it
+                if dep_name == 'blake3':
+                    continue
                 missing_deps.append(dep_name)
             else:
                 available_deps.append(dep_name)
@@ -191,6 +300,8 @@ class FileScanner:
                 self.logger.warning("- EXIF metadata extraction will be disabled")
             if 'numpy' in missing_deps or 'cosine_similarity' in missing_deps:
                 self.logger.warning("- Advanced similarity analysis will be disabled without numpy/scikit-learn")
+            if 'pybktree' in missing_deps:
+                self.logger.warning("- Similar image search without numpy will compare every image pair (install pybktree to index hashes)")
     
     def _is_dependency_available(self, dep_name: str) -> bool:
         """Check if a specific optional dependency is available."""
@@ -208,7 +319,7 @@ class FileScanner:
         }
         
         self.error_details.append(error_detail)
-        self.stats['errors'] += 1
+        self.stats.errors += 1
         
         # Log to console with appropriate level
         if error_type in ['PERMISSION_ERROR', 'FILE_NOT_FOUND']:
@@ -221,8 +332,9 @@ class FileScanner:
         
     def connect_db(self):
         """Connect to SQLite database with validation and retry logic."""
-        max_retries = 3
-        retry_delay = 1  # seconds
+        # Lock waits are handled inside SQLite by the busy timeout; retries cover other transient failures
+        max_retries = CONNECT_ATTEMPTS
+        retry_delay = CONNECT_RETRY_DELAY
         
         for attempt in range(max_retries):
             try:
@@ -255,7 +367,7 @@ class FileScanner:
                 
                 # Attempt database connection
                 self.logger.info(f"Attempting database connection (attempt {attempt + 1}/{max_retries}): {self.db_path}")
-                self.conn = sqlite3.connect(self.db_path, timeout=30.0)
+                self.conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT)
                 self.cursor = self.conn.cursor()
                 
                 # Test the connection with a simple query
@@ -264,7 +376,6 @@ class FileScanner:
                         self.logger.warning(f"Database connection test failed, retrying in {retry_delay} seconds...")
                         if self.conn:
                             self.conn.close()
-                        import time
                         time.sleep(retry_delay)
                         retry_delay *= 2  # Exponential backoff
                         continue
@@ -275,6 +386,7 @@ class FileScanner:
                 
                 # Initialize database schema and cache
                 self._create_tables()
+                self._configure_connection()
                 # Apply pending migrations if available
                 try:
                     sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
@@ -285,6 +397,7 @@ class FileScanner:
                 except Exception as e:
                     self.logger.warning(f"Could not apply database migrations automatically: {e}")
                 self._initialize_column_cache()
+                self._backfill_perceptual_hash_bits()
                 
                 self.logger.info(f"Successfully connected to database: {self.db_path}")
                 return  # Success - exit retry loop
@@ -302,7 +415,6 @@ class FileScanner:
                     self.logger.warning(f"Retrying database connection in {retry_delay} seconds...")
                     if self.conn:
                         self.conn.close()
-                    import time
                     time.sleep(retry_delay)
                     retry_delay *= 2  # Exponential backoff
                 else:
@@ -320,7 +432,6 @@ class FileScanner:
                     self.logger.warning(f"Retrying database connection in {retry_delay} seconds...")
                     if self.conn:
                         self.conn.close()
-                    import time
                     time.sleep(retry_delay)
                     retry_delay *= 2
                 else:
@@ -335,7 +446,6 @@ class FileScanner:
                     self.logger.warning(f"Retrying database connection in {retry_delay} seconds...")
                     if self.conn:
                         self.conn.close()
-                    import time
                     time.sleep(retry_delay)
                     retry_delay *= 2
                 else:
@@ -350,13 +460,26 @@ class FileScanner:
                     self.logger.warning(f"Retrying database connection in {retry_delay} seconds...")
                     if self.conn:
                         self.conn.close()
-                    import time
                     time.sleep(retry_delay)
                     retry_delay *= 2
                 else:
                     self.logger.error("Database connection failed after all retry attempts")
                     sys.exit(1)
     
+    def _configure_connection(self):
+        """Tune SQLite for bulk scanning: WAL journal, fewer fsyncs, larger page cache."""
+        pragmas = (
+            "PRAGMA journal_mode=WAL",
+            "PRAGMA synchronous=NORMAL",
+            "PRAGMA temp_store=MEMORY",
+            "PRAGMA cache_size=-65536",  # 64 MiB
+        )
+        for pragma in pragmas:
+            try:
+                self.cursor.execute(pragma)
+            except sqlite3.Error as e:
+                self.logger.warning(f"Could not apply '{pragma}': {e}")
+    
     def _test_database_connection(self) -> bool:
         """Test database connection with a simple query."""
         try:
@@ -411,10 +534,26 @@ class FileScanner:
     def compute_sha256(self, file_path: str) -> str:
         """Compute SHA256 hash of a file."""
         sha256_hash = hashlib.sha256()
+        buffer = self._hash_view
         try:
-            with open(file_path, "rb") as f:
-                for chunk in iter(lambda: f.read(4096), b""):
-                    sha256_hash.update(chunk)
+            # Unbuffered reads straight into the reusable buffer avoid an extra copy per chunk
+            with open(file_path, "rb", buffering=0) as f:
+                file_size = os.fstat(f.fileno()).st_size
+                if MMAP_MIN_SIZE <= file_size <= MMAP_MAX_SIZE and self._hash_mapped_file(f, sha256_hash):
+                    return sha256_hash.hexdigest()
+                
+                if hasattr(os, 'posix_fadvise'):
+                    try:
+                        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                    except OSError:
+                        pass  # Readahead hint only
+                
+                # Same readinto loop as hashlib.file_digest, but without allocating a new buffer per file
+                while True:
+                    bytes_read = f.readinto(buffer)
+                    if not bytes_read:
+                        break
+                    sha256_hash.update(buffer[:bytes_read])
             return sha256_hash.hexdigest()
         except PermissionError as e:
             self._log_error('PERMISSION_ERROR', file_path, 'Permission denied while reading file', e)
@@ -429,19 +568,80 @@ class FileScanner:
             self._log_error('HASH_COMPUTATION_ERROR', file_path, f'Unexpected error computing SHA256: {e}', e)
             return ""
     
-    def compute_perceptual_hash(self, file_path: str) -> Optional[str]:
+    def _hash_file(self, file_path: str, file_size: int) -> Tuple[str, str]:
+        """Content hash of a file and the algorithm used (BLAKE3 for large files when selected)."""
+        if self.hash_algo == 'blake3' and file_size > BLAKE3_MIN_SIZE:
+            return self.compute_blake3(file_path), 'blake3'
+        return self._compute_sha256_with_retry(file_path), 'sha256'
+    
+    def compute_quick_fingerprint(self, file_path: str) -> Optional[int]:
+        """Signed 64-bit digest of the first QUICK_FINGERPRINT_SIZE bytes of a file, or None if unreadable."""
+        try:
+            with open(file_path, "rb", buffering=0) as f:
+                bytes_read = f.readinto(self._hash_view[:QUICK_FINGERPRINT_SIZE])
+            digest = hashlib.blake2b(self._hash_view[:bytes_read], digest_size=8).digest()
+            return int.from_bytes(digest, 'big', signed=True)
+        except OSError as e:
+            # The full hash path reports unreadable files
+            self.logger.debug(f"Could not fingerprint {file_path}: {e}")
+            return None
+    
+    def compute_blake3(self, file_path: str) -> str:
+        """Compute a multithreaded BLAKE3 digest of a file (used for large files with --hash-algo blake3)."""
+        try:
+            hasher = blake3.blake3(max_threads=blake3.blake3.AUTO)
+            if hasattr(hasher, 'update_mmap'):
+                return hasher.update_mmap(file_path).hexdigest()
+            # blake3 before 0.4 has no update_mmap; feed the file through the reusable buffer
+            buffer = self._hash_view
+            with open(file_path, "rb", buffering=0) as f:
+                while True:
+                    bytes_read = f.readinto(buffer)
+                    if not bytes_read:
+                        break
+                    hasher.update(buffer[:bytes_read])
+            return hasher.hexdigest()
+        except PermissionError as e:
+            self._log_error('PERMISSION_ERROR', file_path, 'Permission denied while reading file', e)
+            return ""
+        except FileNotFoundError as e:
+            self._log_error('FILE_NOT_FOUND', file_path, 'File not found during hash computation', e)
+            return ""
+        except OSError as e:
+            self._log_error('FILE_IO_ERROR', file_path, f'OS error while reading file: {e}', e)
+            return ""
+        except Exception as e:
+            self._log_error('HASH_COMPUTATION_ERROR', file_path, f'Unexpected error computing BLAKE3: {e}', e)
+            return ""
+    
+    @staticmethod
+    def _hash_mapped_file(f, sha256_hash) -> bool:
+        """Feed a memory-mapped file to the hash; returns False if the file cannot be mapped."""
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                # hashlib releases the GIL while digesting the whole mapping
+                sha256_hash.update(mapped)
+            return True
+        except (OSError, ValueError):
+            return False  # Not mappable here (e.g. special files); use buffered reads
+    
+    def compute_perceptual_hash(self, file_path: str, data: Optional[bytes] = None) -> Optional[str]:
         """Compute perceptual hash for images with graceful dependency handling."""
         if not self._is_dependency_available('imagehash') or not self._is_dependency_available('Image'):
             self.logger.debug(f"Skipping perceptual hash for {file_path} - missing dependencies")
             return None
         
         try:
-            with Image.open(file_path) as img:
+            with Image.open(io.BytesIO(data) if data is not None else file_path) as img:
                 # Convert to RGB if necessary
-                if img.mode != 'RGB':
+                if img.mode not in ('RGB', 'L'):
                     img = img.convert('RGB')
+                if self._is_dependency_available('numpy'):
+                    return self._average_hash(img)
                 # Compute perceptual hash using multiple algorithms for better accuracy
-                hash_value = imagehash.average_hash(img, hash_size=16)  # Increased hash size for better precision
+                hash_value = imagehash.average_hash(img, hash_size=PERCEPTUAL_HASH_SIZE)  # Increased hash size for better precision
                 return str(hash_value)
         except PermissionError as e:
             self._log_error('PERMISSION_ERROR', file_path, 'Permission denied while opening image', e)
@@ -461,6 +661,14 @@ class FileScanner:
                 self._log_error('PERCEPTUAL_HASH_ERROR', file_path, f'Unexpected error computing perceptual hash: {e}', e)
             return None
     
+    @staticmethod
+    def _average_hash(img: Any) -> str:
+        """Average hash as hex, bit-for-bit identical to str(imagehash.average_hash(img, 16))."""
+        # Greyscale straight from RGB/L; grey -> RGB -> grey is lossless so stored hashes still match
+        grey = img if img.mode == 'L' else img.convert('L')
+        pixels = np.asarray(grey.resize((PERCEPTUAL_HASH_SIZE, PERCEPTUAL_HASH_SIZE), Image.LANCZOS))
+        return np.packbits(pixels > pixels.mean()).tobytes().hex()
+    
     def calculate_image_similarity(self, hash1: str, hash2: str) -> float:
         """Calculate similarity percentage between two perceptual hashes."""
         if not hash1 or not hash2 or not imagehash:
@@ -536,15 +744,11 @@ class FileScanner:
         
         try:
             # Get all image files from database
-            image_extensions = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp']
-            
-            query = """
+            images = self.cursor.execute(f"""
                 SELECT id, file_path, file_name, file_size, width, height, perceptual_hash
                 FROM files 
-                WHERE LOWER(file_type) IN ({})
-            """.format(','.join(['?' for _ in image_extensions]))
-            
-            images = self.cursor.execute(query, [ext.lower() for ext in image_extensions]).fetchall()
+                WHERE LOWER(file_type) IN ({SIMILARITY_IMAGE_TYPES_SQL})
+            """).fetchall()
             
             if len(images) < 2:
                 return []
@@ -604,14 +808,14 @@ class FileScanner:
             print(f"Error finding similar images: {e}")
             return []
     
-    def get_image_dimensions(self, file_path: str) -> tuple[Optional[int], Optional[int]]:
+    def get_image_dimensions(self, file_path: str, data: Optional[bytes] = None) -> tuple[Optional[int], Optional[int]]:
         """Get image dimensions (width, height) with graceful dependency handling."""
         if not self._is_dependency_available('Image'):
             self.logger.debug(f"Skipping image dimensions for {file_path} - PIL not available")
             return None, None
         
         try:
-            with Image.open(file_path) as img:
+            with Image.open(io.BytesIO(data) if data is not None else file_path) as img:
                 return img.width, img.height
         except PermissionError as e:
             self._log_error('PERMISSION_ERROR', file_path, 'Permission denied while getting image dimensions', e)
@@ -662,17 +866,18 @@ class FileScanner:
             self._log_error('EXIF_EXTRACTION_ERROR', file_path, f'Error extracting EXIF data: {e}', e)
             return {}
     
-    def get_file_metadata(self, file_path: str) -> Dict:
+    def get_file_metadata(self, file_path: str, entry: Optional[os.DirEntry] = None) -> Dict:
         """Extract comprehensive file metadata with enhanced error handling."""
         try:
-            stat = os.stat(file_path)
+            # A DirEntry from the directory scan caches its stat result
+            stat = entry.stat() if entry is not None else os.stat(file_path)
             file_info = {
                 'file_path': file_path,
-                'file_name': os.path.basename(file_path),
+                'file_name': entry.name if entry is not None else os.path.basename(file_path),
                 'file_size': stat.st_size,
                 'created_at': datetime.fromtimestamp(stat.st_ctime),
                 'modified_at': datetime.fromtimestamp(stat.st_mtime),
-                'file_type': Path(file_path).suffix.lower(),
+                'file_type': _file_extension(entry.name if entry is not None else file_path),
                 'mime_type': '',
                 'metadata_json': '{}'
             }
@@ -703,7 +908,7 @@ class FileScanner:
                     self.logger.debug(f"Could not determine MIME type using fallback for {file_path}: {e}")
             
             # Extract EXIF for images with better error handling
-            if file_info['file_type'] in ['.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp']:
+            if file_info['file_type'] in EXIF_EXTENSIONS:
                 try:
                     exif_data = self.extract_exif_data(file_path)
                     if exif_data:
@@ -733,42 +938,210 @@ class FileScanner:
             self._log_error('METADATA_EXTRACTION_ERROR', file_path, f'Unexpected error getting file metadata: {e}', e)
             return {}
     
-    def _check_column_exists(self, table_name: str, column_name: str) -> bool:
-        """Check if a column exists in the specified table (with caching)."""
-        cache_key = f"{table_name}.{column_name}"
+    def _load_duplicate_index(self):
+        """Load known file sizes and SHA256 hashes once so duplicate checks stay in memory."""
+        self._size_index = {}
+        self._known_hashes = {}
+        self._deferred_files = {}
         
-        if cache_key in self._column_cache:
-            return self._column_cache[cache_key]
+        if not self.cursor:
+            return
         
         try:
-            cursor_info = self.cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = [row[1] for row in cursor_info.fetchall()]
-            exists = column_name in columns
-            self._column_cache[cache_key] = exists
-            return exists
-        except Exception as e:
-            print(f"Error checking column existence for {table_name}.{column_name}: {e}")
-            self._column_cache[cache_key] = False
-            return False
+            # Only hashed files can be matched; --quick-hash may store unique files without one
+            for file_size, count in self.cursor.execute(
+                "SELECT file_size, COUNT(*) FROM files WHERE sha256 IS NOT NULL AND sha256 != '' GROUP BY file_size"
+            ):
+                self._size_index[file_size] = count
+            
+            # Rows from before hash_algo existed were all hashed with SHA256
+            hash_algo_column = 'hash_algo' if 'hash_algo' in self._column_cache else "'sha256'"
+            for digest, hash_algo, file_path in self.cursor.execute(
+                f"SELECT sha256, {hash_algo_column}, file_path FROM files WHERE sha256 IS NOT NULL AND sha256 != ''"
+            ):
+                self._known_hashes.setdefault((hash_algo, digest), file_path)
+            
+            if 'quick_fp' in self._column_cache:
+                for file_size, quick_fp, file_path in self.cursor.execute(
+                    "SELECT file_size, quick_fp, file_path FROM files "
+                    "WHERE quick_fp IS NOT NULL AND (sha256 IS NULL OR sha256 = '')"
+                ):
+                    self._deferred_files.setdefault((file_size, quick_fp), file_path)
+            
+            self.logger.debug(f"Duplicate index loaded: {len(self._size_index)} sizes, "
+                              f"{len(self._known_hashes)} hashes")
+        except sqlite3.Error as e:
+            self._log_error('DATABASE_QUERY_ERROR', self.db_path, f'Error loading duplicate index: {e}', e)
+    
+    def _record_known_file(self, file_path: str, file_size: int, sha256: str, hash_algo: str = 'sha256'):
+        """Add a stored file to the in-memory duplicate index."""
+        self._size_index[file_size] = self._size_index.get(file_size, 0) + 1
+        self._known_hashes.setdefault((hash_algo, sha256), file_path)
+    
+    def _index_file(self, file_path: str, file_size: int, sha256: Optional[str], hash_algo: str,
+                    quick_fp: Optional[int]):
+        """Add a scanned file to the duplicate index, by hash or as deferred by quick fingerprint."""
+        if sha256:
+            self._record_known_file(file_path, file_size, sha256, hash_algo)
+        else:
+            self._deferred_files.setdefault((file_size, quick_fp), file_path)
+    
+    def _forget_file(self, file_path: str, file_size: int, sha256: Optional[str], hash_algo: str,
+                     quick_fp: Optional[int]):
+        """Undo _index_file for a file whose row was not written."""
+        if sha256:
+            remaining = self._size_index.get(file_size, 0) - 1
+            if remaining > 0:
+                self._size_index[file_size] = remaining
+            else:
+                self._size_index.pop(file_size, None)
+            if self._known_hashes.get((hash_algo, sha256)) == file_path:
+                del self._known_hashes[(hash_algo, sha256)]
+        elif self._deferred_files.get((file_size, quick_fp)) == file_path:
+            del self._deferred_files[(file_size, quick_fp)]
+    
+    def _needs_full_hash(self, file_path: str, file_size: int, quick_fp: int) -> bool:
+        """Whether a file could duplicate a known file; a matching file stored without a hash is hashed now."""
+        # Checked before the size index: other files of this size may already be hashed
+        deferred_path = self._deferred_files.get((file_size, quick_fp))
+        if deferred_path is not None and deferred_path != file_path:
+            self._hash_deferred_file(file_size, quick_fp)
+            return True
+        return self._size_index.get(file_size, 0) > 0
+    
+    def _hash_deferred_file(self, file_size: int, quick_fp: int):
+        """Fill in the content hash of a stored file once another file shares its quick fingerprint."""
+        if not self.dry_run:
+            # The row may still be queued in the current batch; if writing it fails it leaves the index
+            self._flush_pending_inserts()
+        file_path = self._deferred_files.pop((file_size, quick_fp), None)
+        if file_path is None:
+            return
+        digest, hash_algo = self._hash_file(file_path, file_size)
+        if not digest:
+            return
+        
+        if not self.dry_run:
+            if self._update_hash_sql is None:
+                self._prepare_insert_statement()
+            params = (digest, hash_algo) if 'hash_algo' in self._column_cache else (digest,)
+            try:
+                with self.conn:
+                    self.cursor.execute(self._update_hash_sql, params + (file_path,))
+            except sqlite3.Error as e:
+                self._log_error('DATABASE_ERROR', file_path, f'Could not store deferred hash: {e}', e)
+                return
+        self._record_known_file(file_path, file_size, digest, hash_algo)
+    
+    def _prepare_insert_statement(self):
+        """Build the INSERT/UPDATE statements and column order once for the columns this database has."""
+        # Older databases fall back to the base columns
+        has_dimensions = 'width' in self._column_cache and 'height' in self._column_cache
+        available = {
+            'width': has_dimensions,
+            'height': has_dimensions,
+            'perceptual_hash_bits': 'perceptual_hash_bits' in self._column_cache,
+            'hash_algo': 'hash_algo' in self._column_cache,
+            'quick_fp': 'quick_fp' in self._column_cache,
+        }
+        self._insert_fields = tuple(field for field in INSERT_COLUMNS if available.get(field[0], True))
+        columns = [column for column, _ in self._insert_fields]
+        self._insert_bits_index = columns.index('perceptual_hash_bits') if available['perceptual_hash_bits'] else None
+        self._insert_sql = (
+            f"INSERT OR REPLACE INTO files ({', '.join(columns)}) "
+            f"VALUES ({', '.join('?' * len(columns))})"
+        )
+        set_clause = "sha256 = ?, hash_algo = ?" if available['hash_algo'] else "sha256 = ?"
+        self._update_hash_sql = f"UPDATE files SET {set_clause} WHERE file_path = ?"
+    
+    def _insert_row(self, metadata: Dict) -> tuple:
+        """Parameters for the prepared INSERT statement."""
+        if self._insert_sql is None:
+            self._prepare_insert_statement()
+        row = [metadata.get(column, default) for column, default in self._insert_fields]
+        if self._insert_bits_index is not None:
+            row[self._insert_bits_index] = self._perceptual_hash_bits(metadata.get('perceptual_hash'))
+        return tuple(row)
+    
+    @staticmethod
+    def _perceptual_hash_bits(perceptual_hash: Optional[str]) -> Optional[bytes]:
+        """Raw bytes of a hex perceptual hash for the perceptual_hash_bits column."""
+        if not perceptual_hash:
+            return None
+        try:
+            return bytes.fromhex(perceptual_hash)
+        except ValueError:
+            return None
     
-    def _initialize_column_cache(self):
-        """Initialize column cache during database connection."""
+    def _backfill_perceptual_hash_bits(self):
+        """Fill perceptual_hash_bits for rows stored before the column existed."""
+        if 'perceptual_hash_bits' not in self._column_cache:
+            return
+        
         try:
-            # Check for width and height columns existence
-            self._check_column_exists('files', 'width')
-            self._check_column_exists('files', 'height')
-            
-            # Log column availability
-            has_width = self._column_cache.get('files.width', False)
-            has_height = self._column_cache.get('files.height', False)
-            
-            if has_width and has_height:
-                print("Database supports width and height columns")
-            else:
-                print("Warning: Database missing width/height columns - using fallback mode")
-                
-        except Exception as e:
-            print(f"Error initializing column cache: {e}")
+            rows = self.cursor.execute("""
+                SELECT id, perceptual_hash FROM files
+                WHERE perceptual_hash IS NOT NULL AND perceptual_hash_bits IS NULL
+            """).fetchall()
+            updates = [(bits, file_id) for file_id, phash in rows
+                       if (bits := self._perceptual_hash_bits(phash)) is not None]
+            if updates:
+                with self.conn:
+                    self.cursor.executemany("UPDATE files SET perceptual_hash_bits = ? WHERE id = ?", updates)
+                self.logger.info(f"Backfilled binary perceptual hashes for {len(updates)} files")
+        except sqlite3.Error as e:
+            self._log_error('DATABASE_QUERY_ERROR', self.db_path, f'Could not backfill binary perceptual hashes: {e}', e)
+    
+    def _flush_pending_inserts(self):
+        """Write queued scan rows in a single transaction."""
+        if not self._pending:
+            return
+        
+        pending, self._pending = self._pending, []
+        failed = self._write_rows(pending)
+        self.stats.processed_files -= len(failed)
+        
+        # Scanned files are indexed when queued; drop the ones that never reached the database
+        columns = [column for column, _ in self._insert_fields]
+        for file_path, row in failed:
+            values = dict(zip(columns, row))
+            self._forget_file(file_path, values['file_size'], values['sha256'],
+                              values.get('hash_algo') or 'sha256', values.get('quick_fp'))
+    
+    def _write_rows(self, pending: List[Tuple[str, tuple]]) -> List[Tuple[str, tuple]]:
+        """Insert (file_path, row) pairs in one transaction and return the pairs that failed."""
+        sql = self._insert_sql
+        failed = []
+        try:
+            with self.conn:
+                self.cursor.executemany(sql, [row for _, row in pending])
+        except sqlite3.Error as e:
+            # The batch was rolled back; retry row by row so failures are attributed to files
+            self.logger.warning(f"Batch insert of {len(pending)} files failed ({e}), retrying individually")
+            for file_path, row in pending:
+                try:
+                    with self.conn:
+                        self.cursor.execute(sql, row)
+                except sqlite3.Error as row_error:
+                    self._log_error('DATABASE_ERROR', file_path, f'Database error during batch insertion: {row_error}', row_error)
+                    failed.append((file_path, row))
+        self._phash_tree = None  # Stored images changed, rebuild the similarity index
+        return failed
+    
+    def insert_files_batch(self, metadata_list: Iterable[Dict]) -> int:
+        """Insert many files with one executemany in a single transaction; returns the number written."""
+        if self.dry_run:
+            count = sum(1 for _ in metadata_list)
+            self.logger.debug(f"DRY RUN: Would insert {count} files")
+            return count
+        
+        rows = [(metadata.get('file_path', 'unknown'), self._insert_row(metadata)) for metadata in metadata_list]
+        if not rows:
+            return 0
+        
+        # Rows queued by a scan in progress go first so insertion order is kept
+        self._flush_pending_inserts()
+        return len(rows) - len(self._write_rows(rows))
     
     def insert_file(self, metadata: Dict) -> bool:
         """Insert file information into database with graceful handling of missing columns and dry-run support."""
@@ -780,58 +1153,18 @@ class FileScanner:
             return True
         
         try:
-            # Use cached column information
-            has_width = self._column_cache.get('width', False)
-            has_height = self._column_cache.get('height', False)
-            
-            # Extract values from metadata
-            sha256 = metadata.get('sha256', '')
-            perceptual_hash = metadata.get('perceptual_hash')
-            width = metadata.get('width')
-            height = metadata.get('height')
-            
-            if has_width and has_height:
-                # Full insertion with width and height
-                self.cursor.execute("""
-                    INSERT OR REPLACE INTO files 
-                    (file_path, file_name, file_size, sha256, perceptual_hash, 
-                     file_type, mime_type, width, height, created_at, modified_at, metadata_json)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    metadata.get('file_path', ''),
-                    metadata.get('file_name', ''),
-                    metadata.get('file_size', 0),
-                    sha256,
-                    perceptual_hash,
-                    metadata.get('file_type', ''),
-                    metadata.get('mime_type', ''),
-                    width,
-                    height,
-                    metadata.get('created_at'),
-                    metadata.get('modified_at'),
-                    metadata.get('metadata_json', '{}')
-                ))
-            else:
-                # Fallback insertion without width and height columns
-                self.cursor.execute("""
-                    INSERT OR REPLACE INTO files 
-                    (file_path, file_name, file_size, sha256, perceptual_hash, 
-                     file_type, mime_type, created_at, modified_at, metadata_json)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    metadata.get('file_path', ''),
-                    metadata.get('file_name', ''),
-                    metadata.get('file_size', 0),
-                    sha256,
-                    perceptual_hash,
-                    metadata.get('file_type', ''),
-                    metadata.get('mime_type', ''),
-                    metadata.get('created_at'),
-                    metadata.get('modified_at'),
-                    metadata.get('metadata_json', '{}')
-                ))
+            row = self._insert_row(metadata)
+            
+            if self._pending is not None:
+                # Scan in progress: queue the row and write it with the next batch
+                self._pending.append((file_path, row))
+                if len(self._pending) >= INSERT_BATCH_SIZE:
+                    self._flush_pending_inserts()
+                return True
             
+            self.cursor.execute(self._insert_sql, row)
             self.conn.commit()
+            self._phash_tree = None  # Stored images changed, rebuild the similarity index
             return True
             
         except sqlite3.IntegrityError as e:
@@ -858,7 +1191,14 @@ class FileScanner:
             return
         
         # Record start time
-        self.stats['start_time'] = datetime.now()
+        self.stats.start_time = datetime.now()
+        
+        # Snapshot sizes and hashes already stored so per-file duplicate checks avoid SQL round-trips
+        self._load_duplicate_index()
+        
+        # Queue inserts and commit them in batches instead of once per file
+        if not self.dry_run:
+            self._pending = []
         
         self.logger.info(f"Scanning folder: {folder_path}")
         self.logger.info(f"Recursive: {recursive}")
@@ -869,53 +1209,85 @@ class FileScanner:
         print(f"Mode: {'Recursive' if recursive else 'Non-recursive'}")
         if self.dry_run:
             print("DRY RUN MODE: No database changes will be made")
-        print(f"Started at: {self.stats['start_time'].strftime('%Y-%m-%d %H:%M:%S')}")
+        print(f"Started at: {self.stats.start_time.strftime('%Y-%m-%d %H:%M:%S')}")
         print("=" * 60)
         
         try:
-            if recursive:
-                for root, dirs, files in os.walk(folder_path):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        self._process_file(file_path)
-                        self._update_progress()
-            else:
-                for item in os.listdir(folder_path):
-                    item_path = os.path.join(folder_path, item)
-                    if os.path.isfile(item_path):
-                        self._process_file(item_path)
-                        self._update_progress()
+            for entry in self._iter_file_entries(folder_path, recursive):
+                self._process_file(entry.path, entry)
+                self._update_progress()
         except PermissionError as e:
             self._log_error('PERMISSION_ERROR', folder_path, f'Permission denied while scanning folder: {e}', e)
         except OSError as e:
             self._log_error('FILE_IO_ERROR', folder_path, f'OS error while scanning folder: {e}', e)
         except Exception as e:
             self._log_error('SCAN_ERROR', folder_path, f'Unexpected error during folder scan: {e}', e)
+        finally:
+            self._flush_pending_inserts()
+            self._pending = None
+        
+        # Refresh planner statistics so duplicate lookups keep using the hash indexes
+        if not self.dry_run and self.stats.processed_files > 0:
+            try:
+                self.cursor.execute("ANALYZE files")
+                self.conn.commit()
+            except sqlite3.Error as e:
+                self.logger.warning(f"Could not analyze files table: {e}")
         
         # Record end time
-        self.stats['end_time'] = datetime.now()
+        self.stats.end_time = datetime.now()
         
         # Display comprehensive scan results
         self._print_scan_summary()
     
+    def _iter_file_entries(self, folder_path: str, recursive: bool):
+        """Yield DirEntry objects for files under folder_path, in os.walk order."""
+        if not recursive:
+            with os.scandir(folder_path) as entries:
+                yield from [entry for entry in entries if entry.is_file()]
+            return
+        
+        pending = [folder_path]
+        while pending:
+            current = pending.pop()
+            try:
+                with os.scandir(current) as entries:
+                    entries = list(entries)
+            except OSError as e:
+                # os.walk skips unreadable directories too; keep the scan going
+                self.logger.warning(f"Cannot read directory {current}: {e}")
+                continue
+            
+            subdirs = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    yield entry
+                elif not entry.is_symlink():  # Like os.walk, do not descend into linked directories
+                    subdirs.append(entry.path)
+            pending.extend(reversed(subdirs))
+    
     def _update_progress(self):
         """Update and display progress during scanning."""
         self._progress_counter += 1
         
         # Report progress every N files
         if self._progress_counter % self._progress_interval == 0:
-            elapsed_time = datetime.now() - self.stats['start_time']
+            elapsed_time = datetime.now() - self.stats.start_time
             files_per_second = self._progress_counter / elapsed_time.total_seconds() if elapsed_time.total_seconds() > 0 else 0
             
-            print(f"Progress: {self.stats['total_files']} files found, "
-                  f"{self.stats['processed_files']} processed, "
-                  f"{self.stats['skipped_files']} skipped, "
-                  f"{self.stats['errors']} errors "
+            print(f"Progress: {self.stats.total_files} files found, "
+                  f"{self.stats.processed_files} processed, "
+                  f"{self.stats.skipped_files} skipped, "
+                  f"{self.stats.errors} errors "
                   f"({files_per_second:.1f} files/sec)")
     
     def _print_scan_summary(self):
         """Print comprehensive scan summary with detailed statistics."""
-        duration = self.stats['end_time'] - self.stats['start_time']
+        duration = self.stats.end_time - self.stats.start_time
         
         print("\n" + "=" * 60)
         print("SCAN COMPLETE - SUMMARY REPORT")
@@ -923,40 +1295,40 @@ class FileScanner:
         
         # Basic statistics
         print(f"Scan Duration: {duration}")
-        print(f"Files per Second: {self.stats['total_files'] / duration.total_seconds():.1f}")
+        print(f"Files per Second: {self.stats.total_files / duration.total_seconds():.1f}")
         print()
         
         # File processing statistics
         print("FILE PROCESSING STATISTICS:")
         print("-" * 30)
-        print(f"Total files found:     {self.stats['total_files']:,}")
-        print(f"Successfully processed: {self.stats['processed_files']:,}")
-        print(f"Total skipped:         {self.stats['skipped_files']:,}")
-        print(f"Duplicates found:      {self.stats['duplicates_found']:,}")
-        print(f"Errors encountered:    {self.stats['errors']:,}")
+        print(f"Total files found:     {self.stats.total_files:,}")
+        print(f"Successfully processed: {self.stats.processed_files:,}")
+        print(f"Total skipped:         {self.stats.skipped_files:,}")
+        print(f"Duplicates found:      {self.stats.duplicates_found:,}")
+        print(f"Errors encountered:    {self.stats.errors:,}")
         
         # Detailed skip breakdown
-        if self.stats['skipped_files'] > 0:
+        if self.stats.skipped_files > 0:
             print("\nSKIP BREAKDOWN:")
             print("-" * 15)
-            if self.stats['skipped_hidden'] > 0:
-                print(f"Hidden files:          {self.stats['skipped_hidden']:,}")
-            if self.stats['skipped_system'] > 0:
-                print(f"System files:          {self.stats['skipped_system']:,}")
-            if self.stats['skipped_large'] > 0:
-                print(f"Large files (>1GB):    {self.stats['skipped_large']:,}")
-            if self.stats['skipped_zero_byte'] > 0:
-                print(f"Zero-byte files:       {self.stats['skipped_zero_byte']:,}")
-            if self.stats['skipped_corrupted'] > 0:
-                print(f"Corrupted files:       {self.stats['skipped_corrupted']:,}")
+            if self.stats.skipped_hidden > 0:
+                print(f"Hidden files:          {self.stats.skipped_hidden:,}")
+            if self.stats.skipped_system > 0:
+                print(f"System files:          {self.stats.skipped_system:,}")
+            if self.stats.skipped_large > 0:
+                print(f"Large files (>1GB):    {self.stats.skipped_large:,}")
+            if self.stats.skipped_zero_byte > 0:
+                print(f"Zero-byte files:       {self.stats.skipped_zero_byte:,}")
+            if self.stats.skipped_corrupted > 0:
+                print(f"Corrupted files:       {self.stats.skipped_corrupted:,}")
         
         # Success rate
-        if self.stats['total_files'] > 0:
-            success_rate = (self.stats['processed_files'] / self.stats['total_files']) * 100
+        if self.stats.total_files > 0:
+            success_rate = (self.stats.processed_files / self.stats.total_files) * 100
             print(f"\nSuccess Rate: {success_rate:.1f}%")
         
         # Display error summary if there were errors
-        if self.stats['errors'] > 0:
+        if self.stats.errors > 0:
             self._print_error_summary()
         
         # Recommendations
@@ -1000,24 +1372,24 @@ class FileScanner:
         recommendations = []
         
         # Error-based recommendations
-        if self.stats['errors'] > 0:
-            error_rate = (self.stats['errors'] / self.stats['total_files']) * 100
+        if self.stats.errors > 0:
+            error_rate = (self.stats.errors / self.stats.total_files) * 100
             if error_rate > 10:
                 recommendations.append("High error rate detected. Check file permissions and disk health.")
         
         # Skip-based recommendations
-        if self.stats['skipped_large'] > 0:
-            recommendations.append(f"{self.stats['skipped_large']} large files (>1GB) were skipped. Consider processing them separately.")
+        if self.stats.skipped_large > 0:
+            recommendations.append(f"{self.stats.skipped_large} large files (>1GB) were skipped. Consider processing them separately.")
         
-        if self.stats['skipped_corrupted'] > 0:
-            recommendations.append(f"{self.stats['skipped_corrupted']} corrupted files detected. Consider running disk check.")
+        if self.stats.skipped_corrupted > 0:
+            recommendations.append(f"{self.stats.skipped_corrupted} corrupted files detected. Consider running disk check.")
         
         # Duplicate recommendations
-        if self.stats['duplicates_found'] > 0:
-            recommendations.append(f"{self.stats['duplicates_found']} duplicate files found. Use --duplicates flag to see details.")
+        if self.stats.duplicates_found > 0:
+            recommendations.append(f"{self.stats.duplicates_found} duplicate files found. Use --duplicates flag to see details.")
         
         # Performance recommendations
-        if self.stats['total_files'] > 10000:
+        if self.stats.total_files > 10000:
             recommendations.append("Large folder detected. Consider scanning in smaller batches for better performance.")
         
         if not recommendations:
@@ -1026,9 +1398,16 @@ class FileScanner:
         for i, rec in enumerate(recommendations, 1):
             print(f"{i}. {rec}")
     
-    def _validate_file_existence(self, file_path: str) -> bool:
+    def _validate_file_existence(self, file_path: str, entry: Optional[os.DirEntry] = None) -> bool:
         """Enhanced file existence validation with detailed error reporting."""
         try:
+            # The directory scan already knows regular files; only the readability check needs a syscall
+            if entry is not None and entry.is_file(follow_symlinks=False):
+                if not os.access(file_path, os.R_OK):
+                    self._log_error('PERMISSION_ERROR', file_path, 'File is not readable')
+                    return False
+                return True
+            
             # Check if file exists
             if not os.path.exists(file_path):
                 self._log_error('FILE_NOT_FOUND', file_path, 'File does not exist during processing')
@@ -1069,20 +1448,10 @@ class FileScanner:
         """Enhanced file type detection and validation."""
         try:
             # Get file extension
-            file_ext = Path(file_path).suffix.lower()
-            
-            # Define supported file types
-            supported_image_types = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif', '.webp', '.ico', '.svg'}
-            supported_document_types = {'.pdf', '.doc', '.docx', '.txt', '.rtf', '.odt'}
-            supported_archive_types = {'.zip', '.rar', '.7z', '.tar', '.gz', '.bz2'}
-            supported_video_types = {'.mp4', '.avi', '.mkv', '.mov', '.wmv', '.flv', '.webm'}
-            supported_audio_types = {'.mp3', '.wav', '.flac', '.aac', '.ogg', '.wma'}
-            
-            all_supported_types = (supported_image_types | supported_document_types | 
-                                 supported_archive_types | supported_video_types | supported_audio_types)
+            file_ext = _file_extension(file_path)
             
             # Check if file type is supported
-            if file_ext and file_ext not in all_supported_types:
+            if file_ext and file_ext not in SUPPORTED_EXTENSIONS:
                 self.logger.debug(f"Unsupported file type: {file_path} ({file_ext})")
                 # Still process unsupported types for basic metadata, but log it
             
@@ -1092,11 +1461,11 @@ class FileScanner:
                     mime_type = magic.from_file(file_path, mime=True)
                     
                     # Check for potentially corrupted files
-                    if mime_type == 'application/octet-stream' and file_ext in supported_image_types:
+                    if mime_type == 'application/octet-stream' and file_ext in IMAGE_EXTENSIONS:
                         self.logger.warning(f"Potential corrupted image file: {file_path} (detected as binary)")
                     
                     # Validate image files more strictly
-                    if file_ext in supported_image_types:
+                    if file_ext in IMAGE_EXTENSIONS:
                         if not mime_type.startswith('image/'):
                             self._log_error('FILE_TYPE_MISMATCH', file_path, 
                                           f'File extension suggests image but MIME type is {mime_type}')
@@ -1111,10 +1480,10 @@ class FileScanner:
             self._log_error('FILE_TYPE_VALIDATION_ERROR', file_path, f'Error validating file type: {e}', e)
             return False
     
-    def _should_skip_file(self, file_path: str) -> tuple[bool, str]:
+    def _should_skip_file(self, file_path: str, entry: Optional[os.DirEntry] = None) -> tuple[bool, str]:
         """Enhanced logic to determine if a file should be skipped with reason tracking."""
         try:
-            filename = os.path.basename(file_path)
+            filename = entry.name if entry is not None else os.path.basename(file_path)
             
             # Skip hidden files (starting with .)
             if filename.startswith('.'):
@@ -1160,7 +1529,8 @@ class FileScanner:
             
             # Skip zero-byte files
             try:
-                if os.path.getsize(file_path) == 0:
+                file_size = entry.stat().st_size if entry is not None else os.path.getsize(file_path)
+                if file_size == 0:
                     self.logger.debug(f"Skipped zero-byte file: {file_path}")
                     return True, 'zero_byte'
             except OSError:
@@ -1173,9 +1543,11 @@ class FileScanner:
             self.logger.debug(f"Error checking if file should be skipped: {file_path}: {e}")
             return False, ''  # When in doubt, don't skip
     
-    def _get_safe_file_size(self, file_path: str) -> Optional[int]:
+    def _get_safe_file_size(self, file_path: str, entry: Optional[os.DirEntry] = None) -> Optional[int]:
         """Safely get file size with enhanced error handling."""
         try:
+            if entry is not None:
+                return entry.stat().st_size
             return os.path.getsize(file_path)
         except PermissionError as e:
             self._log_error('PERMISSION_ERROR', file_path, f'Permission denied while getting file size: {e}', e)
@@ -1247,8 +1619,7 @@ class FileScanner:
     
     def _is_image_file(self, file_type: str) -> bool:
         """Check if file type indicates an image file."""
-        image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.tif', '.webp', '.ico', '.svg'}
-        return file_type.lower() in image_extensions
+        return file_type.lower() in IMAGE_EXTENSIONS
     
     def _compute_sha256_with_retry(self, file_path: str, max_retries: int = 2) -> str:
         """Compute SHA256 with retry logic for temporary issues."""
@@ -1264,17 +1635,29 @@ class FileScanner:
         
         return ""
     
-    def _process_image_features(self, file_path: str) -> tuple[Optional[str], Optional[int], Optional[int]]:
+    def _read_image_bytes(self, file_path: str, file_size: int) -> Optional[bytes]:
+        """Read a small image whole so SHA256 and PIL share one read; None means use the streaming path."""
+        if file_size > IMAGE_BUFFER_MAX_SIZE or not self._is_dependency_available('Image'):
+            return None
+        try:
+            with open(file_path, 'rb') as f:
+                return f.read()
+        except OSError as e:
+            self.logger.debug(f"Could not buffer {file_path}, falling back to streaming reads: {e}")
+            return None
+    
+    def _process_image_features(self, file_path: str,
+                                data: Optional[bytes] = None) -> tuple[Optional[str], Optional[int], Optional[int]]:
         """Process image-specific features with enhanced error handling."""
         perceptual_hash = None
         width, height = None, None
         
         try:
             # Get image dimensions
-            width, height = self.get_image_dimensions(file_path)
+            width, height = self.get_image_dimensions(file_path, data)
             
             # Compute perceptual hash
-            perceptual_hash = self.compute_perceptual_hash(file_path)
+            perceptual_hash = self.compute_perceptual_hash(file_path, data)
             
         except Exception as e:
             # Log but don't fail the entire file processing
@@ -1282,13 +1665,13 @@ class FileScanner:
         
         return perceptual_hash, width, height
     
-    def _process_file(self, file_path: str):
+    def _process_file(self, file_path: str, entry: Optional[os.DirEntry] = None):
         """Process a single file with comprehensive error handling and detailed skip tracking."""
-        self.stats['total_files'] += 1
+        self.stats.total_files += 1
         
         try:
             # Enhanced file existence validation
-            if not self._validate_file_existence(file_path):
+            if not self._validate_file_existence(file_path, entry):
                 return
             
             # Enhanced file type detection and validation
@@ -1296,31 +1679,31 @@ class FileScanner:
                 return
             
             # Skip hidden files and system files with better detection
-            should_skip, skip_reason = self._should_skip_file(file_path)
+            should_skip, skip_reason = self._should_skip_file(file_path, entry)
             if should_skip:
-                self.stats['skipped_files'] += 1
+                self.stats.skipped_files += 1
                 if skip_reason == 'hidden':
-                    self.stats['skipped_hidden'] += 1
+                    self.stats.skipped_hidden += 1
                 elif skip_reason == 'system':
-                    self.stats['skipped_system'] += 1
+                    self.stats.skipped_system += 1
                 elif skip_reason == 'zero_byte':
-                    self.stats['skipped_zero_byte'] += 1
+                    self.stats.skipped_zero_byte += 1
                 return
             
             # Enhanced file size validation with better error handling
-            file_size = self._get_safe_file_size(file_path)
+            file_size = self._get_safe_file_size(file_path, entry)
             if file_size is None:
                 return
             
             # Skip very large files (>1GB) to prevent memory issues
             if file_size > 1024 * 1024 * 1024:  # 1GB
-                self.stats['skipped_files'] += 1
-                self.stats['skipped_large'] += 1
+                self.stats.skipped_files += 1
+                self.stats.skipped_large += 1
                 self.logger.info(f"Skipped large file (>1GB): {file_path} ({file_size} bytes)")
                 return
             
             # Get metadata with enhanced error handling
-            file_info = self.get_file_metadata(file_path)
+            file_info = self.get_file_metadata(file_path, entry)
             if not file_info:
                 self._log_error('METADATA_ERROR', file_path, 'Failed to extract file metadata')
                 return
@@ -1328,52 +1711,71 @@ class FileScanner:
             # Validate file integrity before processing
             is_valid, validation_reason = self._validate_file_integrity(file_path, file_info)
             if not is_valid:
-                self.stats['skipped_files'] += 1
+                self.stats.skipped_files += 1
                 if validation_reason == 'zero_byte':
-                    self.stats['skipped_zero_byte'] += 1
+                    self.stats.skipped_zero_byte += 1
                 elif validation_reason == 'large':
-                    self.stats['skipped_large'] += 1
+                    self.stats.skipped_large += 1
                 elif validation_reason == 'corrupted':
-                    self.stats['skipped_corrupted'] += 1
+                    self.stats.skipped_corrupted += 1
                 return
             
-            # Compute SHA256 with retry logic for temporary issues
-            sha256 = self._compute_sha256_with_retry(file_path)
-            if not sha256:
-                self._log_error('HASH_ERROR', file_path, 'Failed to compute SHA256 hash after retries')
-                return
+            # Images are read once and the same bytes feed SHA256, dimensions and the perceptual hash
+            is_image = self._is_image_file(file_info['file_type'])
+            image_data = self._read_image_bytes(file_path, file_size) if is_image else None
+            
+            # A file can only be an exact duplicate if another known file has the same size
+            if self._size_index is None:
+                self._load_duplicate_index()
+            
+            # With --quick-hash, a file whose size and leading bytes match no other file is
+            # provably unique and is stored without the full content hash
+            quick_fp = None
+            if self.quick_hash and image_data is None and 'quick_fp' in self._column_cache:
+                quick_fp = self.compute_quick_fingerprint(file_path)
+            
+            # Compute SHA256 (or BLAKE3 for large files when selected) with retry logic for temporary issues
+            hash_algo = 'sha256'
+            if image_data is not None:
+                sha256 = hashlib.sha256(image_data).hexdigest()
+            elif quick_fp is not None and not self._needs_full_hash(file_path, file_size, quick_fp):
+                sha256 = None
+            else:
+                sha256, hash_algo = self._hash_file(file_path, file_size)
+                if not sha256:
+                    self._log_error('HASH_ERROR', file_path, 'Failed to compute SHA256 hash after retries')
+                    return
             
             # Check for existing file with same hash
-            try:
-                existing = self.cursor.execute(
-                    "SELECT file_path FROM files WHERE sha256 = ?", (sha256,)
-                ).fetchone()
-                
-                if existing:
-                    self.logger.info(f"Duplicate found: {file_path} (same as {existing[0]})")
-                    self.stats['duplicates_found'] += 1
-            except sqlite3.Error as e:
-                self._log_error('DATABASE_QUERY_ERROR', file_path, f'Error checking for duplicates: {e}', e)
-                # Continue processing even if duplicate check fails
+            if sha256 and self._size_index.get(file_size, 0) > 0:
+                existing_path = self._known_hashes.get((hash_algo, sha256))
+                if existing_path:
+                    self.logger.info(f"Duplicate found: {file_path} (same as {existing_path})")
+                    self.stats.duplicates_found += 1
             
             # Compute perceptual hash and dimensions for images with enhanced handling
             perceptual_hash = None
             width, height = None, None
             
-            if self._is_image_file(file_info['file_type']):
-                perceptual_hash, width, height = self._process_image_features(file_path)
+            if is_image:
+                perceptual_hash, width, height = self._process_image_features(file_path, image_data)
                 file_info['perceptual_hash'] = perceptual_hash
                 file_info['width'] = width
                 file_info['height'] = height
             
             # Add SHA256 to file_info
             file_info['sha256'] = sha256
+            file_info['hash_algo'] = hash_algo
+            file_info['quick_fp'] = quick_fp
             
-            # Insert into database
+            # Index before inserting so later files in the same batch see this one;
+            # a queued row that fails to write is removed again when its batch is flushed
+            self._index_file(file_path, file_size, sha256, hash_algo, quick_fp)
             if self.insert_file(file_info):
-                self.stats['processed_files'] += 1
+                self.stats.processed_files += 1
                 self.logger.debug(f"✓ Processed: {file_path} ({file_info['file_size']} bytes)")
             else:
+                self._forget_file(file_path, file_size, sha256, hash_algo, quick_fp)
                 self._log_error('DATABASE_INSERT_FAILED', file_path, 'Failed to insert file into database')
             
         except PermissionError as e:
@@ -1392,43 +1794,40 @@ class FileScanner:
     
     def find_duplicates(self) -> List[Dict]:
         """Find all duplicate files based on SHA256 (legacy method)."""
-        duplicates = self.cursor.execute("""
-            SELECT sha256, COUNT(*) as count, GROUP_CONCAT(file_path) as paths
-            FROM files 
-            WHERE sha256 IS NOT NULL
-            GROUP BY sha256 
-            HAVING COUNT(*) > 1
-            ORDER BY count DESC
+        # Databases created before width/height were added still need to be readable
+        if 'width' in self._column_cache and 'height' in self._column_cache:
+            dimension_columns = "f.width, f.height"
+        else:
+            dimension_columns = "NULL AS width, NULL AS height"
+        # Digests are only comparable when produced by the same algorithm
+        hash_key = "sha256, hash_algo" if 'hash_algo' in self._column_cache else "sha256"
+        order_key = "f.sha256, f.hash_algo" if 'hash_algo' in self._column_cache else "f.sha256"
+        
+        # One join instead of a lookup per duplicate path
+        rows = self.conn.execute(f"""
+            SELECT f.id, f.file_path, f.file_name, f.file_size, f.sha256, f.perceptual_hash,
+                   f.file_type, f.mime_type, {dimension_columns}, d.count
+            FROM files f
+            JOIN (
+                SELECT {hash_key}, COUNT(*) AS count
+                FROM files
+                WHERE sha256 IS NOT NULL
+                GROUP BY {hash_key}
+                HAVING COUNT(*) > 1
+            ) d USING ({hash_key})
+            ORDER BY d.count DESC, {order_key}, f.id
         """).fetchall()
         
         # Convert to list of dictionaries for easier testing
         result = []
-        for sha256, count, paths in duplicates:
-            files = []
-            for path in paths.split(','):
-                # Get file details
-                self.cursor.execute("SELECT * FROM files WHERE file_path = ?", (path,))
-                file_data = self.cursor.fetchone()
-                if file_data:
-                    files.append({
-                        'id': file_data[0],
-                        'file_path': file_data[1],
-                        'file_name': file_data[2],
-                        'file_size': file_data[3],
-                        'sha256': file_data[4],
-                        'perceptual_hash': file_data[5],
-                        'file_type': file_data[6],
-                        'mime_type': file_data[7],
-                        'width': file_data[8] if len(file_data) > 8 else None,
-                        'height': file_data[9] if len(file_data) > 9 else None,
-                    })
-            
-            if files:
-                result.append({
-                    'sha256': sha256,
-                    'count': count,
-                    'files': files
-                })
+        # Plain tuples; zip stops before the trailing count column
+        for sha256, group_rows in groupby(rows, key=itemgetter(4)):
+            files = [dict(zip(DUPLICATE_FILE_KEYS, row)) for row in group_rows]
+            result.append({
+                'sha256': sha256,
+                'count': len(files),
+                'files': files
+            })
         
         return result
     
@@ -1464,70 +1863,33 @@ class FileScanner:
                 progress_callback(f"Detection failed: {e}", -1)
             return None
     
-    def _get_files_for_enhanced_detection(self, file_filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    def _get_files_for_enhanced_detection(self, file_filters: Optional[Dict[str, Any]] = None) -> List[Any]:
         """Get files from database for enhanced duplicate detection."""
         try:
-            # Build query with filters
-            query = "SELECT * FROM files WHERE 1=1"
-            params = []
-            
-            if file_filters:
-                if 'file_types' in file_filters:
-                    placeholders = ','.join(['?' for _ in file_filters['file_types']])
-                    query += f" AND file_type IN ({placeholders})"
-                    params.extend(file_filters['file_types'])
-                
-                if 'min_size' in file_filters:
-                    query += " AND file_size >= ?"
-                    params.append(file_filters['min_size'])
-                
-                if 'max_size' in file_filters:
-                    query += " AND file_size <= ?"
-                    params.append(file_filters['max_size'])
-                
-                if 'path_pattern' in file_filters:
-                    query += " AND file_path LIKE ?"
-                    params.append(f"%{file_filters['path_pattern']}%")
+            query, params = self._enhanced_detection_query(file_filters)
             
             # Execute query
             rows = self.cursor.execute(query, params).fetchall()
             
-            # Convert to DuplicateFile objects
+            # Build DuplicateFile objects straight from the row tuples, without an intermediate dict
             files = []
-            for row in rows:
+            for (file_id, file_path, file_name, file_size, sha256, perceptual_hash,
+                 file_type, mime_type, width, height, created_at, modified_at) in rows:
                 try:
-                    # Handle different column counts based on schema
-                    file_data = {
-                        'id': row[0],
-                        'file_path': row[1],
-                        'file_name': row[2],
-                        'file_size': row[3] or 0,
-                        'sha256': row[4],
-                        'perceptual_hash': row[5],
-                        'file_type': row[6],
-                        'mime_type': row[7],
-                        'width': row[8] if len(row) > 8 else None,
-                        'height': row[9] if len(row) > 9 else None,
-                        'created_at': datetime.fromisoformat(row[10]) if len(row) > 10 and row[10] else None,
-                        'modified_at': datetime.fromisoformat(row[11]) if len(row) > 11 and row[11] else None,
-                    }
-                    
-                    duplicate_file = DuplicateFile(
-                        file_id=file_data['id'],
-                        file_path=file_data['file_path'],
-                        file_name=file_data['file_name'],
-                        file_size=file_data['file_size'],
-                        sha256=file_data['sha256'],
-                        perceptual_hash=file_data['perceptual_hash'],
-                        file_type=file_data['file_type'],
-                        mime_type=file_data['mime_type'],
-                        width=file_data['width'],
-                        height=file_data['height'],
-                        created_at=file_data['created_at'],
-                        modified_at=file_data['modified_at']
-                    )
-                    files.append(duplicate_file)
-                    
+                    files.append(DuplicateFile(
+                        file_id=file_id,
+                        file_path=file_path,
+                        file_name=file_name,
+                        file_size=file_size or 0,
+                        sha256=sha256,
+                        perceptual_hash=perceptual_hash,
+                        file_type=file_type,
+                        mime_type=mime_type,
+                        width=width,
+                        height=height,
+                        created_at=datetime.fromisoformat(created_at) if created_at else None,
+                        modified_at=datetime.fromisoformat(modified_at) if modified_at else None
+                    ))
                 except Exception as e:
                     self.logger.debug(f"Skipping file due to conversion error: {e}")
                     continue
@@ -1538,22 +1900,194 @@ class FileScanner:
             self.logger.error(f"Failed to get files for enhanced detection: {e}")
             return []
     
+    def _enhanced_detection_query(self, file_filters: Optional[Dict[str, Any]] = None) -> Tuple[str, List[Any]]:
+        """Return the detection SELECT for the given filters, reusing the statement text across calls."""
+        file_filters = file_filters or {}
+        active = tuple(key for key, _ in DETECTION_FILTER_CLAUSES if key in file_filters)
+        has_dimensions = 'width' in self._column_cache and 'height' in self._column_cache
+        
+        # Identical SQL text hits sqlite3's per-connection statement cache instead of being re-prepared
+        cache_key = (active, has_dimensions)
+        query = self._detection_queries.get(cache_key)
+        if query is None:
+            # Name the columns so the row layout is fixed, even on databases without width/height
+            dimension_columns = "width, height" if has_dimensions else "NULL AS width, NULL AS height"
+            query = f"""
+                SELECT id, file_path, file_name, file_size, sha256, perceptual_hash,
+                       file_type, mime_type, {dimension_columns}, created_at, modified_at
+                FROM files WHERE 1=1
+            """ + ''.join(clause for key, clause in DETECTION_FILTER_CLAUSES if key in active)
+            self._detection_queries[cache_key] = query
+        
+        params = []
+        for key in active:
+            if key == 'file_types':
+                params.append(json.dumps(list(file_filters[key])))
+            elif key == 'path_pattern':
+                params.append(f"%{file_filters[key]}%")
+            else:
+                params.append(file_filters[key])
+        
+        return query, params
+    
     def find_similar_images(self, threshold: float = 80.0) -> List[Dict]:
         """Find similar images using perceptual hashing."""
         if not self._is_dependency_available('imagehash'):
             return []
         
-        # Get all image files with perceptual hashes
-        image_files = self.cursor.execute("""
-            SELECT id, file_path, file_name, perceptual_hash
+        # Get all image files with perceptual hashes; the binary copy saves parsing hex
+        hash_bits_column = 'perceptual_hash_bits' if 'perceptual_hash_bits' in self._column_cache else 'NULL'
+        rows = self.cursor.execute(f"""
+            SELECT id, file_path, file_name, perceptual_hash, {hash_bits_column}
             FROM files 
             WHERE perceptual_hash IS NOT NULL
-            AND file_type IN ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp')
+            AND file_type IN ({SIMILARITY_IMAGE_TYPES_SQL})
         """).fetchall()
         
-        if len(image_files) < 2:
+        if len(rows) < 2:
             return []
         
+        image_files = [row[:4] for row in rows]
+        
+        # Compare all hashes at once with NumPy when they share one length. Without NumPy,
+        # a BK-tree avoids comparing every pair; the pairwise imagehash comparison is the last resort.
+        hash_matrix = self._pack_perceptual_hashes([row[3] for row in rows], [row[4] for row in rows])
+        if hash_matrix is not None:
+            return self._find_similar_images_vectorized(image_files, hash_matrix, threshold)
+        
+        if self._is_dependency_available('pybktree') and self._has_uniform_hex_hashes(image_files):
+            return self._find_similar_images_bktree(image_files, threshold)
+        
+        return self._find_similar_images_pairwise(image_files, threshold)
+    
+    @staticmethod
+    def _has_uniform_hex_hashes(image_files: List[Tuple]) -> bool:
+        """Check that all perceptual hashes are valid hex strings of the same length."""
+        hash_length = len(image_files[0][3])
+        if not hash_length:
+            return False
+        try:
+            return all(len(row[3]) == hash_length and int(row[3], 16) >= 0 for row in image_files)
+        except ValueError:
+            return False
+    
+    def _pack_perceptual_hashes(self, hashes: List[str],
+                                hash_bits: Optional[List[Optional[bytes]]] = None) -> Optional[Any]:
+        """Pack perceptual hashes into an (N, hash_bytes) uint8 array, or None if not possible."""
+        if not self._is_dependency_available('numpy'):
+            return None
+        
+        # Stored binary hashes can be used as-is when every row has one of the same width
+        if hash_bits and hash_bits[0]:
+            bits_length = len(hash_bits[0])
+            if all(bits is not None and len(bits) == bits_length for bits in hash_bits):
+                return np.frombuffer(b''.join(hash_bits), dtype=np.uint8).reshape(len(hash_bits), bits_length)
+        
+        hash_length = len(hashes[0])
+        if not hash_length or any(len(h) != hash_length for h in hashes):
+            return None
+        
+        try:
+            packed = b''.join(bytes.fromhex(h) for h in hashes)
+        except ValueError:
+            return None
+        
+        return np.frombuffer(packed, dtype=np.uint8).reshape(len(hashes), hash_length // 2)
+    
+    @staticmethod
+    def _hamming_distances(hash_rows: Any, hash_row: Any) -> Any:
+        """Hamming distance between one packed hash and each row of a packed hash array."""
+        xor = np.bitwise_xor(hash_rows, hash_row)
+        if hasattr(np, 'bitwise_count'):  # NumPy >= 2.0 uses a native popcount
+            return np.bitwise_count(xor).sum(axis=1, dtype=np.int64)
+        return np.unpackbits(xor, axis=1).sum(axis=1, dtype=np.int64)
+    
+    def _find_similar_images_vectorized(self, image_files: List[Tuple], hash_matrix: Any,
+                                        threshold: float) -> List[Dict]:
+        """Group similar images, comparing each hash against all later hashes in one NumPy pass."""
+        max_distance = hash_matrix.shape[1] * 8
+        processed = np.zeros(len(image_files), dtype=bool)
+        similar_groups = []
+        
+        for i in range(len(image_files) - 1):
+            if processed[i]:
+                continue
+            
+            distances = self._hamming_distances(hash_matrix[i + 1:], hash_matrix[i])
+            similarities = np.round((max_distance - distances) / max_distance * 100, 1)
+            matches = np.flatnonzero((similarities >= threshold) & ~processed[i + 1:])
+            
+            if len(matches) == 0:
+                continue
+            
+            processed[matches + i + 1] = True
+            processed[i] = True
+            
+            group_images = [image_files[i]] + [image_files[i + 1 + j] for j in matches]
+            group_similarities = [100.0] + [float(similarities[j]) for j in matches]
+            similar_groups.append({
+                'images': group_images,
+                'similarities': group_similarities,
+                'avg_similarity': sum(group_similarities) / len(group_similarities)
+            })
+        
+        return similar_groups
+    
+    def _get_phash_tree(self, image_files: List[Tuple]) -> Any:
+        """Return a BK-tree over the perceptual hashes of image_files, reusing the cached tree if unchanged."""
+        if self._phash_tree is not None and self._phash_tree[0] == image_files:
+            return self._phash_tree[1]
+        
+        tree = pybktree.BKTree(
+            lambda a, b: (a[0] ^ b[0]).bit_count(),
+            [(int(row[3], 16), i) for i, row in enumerate(image_files)]
+        )
+        self._phash_tree = (image_files, tree)
+        return tree
+    
+    def _find_similar_images_bktree(self, image_files: List[Tuple], threshold: float) -> List[Dict]:
+        """Group similar images by querying a BK-tree for hashes within the threshold distance."""
+        hash_bits = len(image_files[0][3]) * 4
+        tree = self._get_phash_tree(image_files)
+        
+        # Similarities are rounded to one decimal, so search one bit wider and filter exactly below
+        search_distance = max(0, min(hash_bits, int((100 - threshold) / 100 * hash_bits) + 1))
+        processed = [False] * len(image_files)
+        similar_groups = []
+        
+        for i, row in enumerate(image_files):
+            if processed[i]:
+                continue
+            
+            matches = []
+            for distance, (_, j) in tree.find((int(row[3], 16), i), search_distance):
+                if j <= i or processed[j]:
+                    continue
+                similarity = round(max(0, (hash_bits - distance) / hash_bits * 100), 1)
+                if similarity >= threshold:
+                    matches.append((j, similarity))
+            
+            if not matches:
+                continue
+            
+            # Keep database order within the group, as the exhaustive scan does
+            matches.sort()
+            processed[i] = True
+            for j, _ in matches:
+                processed[j] = True
+            
+            group_images = [row] + [image_files[j] for j, _ in matches]
+            group_similarities = [100.0] + [similarity for _, similarity in matches]
+            similar_groups.append({
+                'images': group_images,
+                'similarities': group_similarities,
+                'avg_similarity': sum(group_similarities) / len(group_similarities)
+            })
+        
+        return similar_groups
+    
+    def _find_similar_images_pairwise(self, image_files: List[Tuple], threshold: float) -> List[Dict]:
+        """Group similar images by comparing perceptual hashes pair by pair."""
         similar_groups = []
         processed_ids = set()
         
@@ -1587,16 +2121,16 @@ class FileScanner:
     
     def get_statistics_report(self) -> Dict:
         """Generate comprehensive statistics report."""
-        if self.stats['start_time'] and self.stats['end_time']:
-            duration = (self.stats['end_time'] - self.stats['start_time']).total_seconds()
+        if self.stats.start_time and self.stats.end_time:
+            duration = (self.stats.end_time - self.stats.start_time).total_seconds()
         else:
             duration = 0
         
-        report = self.stats.copy()
+        report = self.stats.to_dict()
         report['scan_duration'] = duration
         report['success_rate'] = (
-            (self.stats['processed_files'] / max(self.stats['total_files'], 1)) * 100
-            if self.stats['total_files'] > 0 else 0
+            (self.stats.processed_files / max(self.stats.total_files, 1)) * 100
+            if self.stats.total_files > 0 else 0
         )
         
         return report
@@ -1609,7 +2143,7 @@ class FileScanner:
             error_types[error_type] = error_types.get(error_type, 0) + 1
         
         return {
-            'total_errors': self.stats['errors'],
+            'total_errors': self.stats.errors,
             'error_types': error_types,
             'error_details': self.error_details
         }
@@ -1617,13 +2151,12 @@ class FileScanner:
     def _initialize_column_cache(self):
         """Initialize cache of available database columns."""
         try:
-            self.cursor.execute("PRAGMA table_info(files)")
-            columns = self.cursor.fetchall()
-            self._column_cache = {col[1]: True for col in columns}
+            self._column_cache = frozenset(col[1] for col in self.cursor.execute("PRAGMA table_info(files)"))
             self.logger.debug(f"Column cache initialized with {len(self._column_cache)} columns")
         except sqlite3.Error as e:
             self.logger.error(f"Failed to initialize column cache: {e}")
-            self._column_cache = {}
+            self._column_cache = frozenset()
+        self._prepare_insert_statement()
     
     def close(self):
         """Close database connection."""
@@ -1698,6 +2231,8 @@ DEBUGGING OPTIONS:
   --test-db         Test database connection without scanning
   --dry-run         Scan files but don't write to database
   --progress        Show progress every N files (default: 100)
+  --hash-algo       Hash files over 100 MiB with sha256 or blake3 (default: sha256)
+  --quick-hash      Skip full hashes for files with a unique size and first 64 KiB
 
 TROUBLESHOOTING:
 
@@ -1871,6 +2406,111 @@ def print_scan_summary(scanner: FileScanner, show_errors: bool = False):
     print("=" * 60)
 
 
+def run_enhanced_detection(scanner: FileScanner, args):
+    """Run the detection engine over the scanned files and print its results."""
+    print(f"\n{'=' * 60}\nENHANCED DUPLICATE DETECTION:\n{'=' * 60}")
+    
+    if not args.dry_run:
+        # Build configuration
+        config = {
+            'perceptual_threshold': args.perceptual_threshold,
+            'min_confidence_threshold': args.min_confidence,
+            'metadata_fields': args.metadata_fields,
+            'size_tolerance': args.size_tolerance,
+            'time_tolerance': args.time_tolerance,
+            'max_results_per_group': args.max_results_per_group
+        }
+        
+        # Build file filters
+        file_filters = {}
+        if args.file_types:
+            file_filters['file_types'] = args.file_types
+        if args.min_file_size:
+            file_filters['min_size'] = args.min_file_size
+        if args.max_file_size:
+            file_filters['max_size'] = args.max_file_size
+        if args.path_pattern:
+            file_filters['path_pattern'] = args.path_pattern
+        
+        # Progress callback; updates are coalesced onto one line so the detector never waits on stdout
+        last = [0.0, -1]  # time of the last write, percentage shown (-1 when no progress line is open)
+        
+        def progress_callback(message: str, percentage: int):
+            if percentage < 0:
+                if last[1] >= 0:
+                    sys.stdout.write("\n")
+                    last[1] = -1
+                print(f"Error: {message}")
+                return
+            
+            now = time.monotonic()
+            changed = percentage != last[1]
+            if not changed and now - last[0] < PROGRESS_INTERVAL:
+                return
+            
+            last[0] = now
+            last[1] = percentage
+            sys.stdout.write(f"\rProgress: {message} ({percentage}%)")
+            if changed:
+                sys.stdout.flush()
+        
+        # Run enhanced detection
+        results = scanner.detect_duplicates_enhanced(
+            mode=args.detection_mode,
+            config=config,
+            file_filters=file_filters if file_filters else None,
+            progress_callback=progress_callback
+        )
+        if last[1] >= 0:
+            sys.stdout.write("\n")
+        
+        if results:
+            print_enhanced_detection_results(results, args.verbose)
+        else:
+            print("Enhanced duplicate detection failed or returned no results")
+    else:
+        print("DRY RUN: Would run enhanced duplicate detection here")
+
+
+def run_legacy_analysis(scanner: FileScanner, args):
+    """Print the legacy SHA256 duplicate or cosine similarity analysis for the scanned files."""
+    if args.mode == 'duplicates' and (args.duplicates or args.verbose):
+        print(f"\n{'=' * 50}\nLEGACY DUPLICATE FILES ANALYSIS:\n{'=' * 50}")
+        
+        if not args.dry_run:
+            duplicates = scanner.find_duplicates()
+            if duplicates:
+                lines = [f"Found {len(duplicates)} groups of duplicate files:"]
+                for i, group in enumerate(duplicates, 1):
+                    lines.append(f"\nDuplicate Group {i}:")
+                    lines.append(f"  Hash: {group['sha256']}")
+                    lines.append(f"  Files ({group['count']}):")
+                    for file_info in group['files']:
+                        lines.append(f"    - {file_info['file_path']} ({file_info['file_size']} bytes)")
+                print("\n".join(lines))
+            else:
+                print("No duplicate files found!")
+        else:
+            print("DRY RUN: Would analyze duplicates here")
+    
+    elif args.mode == 'similarity':
+        print(f"\n{'=' * 50}\nLEGACY SIMILAR IMAGES ANALYSIS (Threshold: {args.similarity_threshold}%):\n{'=' * 50}")
+        
+        if not args.dry_run:
+            similar_groups = scanner.find_similar_images_cosine(args.similarity_threshold)
+            if similar_groups:
+                lines = [f"Found {len(similar_groups)} groups of similar images:"]
+                for i, group in enumerate(similar_groups, 1):
+                    lines.append(f"\nSimilar Group {i} (Avg: {group['avg_similarity']:.1f}%):")
+                    for img, similarity in zip(group['images'], group['similarities']):
+                        lines.append(f"  {similarity:5.1f}% - {img[2]} ({img[1]})")  # name, path
+                print("\n".join(lines))
+            else:
+                print("No similar images found above the threshold!")
+        else:
+            print("DRY RUN: Would analyze similar images here")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='RAG Smart Folder Scanner - Scan directories for files and detect duplicates/similarities',
@@ -1901,6 +2541,10 @@ Examples:
                        help='Scan directories recursively (default: True)')
     parser.add_argument('--mode', choices=['duplicates', 'similarity'], default='duplicates',
                        help='Legacy scan mode: duplicates or similarity detection (default: duplicates)')
+    parser.add_argument('--hash-algo', choices=HASH_ALGORITHMS, default='sha256',
+                       help='Content hash for files over 100 MiB; blake3 is multithreaded (default: sha256)')
+    parser.add_argument('--quick-hash', action='store_true',
+                       help='Only fully hash files whose size and first 64 KiB match another file')
     parser.add_argument('--similarity-threshold', type=float, default=80.0,
                        help='Similarity threshold percentage for image comparison (default: 80.0)')
     
@@ -1995,33 +2639,41 @@ Examples:
             args.use_enhanced = True
             print("Enhanced duplicate detection available and enabled by default")
     
-    # Initialize scanner with enhanced configuration
-    print(f"Initializing scanner...")
-    print(f"  Scan path: {args.path}")
-    print(f"  Database: {args.db}")
+    use_enhanced = args.use_enhanced and ENHANCED_DETECTION_AVAILABLE
+    
+    # Initialize scanner with enhanced configuration; the banner is written in one go
+    banner = [
+        "Initializing scanner...",
+        f"  Scan path: {args.path}",
+        f"  Database: {args.db}",
+    ]
     
-    if args.use_enhanced and ENHANCED_DETECTION_AVAILABLE:
-        print(f"  Detection Mode: {args.detection_mode} (enhanced)")
-        print(f"  Perceptual Threshold: {args.perceptual_threshold}%")
-        print(f"  Min Confidence: {args.min_confidence}%")
+    if use_enhanced:
+        banner.append(f"  Detection Mode: {args.detection_mode} (enhanced)")
+        banner.append(f"  Perceptual Threshold: {args.perceptual_threshold}%")
+        banner.append(f"  Min Confidence: {args.min_confidence}%")
         if args.file_types:
-            print(f"  File Types Filter: {', '.join(args.file_types)}")
+            banner.append(f"  File Types Filter: {', '.join(args.file_types)}")
         if args.min_file_size or args.max_file_size:
             size_filter = []
             if args.min_file_size:
                 size_filter.append(f"min: {args.min_file_size:,} bytes")
             if args.max_file_size:
                 size_filter.append(f"max: {args.max_file_size:,} bytes")
-            print(f"  Size Filter: {', '.join(size_filter)}")
+            banner.append(f"  Size Filter: {', '.join(size_filter)}")
     else:
-        print(f"  Mode: {args.mode} (legacy)")
+        banner.append(f"  Mode: {args.mode} (legacy)")
         if args.mode == 'similarity':
-            print(f"  Similarity Threshold: {args.similarity_threshold}%")
+            banner.append(f"  Similarity Threshold: {args.similarity_threshold}%")
     
     if args.dry_run:
-        print("  DRY RUN MODE - No database changes will be made")
+        banner.append("  DRY RUN MODE - No database changes will be made")
     
-    scanner = FileScanner(args.db, dry_run=args.dry_run)
+    # Flush so the banner shows before the scan even when stdout is a pipe
+    sys.stdout.write("\n".join(banner) + "\n")
+    sys.stdout.flush()
+    
+    scanner = FileScanner(args.db, dry_run=args.dry_run, hash_algo=args.hash_algo, quick_hash=args.quick_hash)
     
     # Set progress reporting interval
     if args.progress > 0:
@@ -2041,93 +2693,9 @@ Examples:
         # Print scan summary
         print_scan_summary(scanner, args.show_errors)
         
-        # Handle duplicate detection
-        if args.use_enhanced and ENHANCED_DETECTION_AVAILABLE:
-            print("\n" + "=" * 60)
-            print("ENHANCED DUPLICATE DETECTION:")
-            print("=" * 60)
-            
-            if not args.dry_run:
-                # Build configuration
-                config = {
-                    'perceptual_threshold': args.perceptual_threshold,
-                    'min_confidence_threshold': args.min_confidence,
-                    'metadata_fields': args.metadata_fields,
-                    'size_tolerance': args.size_tolerance,
-                    'time_tolerance': args.time_tolerance,
-                    'max_results_per_group': args.max_results_per_group
-                }
-                
-                # Build file filters
-                file_filters = {}
-                if args.file_types:
-                    file_filters['file_types'] = args.file_types
-                if args.min_file_size:
-                    file_filters['min_size'] = args.min_file_size
-                if args.max_file_size:
-                    file_filters['max_size'] = args.max_file_size
-                if args.path_pattern:
-                    file_filters['path_pattern'] = args.path_pattern
-                
-                # Progress callback
-                def progress_callback(message: str, percentage: int):
-                    if percentage >= 0:
-                        print(f"Progress: {message} ({percentage}%)")
-                    else:
-                        print(f"Error: {message}")
-                
-                # Run enhanced detection
-                results = scanner.detect_duplicates_enhanced(
-                    mode=args.detection_mode,
-                    config=config,
-                    file_filters=file_filters if file_filters else None,
-                    progress_callback=progress_callback
-                )
-                
-                if results:
-                    print_enhanced_detection_results(results, args.verbose)
-                else:
-                    print("Enhanced duplicate detection failed or returned no results")
-            else:
-                print("DRY RUN: Would run enhanced duplicate detection here")
-        
-        elif args.mode == 'duplicates' and (args.duplicates or args.verbose):
-            print("\n" + "=" * 50)
-            print("LEGACY DUPLICATE FILES ANALYSIS:")
-            print("=" * 50)
-            
-            if not args.dry_run:
-                duplicates = scanner.find_duplicates()
-                if duplicates:
-                    print(f"Found {len(duplicates)} groups of duplicate files:")
-                    for i, group in enumerate(duplicates, 1):
-                        print(f"\nDuplicate Group {i}:")
-                        print(f"  Hash: {group['sha256']}")
-                        print(f"  Files ({group['count']}):")
-                        for file_info in group['files']:
-                            print(f"    - {file_info['file_path']} ({file_info['file_size']} bytes)")
-                else:
-                    print("No duplicate files found!")
-            else:
-                print("DRY RUN: Would analyze duplicates here")
-        
-        elif args.mode == 'similarity':
-            print("\n" + "=" * 50)
-            print(f"LEGACY SIMILAR IMAGES ANALYSIS (Threshold: {args.similarity_threshold}%):")
-            print("=" * 50)
-            
-            if not args.dry_run:
-                similar_groups = scanner.find_similar_images_cosine(args.similarity_threshold)
-                if similar_groups:
-                    print(f"Found {len(similar_groups)} groups of similar images:")
-                    for i, group in enumerate(similar_groups, 1):
-                        print(f"\nSimilar Group {i} (Avg: {group['avg_similarity']:.1f}%):")
-                        for img, similarity in zip(group['images'], group['similarities']):
-                            print(f"  {similarity:5.1f}% - {img[2]} ({img[1]})")  # name, path
-                else:
-                    print("No similar images found above the threshold!")
-            else:
-                print("DRY RUN: Would analyze similar images here")
+        # Duplicate detection strategy, chosen once
+        run_detection = run_enhanced_detection if use_enhanced else run_legacy_analysis
+        run_detection(scanner, args)
         
         # Success message
         if args.verbose:
@@ -4,340 +4,277 @@ Simple Local Duplicate Image Preview Tool
 Displays duplicate images locally without any external dependencies.
 """
 
+import html
+import io
 import os
 import sys
 import sqlite3
-import webbrowser
-import tempfile
-from pathlib import Path
+import stat
+import time
+from types import SimpleNamespace
 from typing import List, Dict, Any, Optional
-import argparse
-from datetime import datetime
+from urllib.parse import quote
+from itertools import groupby
+from operator import itemgetter
 
 
-class SimpleDuplicatePreviewTool:
-    """Simple tool for previewing duplicate images locally."""
+# Mount point of the host home directory inside the Docker container
+CONTAINER_HOME_PREFIX = '/app/host_home/'
+
+# Extensions shown by --images-only
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'})
+
+
+def _file_extension(file_name: str) -> str:
+    """Lowercased extension of a file name, as Path(file_name).suffix without building a Path."""
+    dot = file_name.rfind('.')
+    if 0 < dot < len(file_name) - 1:
+        return file_name[dot:].lower()
+    return ''
+
+
+# Cached previews live in a per-user directory, never in the shared temp directory
+PREVIEW_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'rag-smart-folder', 'duplicate_preview'
+)
+PREVIEW_CACHE_MAX_FILES = 20  # Newest cached previews kept when a new one is written
+PREVIEW_CACHE_MAX_AGE = 7 * 24 * 3600  # Seconds before a cached preview or leftover partial is deleted
+
+
+def _is_own_regular_file(path: str) -> bool:
+    """Whether path is a regular file (not a symlink) owned by the current user."""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    if not stat.S_ISREG(st.st_mode):
+        return False
+    # Windows has no uids; the cache directory there is already private to the user profile
+    return not hasattr(os, 'getuid') or st.st_uid == os.getuid()
+
+
+def _prune_preview_cache(keep: str):
+    """Delete cached previews older than PREVIEW_CACHE_MAX_AGE or beyond the newest PREVIEW_CACHE_MAX_FILES."""
+    try:
+        names = os.listdir(PREVIEW_CACHE_DIR)
+    except OSError:
+        return
     
-    def __init__(self, db_path: str = "data/dev.db"):
-        self.db_path = db_path
-        self.temp_dir = None
-        
-    def translate_container_path_to_host(self, container_path: str) -> str:
-        """Translate Docker container path to host path."""
-        if not container_path:
-            return container_path
-        
-        # Handle Docker container path translation
-        if container_path.startswith('/app/host_home/'):
-            # Get the user's home directory
-            import os
-            user_home = os.environ.get('HOME', '/Users/shankaraswal')
-            if not user_home.endswith('/'):
-                user_home += '/'
-            return container_path.replace('/app/host_home/', user_home)
-        
-        # If it's already a host path, return as-is
-        return container_path
-        
-    def get_duplicates_from_db(self, mode: str = "exact") -> Dict[str, Any]:
-        """Get duplicate detection results directly from database."""
+    previews = []
+    partials = []
+    for name in names:
+        path = os.path.join(PREVIEW_CACHE_DIR, name)
+        if path == keep or not _is_own_regular_file(path):
+            continue
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            # Get duplicate groups
-            if mode == "exact":
-                # Find files with same SHA256
-                cursor.execute("""
-                    SELECT sha256, COUNT(*) as count, GROUP_CONCAT(id) as file_ids
-                    FROM files 
-                    WHERE sha256 IS NOT NULL 
-                    GROUP BY sha256 
-                    HAVING COUNT(*) > 1
-                    ORDER BY count DESC
-                """)
-            else:
-                # Find files with similar perceptual hashes
-                cursor.execute("""
-                    SELECT perceptual_hash, COUNT(*) as count, GROUP_CONCAT(id) as file_ids
-                    FROM files 
-                    WHERE perceptual_hash IS NOT NULL 
-                    GROUP BY perceptual_hash 
-                    HAVING COUNT(*) > 1
-                    ORDER BY count DESC
-                """)
-            
-            groups = []
-            for row in cursor.fetchall():
-                hash_value, count, file_ids_str = row
-                file_ids = [int(fid) for fid in file_ids_str.split(',')]
-                
-                # Get file details
-                placeholders = ','.join(['?' for _ in file_ids])
-                cursor.execute(f"""
-                    SELECT id, file_path, file_name, file_size, file_type, width, height
-                    FROM files 
-                    WHERE id IN ({placeholders})
-                    ORDER BY file_size ASC
-                """, file_ids)
-                
-                files = []
-                min_size = None
-                for file_row in cursor.fetchall():
-                    file_id, file_path, file_name, file_size, file_type, width, height = file_row
-                    if min_size is None or file_size < min_size:
-                        min_size = file_size
-                    # Translate container path to host path
-                    translated_path = self.translate_container_path_to_host(file_path)
-                    files.append({
-                        "id": file_id,
-                        "path": translated_path,
-                        "name": file_name,
-                        "size": file_size,
-                        "type": file_type,
-                        "width": width if width else None,
-                        "height": height if height else None,
-                        "is_original": False  # Will be set below
-                    })
-                
-                # Mark the smallest file as original
-                for file in files:
-                    if file["size"] == min_size:
-                        file["is_original"] = True
-                
-                groups.append({
-                    "id": hash_value,
-                    "detection_method": "sha256" if mode == "exact" else "perceptual",
-                    "confidence_score": 100.0 if mode == "exact" else 85.0,
-                    "similarity_percentage": 100.0 if mode == "exact" else 85.0,
-                    "file_count": count,
-                    "files": files
-                })
-            
-            conn.close()
-            
-            return {
-                "session_id": f"local_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                "detection_mode": mode,
-                "summary": {
-                    "total_groups_found": len(groups),
-                    "total_duplicates_found": sum(len(g["files"]) for g in groups)
-                },
-                "duplicate_groups": groups
-            }
-            
-        except sqlite3.Error as e:
-            print(f"Database error: {e}")
-            return None
-    
-    def filter_image_duplicates(self, duplicates_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Filter to only show image duplicates."""
-        if not duplicates_data or "duplicate_groups" not in duplicates_data:
-            return duplicates_data
-        
-        image_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff', '.webp'}
-        
-        filtered_groups = []
-        for group in duplicates_data["duplicate_groups"]:
-            image_files = []
-            for file in group["files"]:
-                file_ext = Path(file["name"]).suffix.lower()
-                if file_ext in image_extensions:
-                    image_files.append(file)
-            
-            if len(image_files) > 1:  # Only include groups with multiple images
-                filtered_groups.append({
-                    **group,
-                    "files": image_files,
-                    "file_count": len(image_files)
-                })
-        
-        return {
-            **duplicates_data,
-            "duplicate_groups": filtered_groups,
-            "summary": {
-                **duplicates_data.get("summary", {}),
-                "total_groups_found": len(filtered_groups),
-                "total_duplicates_found": sum(len(g["files"]) for g in filtered_groups)
-            }
-        }
-    
-    def create_html_preview(self, duplicates_data: Dict[str, Any], output_path: Optional[str] = None) -> str:
-        """Create an HTML file to preview duplicate images locally."""
-        if not duplicates_data or "duplicate_groups" not in duplicates_data:
-            print("No duplicate data available.")
-            return ""
-        
-        # Create temporary directory for HTML file
-        if not self.temp_dir:
-            self.temp_dir = tempfile.mkdtemp(prefix="duplicate_preview_")
-        
-        if not output_path:
-            output_path = os.path.join(self.temp_dir, "duplicate_preview.html")
-        
-        html_content = self._generate_html_content(duplicates_data)
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        return output_path
+            mtime = os.lstat(path).st_mtime
+        except OSError:
+            continue
+        if name.startswith('duplicate_preview_') and name.endswith('.html'):
+            previews.append((mtime, path))
+        elif name.startswith('.duplicate_preview_') and name.endswith('.tmp'):
+            # Left behind by a killed run; a recent one may still be in use by another run
+            partials.append((mtime, path))
     
-    def _generate_html_content(self, duplicates_data: Dict[str, Any]) -> str:
-        """Generate HTML content for the preview."""
-        groups = duplicates_data.get("duplicate_groups", [])
-        summary = duplicates_data.get("summary", {})
-        
-        html = f"""
+    # The preview being kept counts towards the limit
+    previews.sort(reverse=True)
+    kept = PREVIEW_CACHE_MAX_FILES - 1
+    cutoff = time.time() - PREVIEW_CACHE_MAX_AGE
+    stale = previews[kept:] + [entry for entry in previews[:kept] + partials if entry[0] < cutoff]
+    for _, path in stale:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+# Command that opens a file with the desktop's default application (Windows uses os.startfile)
+FILE_OPENER = 'open' if sys.platform == 'darwin' else 'xdg-open'
+
+
+def _open_in_browser(html_path: str):
+    """Open a local HTML file with the platform opener, using webbrowser only when none is installed."""
+    if sys.platform == 'win32':
+        os.startfile(html_path)
+        return
+    import subprocess
+    try:
+        subprocess.Popen([FILE_OPENER, html_path], stdout=subprocess.DEVNULL,
+                         stderr=subprocess.DEVNULL, start_new_session=True)
+    except FileNotFoundError:
+        import webbrowser
+        webbrowser.open(f"file://{html_path}")
+
+
+# (divisor, label) per power of 1024; larger sizes stay in MB
+SIZE_UNITS = ((1, 'B'), (1024, 'KB'), (1024 * 1024, 'MB'))
+
+
+def _format_size(file_size: int) -> str:
+    """Human readable size for a preview card, picking the unit from the bit length."""
+    if not file_size:
+        return "Unknown"
+    unit = min((file_size.bit_length() - 1) // 10, len(SIZE_UNITS) - 1)
+    if unit == 0:
+        return f"{file_size} B"
+    divisor, label = SIZE_UNITS[unit]
+    return f"{file_size / divisor:.1f} {label}"
+
+
+# Static page fragments, encoded once at import
+PAGE_HEAD_START = """
 <!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Duplicate Images Preview - {summary.get('total_groups_found', 0)} Groups Found</title>
+    <title>Duplicate Images Preview - """.encode('utf-8')
+PAGE_STYLE_AND_HEADER = """
     <style>
-        * {{
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
         
-        body {{
+        body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
             background: #f5f5f5;
             color: #333;
             line-height: 1.6;
-        }}
+        }
         
-        .header {{
+        .header {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
             padding: 2rem;
             text-align: center;
             box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        }}
+        }
         
-        .header h1 {{
+        .header h1 {
             font-size: 2.5rem;
             margin-bottom: 0.5rem;
-        }}
+        }
         
-        .header .stats {{
+        .header .stats {
             font-size: 1.1rem;
             opacity: 0.9;
-        }}
+        }
         
-        .container {{
+        .container {
             max-width: 1400px;
             margin: 0 auto;
             padding: 2rem;
-        }}
+        }
         
-        .group {{
+        .group {
             background: white;
             border-radius: 12px;
             margin-bottom: 2rem;
             box-shadow: 0 4px 6px rgba(0,0,0,0.1);
             overflow: hidden;
-        }}
+        }
         
-        .group-header {{
+        .group-header {
             background: #f8f9fa;
             padding: 1rem 1.5rem;
             border-bottom: 1px solid #e9ecef;
             display: flex;
             justify-content: space-between;
             align-items: center;
-        }}
+        }
         
-        .group-info {{
+        .group-info {
             display: flex;
             gap: 1rem;
             align-items: center;
-        }}
+        }
         
-        .group-id {{
+        .group-id {
             font-weight: bold;
             color: #495057;
-        }}
+        }
         
-        .group-meta {{
+        .group-meta {
             display: flex;
             gap: 1rem;
             font-size: 0.9rem;
             color: #6c757d;
-        }}
+        }
         
-        .confidence-badge {{
+        .confidence-badge {
             background: #28a745;
             color: white;
             padding: 0.25rem 0.75rem;
             border-radius: 20px;
             font-size: 0.8rem;
             font-weight: bold;
-        }}
+        }
         
-        .images-grid {{
+        .images-grid {
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
             gap: 1rem;
             padding: 1.5rem;
-        }}
+        }
         
-        .image-card {{
+        .image-card {
             background: #f8f9fa;
             border-radius: 8px;
             overflow: hidden;
             border: 2px solid transparent;
             transition: all 0.3s ease;
-        }}
+        }
         
-        .image-card:hover {{
+        .image-card:hover {
             transform: translateY(-2px);
             box-shadow: 0 8px 25px rgba(0,0,0,0.15);
-        }}
+        }
         
-        .image-card.original {{
+        .image-card.original {
             border-color: #28a745;
-        }}
+        }
         
-        .image-container {{
+        .image-container {
             position: relative;
             width: 100%;
             height: 200px;
             overflow: hidden;
             background: #e9ecef;
-        }}
+        }
         
-        .image-container img {{
+        .image-container img {
             width: 100%;
             height: 100%;
             object-fit: cover;
             transition: transform 0.3s ease;
-        }}
+        }
         
-        .image-container:hover img {{
+        .image-container:hover img {
             transform: scale(1.05);
-        }}
+        }
         
-        .image-info {{
+        .image-info {
             padding: 1rem;
-        }}
+        }
         
-        .image-name {{
+        .image-name {
             font-weight: bold;
             margin-bottom: 0.5rem;
             word-break: break-all;
-        }}
+        }
         
-        .image-details {{
+        .image-details {
             font-size: 0.85rem;
             color: #6c757d;
             display: grid;
             grid-template-columns: 1fr 1fr;
             gap: 0.5rem;
-        }}
+        }
         
-        .original-badge {{
+        .original-badge {
             background: #28a745;
             color: white;
             padding: 0.2rem 0.5rem;
@@ -346,131 +283,67 @@ class SimpleDuplicatePreviewTool:
             font-weight: bold;
             display: inline-block;
             margin-top: 0.5rem;
-        }}
+        }
         
-        .no-images {{
+        .no-images {
             text-align: center;
             padding: 3rem;
             color: #6c757d;
             font-style: italic;
-        }}
+        }
         
-        .error-message {{
+        .error-message {
             background: #f8d7da;
             color: #721c24;
             padding: 1rem;
             border-radius: 8px;
             margin: 1rem 0;
             border: 1px solid #f5c6cb;
-        }}
+        }
         
-        .loading {{
+        .loading {
             text-align: center;
             padding: 2rem;
             color: #6c757d;
-        }}
+        }
         
-        @media (max-width: 768px) {{
-            .images-grid {{
+        @media (max-width: 768px) {
+            .images-grid {
                 grid-template-columns: 1fr;
-            }}
+            }
             
-            .header h1 {{
+            .header h1 {
                 font-size: 2rem;
-            }}
+            }
             
-            .container {{
+            .container {
                 padding: 1rem;
-            }}
-        }}
+            }
+        }
     </style>
 </head>
 <body>
     <div class="header">
         <h1>🔍 Duplicate Images Preview</h1>
         <div class="stats">
-            Found {summary.get('total_groups_found', 0)} groups with {summary.get('total_duplicates_found', 0)} duplicate images
+            Found """.encode('utf-8')
+PAGE_CONTAINER_OPEN = """
         </div>
     </div>
     
     <div class="container">
-"""
-        
-        if not groups:
-            html += """
+""".encode('utf-8')
+PAGE_NO_IMAGES = """
         <div class="no-images">
             <h2>No duplicate images found</h2>
             <p>Try adjusting the detection mode or confidence threshold.</p>
         </div>
-"""
-        else:
-            for i, group in enumerate(groups):
-                html += f"""
-        <div class="group">
-            <div class="group-header">
-                <div class="group-info">
-                    <span class="group-id">Group {i + 1}</span>
-                    <div class="group-meta">
-                        <span>📁 {group.get('file_count', 0)} files</span>
-                        <span>🎯 {group.get('detection_method', 'unknown')}</span>
-                        <span>📊 {group.get('similarity_percentage', 0):.1f}% similar</span>
-                    </div>
-                </div>
-                <div class="confidence-badge">
-                    {group.get('confidence_score', 0):.0f}% confidence
-                </div>
-            </div>
-            
-            <div class="images-grid">
-"""
-                
-                for file in group.get('files', []):
-                    is_original = file.get('is_original', False)
-                    file_path = file.get('path', '')
-                    file_name = file.get('name', '')
-                    file_size = file.get('size', 0)
-                    width = file.get('width')
-                    height = file.get('height')
-                    
-                    # Format file size
-                    if file_size:
-                        if file_size < 1024:
-                            size_str = f"{file_size} B"
-                        elif file_size < 1024 * 1024:
-                            size_str = f"{file_size / 1024:.1f} KB"
-                        else:
-                            size_str = f"{file_size / (1024 * 1024):.1f} MB"
-                    else:
-                        size_str = "Unknown"
-                    
-                    # Create file:// URL for local file
-                    file_url = f"file://{file_path}"
-                    
-                    html += f"""
-                <div class="image-card{' original' if is_original else ''}">
-                    <div class="image-container">
-                        <img src="{file_url}" alt="{file_name}" 
-                             onerror="this.style.display='none'; this.parentElement.innerHTML='<div style=\\'padding: 20px; text-align: center; color: #6c757d;\\'>Image not accessible<br><small>{file_name}</small></div>';">
-                    </div>
-                    <div class="image-info">
-                        <div class="image-name">{file_name}</div>
-                        <div class="image-details">
-                            <span>Size: {size_str}</span>
-                            <span>Type: {file.get('type', 'Unknown')}</span>
-                            {f'<span>Dimensions: {width}×{height}</span>' if width and height else ''}
-                            <span>Path: {file_path}</span>
-                        </div>
-                        {f'<div class="original-badge">Original (smallest)</div>' if is_original else ''}
-                    </div>
-                </div>
-"""
-                
-                html += """
+""".encode('utf-8')
+PAGE_GROUP_CLOSE = """
             </div>
         </div>
-"""
-        
-        html += """
+""".encode('utf-8')
+PAGE_END = """
     </div>
     
     <script>
@@ -501,14 +374,306 @@ class SimpleDuplicatePreviewTool:
     </script>
 </body>
 </html>
+""".encode('utf-8')
+
+
+class SimpleDuplicatePreviewTool:
+    """Simple tool for previewing duplicate images locally."""
+    
+    def __init__(self, db_path: str = "data/dev.db"):
+        self.db_path = db_path
+        self.temp_dir = None
+        # Host home directory that container paths are translated to, resolved once
+        self._host_home_prefix = os.environ.get('HOME', '/Users/shankaraswal').rstrip('/') + '/'
+        
+    def translate_container_path_to_host(self, container_path: str) -> str:
+        """Translate Docker container path to host path."""
+        if not container_path:
+            return container_path
+        
+        # Handle Docker container path translation
+        if container_path.startswith(CONTAINER_HOME_PREFIX):
+            return self._host_home_prefix + container_path[len(CONTAINER_HOME_PREFIX):]
+        
+        # If it's already a host path, return as-is
+        return container_path
+        
+    def get_duplicates_from_db(self, mode: str = "exact") -> Dict[str, Any]:
+        """Get duplicate detection results directly from database."""
+        from datetime import datetime
+        
+        try:
+            # The preview only reads, so open the database read-only; SQLite can then skip
+            # write locking and read pages through a memory map instead of pread calls
+            conn = sqlite3.connect(f"file:{quote(os.path.abspath(self.db_path))}?mode=ro", uri=True)
+            conn.execute("PRAGMA query_only = ON")
+            conn.execute("PRAGMA mmap_size = 268435456")
+            # Keep the GROUP BY sort in memory with a larger page cache
+            conn.execute("PRAGMA cache_size = -65536")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            cursor = conn.cursor()
+            
+            # Exact mode groups files with the same SHA256, similar mode with the same perceptual hash
+            hash_column = "sha256" if mode == "exact" else "perceptual_hash"
+            
+            # Fetch every file of every duplicate group in one query
+            cursor.execute(f"""
+                SELECT f.{hash_column}, f.id, f.file_path, f.file_name, f.file_size, f.file_type, f.width, f.height
+                FROM files f
+                JOIN (
+                    SELECT {hash_column}, COUNT(*) AS count
+                    FROM files 
+                    WHERE {hash_column} IS NOT NULL 
+                    GROUP BY {hash_column} 
+                    HAVING COUNT(*) > 1
+                ) d USING ({hash_column})
+                ORDER BY d.count DESC, f.{hash_column}, f.file_size ASC
+            """)
+            
+            groups = []
+            # Iterate the cursor so only the current group's rows are held, not the whole result
+            for hash_value, group_rows in groupby(cursor, key=itemgetter(0)):
+                files = []
+                min_size = None
+                for _, file_id, file_path, file_name, file_size, file_type, width, height in group_rows:
+                    if min_size is None or file_size < min_size:
+                        min_size = file_size
+                    # Translate container path to host path
+                    translated_path = self.translate_container_path_to_host(file_path)
+                    files.append({
+                        "id": file_id,
+                        "path": translated_path,
+                        "name": file_name,
+                        "size": file_size,
+                        "type": file_type,
+                        "width": width if width else None,
+                        "height": height if height else None,
+                        "is_original": False  # Will be set below
+                    })
+                
+                # Mark the smallest file as original
+                for file in files:
+                    if file["size"] == min_size:
+                        file["is_original"] = True
+                
+                groups.append({
+                    "id": hash_value,
+                    "detection_method": "sha256" if mode == "exact" else "perceptual",
+                    "confidence_score": 100.0 if mode == "exact" else 85.0,
+                    "similarity_percentage": 100.0 if mode == "exact" else 85.0,
+                    "file_count": len(files),
+                    "files": files
+                })
+            
+            conn.close()
+            
+            return {
+                "session_id": f"local_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+                "detection_mode": mode,
+                "summary": {
+                    "total_groups_found": len(groups),
+                    "total_duplicates_found": sum(len(g["files"]) for g in groups)
+                },
+                "duplicate_groups": groups
+            }
+            
+        except sqlite3.Error as e:
+            print(f"Database error: {e}")
+            return None
+    
+    def filter_image_duplicates(self, duplicates_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Filter to only show image duplicates."""
+        if not duplicates_data or "duplicate_groups" not in duplicates_data:
+            return duplicates_data
+        
+        # Shallow copies updated in place are cheaper than rebuilding each dict by unpacking
+        filtered_groups = []
+        total_files = 0
+        for group in duplicates_data["duplicate_groups"]:
+            image_files = [file for file in group["files"] if _file_extension(file["name"]) in IMAGE_EXTENSIONS]
+            
+            if len(image_files) > 1:  # Only include groups with multiple images
+                filtered_group = group.copy()
+                filtered_group["files"] = image_files
+                filtered_group["file_count"] = len(image_files)
+                filtered_groups.append(filtered_group)
+                total_files += len(image_files)
+        
+        summary = duplicates_data.get("summary", {}).copy()
+        summary["total_groups_found"] = len(filtered_groups)
+        summary["total_duplicates_found"] = total_files
+        
+        filtered_data = duplicates_data.copy()
+        filtered_data["duplicate_groups"] = filtered_groups
+        filtered_data["summary"] = summary
+        return filtered_data
+    
+    def cached_preview_path(self, mode: str, images_only: bool) -> str:
+        """Cache file path keyed on the database state and options, so an unchanged database reuses its preview."""
+        import hashlib
+        parts = [os.path.abspath(self.db_path), mode, str(images_only), self._host_home_prefix]
+        # Pending WAL writes change the data without touching the main database file; an empty
+        # or missing WAL (as left behind by a checkpoint or a reader) has nothing to add
+        for path in (self.db_path, self.db_path + '-wal'):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if st.st_size:
+                parts.append(f"{st.st_mtime_ns}:{st.st_size}")
+        key = hashlib.blake2b("\0".join(parts).encode(), digest_size=16).hexdigest()
+        os.makedirs(PREVIEW_CACHE_DIR, mode=0o700, exist_ok=True)
+        return os.path.join(PREVIEW_CACHE_DIR, f"duplicate_preview_{key}.html")
+    
+    def create_html_preview(self, duplicates_data: Dict[str, Any], output_path: Optional[str] = None) -> str:
+        """Create an HTML file to preview duplicate images locally."""
+        if not duplicates_data or "duplicate_groups" not in duplicates_data:
+            print("No duplicate data available.")
+            return ""
+        
+        import tempfile
+        
+        # Create temporary directory for HTML file
+        if not self.temp_dir:
+            self.temp_dir = tempfile.mkdtemp(prefix="duplicate_preview_")
+        
+        if not output_path:
+            output_path = os.path.join(self.temp_dir, "duplicate_preview.html")
+        
+        # Write straight to the file instead of building the whole page in memory; the rename
+        # keeps an interrupted run from leaving a partial page where a cached one is looked up.
+        # mkstemp creates the partial file exclusively, so a planted symlink is never followed.
+        fd, partial_path = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(output_path)), prefix=".duplicate_preview_", suffix=".tmp"
+        )
+        try:
+            with os.fdopen(fd, 'wb', buffering=1024 * 1024) as f:
+                self._write_html_content(f, duplicates_data)
+            os.replace(partial_path, output_path)
+        except BaseException:
+            os.unlink(partial_path)
+            raise
+        
+        return output_path
+    
+    def _generate_html_content(self, duplicates_data: Dict[str, Any]) -> str:
+        """Generate HTML content for the preview."""
+        buffer = io.BytesIO()
+        self._write_html_content(buffer, duplicates_data)
+        return buffer.getvalue().decode('utf-8')
+    
+    def _write_html_content(self, fp, duplicates_data: Dict[str, Any]):
+        """Write the preview HTML as UTF-8 to an open binary file, one group at a time."""
+        groups = duplicates_data.get("duplicate_groups", [])
+        summary = duplicates_data.get("summary", {})
+        
+        fp.write(PAGE_HEAD_START)
+        fp.write(f"{summary.get('total_groups_found', 0)} Groups Found</title>".encode('utf-8'))
+        fp.write(PAGE_STYLE_AND_HEADER)
+        fp.write(f"{summary.get('total_groups_found', 0)} groups with "
+                 f"{summary.get('total_duplicates_found', 0)} duplicate images".encode('utf-8'))
+        fp.write(PAGE_CONTAINER_OPEN)
+        
+        if not groups:
+            fp.write(PAGE_NO_IMAGES)
+        else:
+            missing_paths = self._find_missing_files(groups)
+            for i, group in enumerate(groups):
+                # Dynamic text is encoded once per group rather than per fragment
+                cards = "".join(self._format_image_card(file, file.get('path') in missing_paths)
+                                for file in group.get('files', []))
+                group_header = f"""
+        <div class="group">
+            <div class="group-header">
+                <div class="group-info">
+                    <span class="group-id">Group {i + 1}</span>
+                    <div class="group-meta">
+                        <span>📁 {group.get('file_count', 0)} files</span>
+                        <span>🎯 {group.get('detection_method', 'unknown')}</span>
+                        <span>📊 {group.get('similarity_percentage', 0):.1f}% similar</span>
+                    </div>
+                </div>
+                <div class="confidence-badge">
+                    {group.get('confidence_score', 0):.0f}% confidence
+                </div>
+            </div>
+            
+            <div class="images-grid">
 """
+                fp.write((group_header + cards).encode('utf-8'))
+                fp.write(PAGE_GROUP_CLOSE)
         
-        return html
+        fp.write(PAGE_END)
+    
+    @staticmethod
+    def _find_missing_files(groups: List[Dict[str, Any]]) -> set:
+        """Paths known to be missing, checked with one directory listing per parent folder."""
+        paths_by_dir: Dict[str, List[str]] = {}
+        for group in groups:
+            for file in group.get('files', []):
+                file_path = file.get('path')
+                if file_path:
+                    paths_by_dir.setdefault(os.path.dirname(file_path), []).append(file_path)
+        
+        missing = set()
+        for directory, file_paths in paths_by_dir.items():
+            try:
+                with os.scandir(directory or '.') as entries:
+                    present = {entry.name for entry in entries}
+            except OSError:
+                # Folder not visible from here (e.g. a host path while running in the container); let the browser try
+                continue
+            missing.update(file_path for file_path in file_paths if os.path.basename(file_path) not in present)
+        return missing
+    
+    def _format_image_card(self, file: Dict[str, Any], missing: bool = False) -> str:
+        """Render the preview card for one file; missing files get the placeholder without an image request."""
+        is_original = file.get('is_original', False)
+        file_path = file.get('path', '')
+        file_name = file.get('name', '')
+        file_size = file.get('size', 0)
+        width = file.get('width')
+        height = file.get('height')
+        
+        size_str = _format_size(file_size)
+        
+        # Escape each value once; the onerror fallback puts the name inside a JS string
+        # that is itself inside an attribute, so it is escaped for innerHTML, JS, then the attribute
+        file_name = html.escape(str(file_name))
+        fallback_name = html.escape(file_name.replace('\\', '\\\\'))
+        file_path = html.escape(str(file_path))
+        file_type = html.escape(str(file.get('type', 'Unknown')))
+        
+        if missing:
+            image = f"""<div style="padding: 20px; text-align: center; color: #6c757d;">Image not accessible<br><small>{file_name}</small></div>"""
+        else:
+            # Create file:// URL for local file
+            file_url = f"file://{file_path}"
+            image = f"""<img src="{file_url}" alt="{file_name}" 
+                             onerror="this.style.display='none'; this.parentElement.innerHTML='<div style=\\'padding: 20px; text-align: center; color: #6c757d;\\'>Image not accessible<br><small>{fallback_name}</small></div>';">"""
+        
+        return f"""
+                <div class="image-card{' original' if is_original else ''}">
+                    <div class="image-container">
+                        {image}
+                    </div>
+                    <div class="image-info">
+                        <div class="image-name">{file_name}</div>
+                        <div class="image-details">
+                            <span>Size: {size_str}</span>
+                            <span>Type: {file_type}</span>
+                            {f'<span>Dimensions: {width}×{height}</span>' if width and height else ''}
+                            <span>Path: {file_path}</span>
+                        </div>
+                        {f'<div class="original-badge">Original (smallest)</div>' if is_original else ''}
+                    </div>
+                </div>
+"""
     
     def open_preview(self, html_path: str):
         """Open the HTML preview in the default browser."""
         try:
-            webbrowser.open(f"file://{html_path}")
+            _open_in_browser(html_path)
             print(f"✅ Preview opened in browser: {html_path}")
         except Exception as e:
             print(f"❌ Could not open browser automatically: {e}")
@@ -525,41 +690,99 @@ class SimpleDuplicatePreviewTool:
                 print(f"Warning: Could not clean up temporary files: {e}")
 
 
-def main():
+# Command line defaults, shared by the argparse parser and the fast path
+DEFAULT_ARGS = {
+    "db": "data/dev.db",
+    "mode": "exact",
+    "images_only": False,
+    "no_browser": False,
+    "output": None,
+    "cleanup": False,
+    "no_cache": False,
+}
+
+# Options the fast path understands: option -> (destination, choices) for valued options, or destination for flags
+FAST_VALUE_OPTIONS = {"--db": ("db", None), "--mode": ("mode", ("exact", "similar")), "--output": ("output", None)}
+FAST_FLAG_OPTIONS = {"--images-only": "images_only", "--no-browser": "no_browser", "--cleanup": "cleanup",
+                     "--no-cache": "no_cache"}
+
+
+def build_parser():
+    """Build the full argparse parser, used for --help, errors and less common option forms."""
+    import argparse
     parser = argparse.ArgumentParser(description="Simple Local Duplicate Image Preview Tool")
-    parser.add_argument("--db", default="data/dev.db", help="Database path")
-    parser.add_argument("--mode", choices=["exact", "similar"], default="exact", 
+    parser.add_argument("--db", default=DEFAULT_ARGS["db"], help="Database path")
+    parser.add_argument("--mode", choices=["exact", "similar"], default=DEFAULT_ARGS["mode"], 
                        help="Detection mode")
     parser.add_argument("--images-only", action="store_true", help="Show only image duplicates")
     parser.add_argument("--no-browser", action="store_true", help="Don't open browser automatically")
     parser.add_argument("--output", help="Output HTML file path")
     parser.add_argument("--cleanup", action="store_true", help="Clean up temporary files on exit")
+    parser.add_argument("--no-cache", action="store_true",
+                       help="Regenerate the preview even if the database is unchanged")
+    return parser
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    """Parse the command line, only importing argparse when the plain option forms are not enough."""
+    argv = sys.argv[1:] if argv is None else argv
+    values = dict(DEFAULT_ARGS)
+    
+    i = 0
+    while i < len(argv):
+        option = argv[i]
+        if option in FAST_FLAG_OPTIONS:
+            values[FAST_FLAG_OPTIONS[option]] = True
+            i += 1
+            continue
+        
+        # Anything else (--help, --opt=value, abbreviations, missing or invalid values) goes to argparse
+        if option not in FAST_VALUE_OPTIONS or i + 1 >= len(argv) or argv[i + 1].startswith("-"):
+            return build_parser().parse_args(argv)
+        dest, choices = FAST_VALUE_OPTIONS[option]
+        if choices and argv[i + 1] not in choices:
+            return build_parser().parse_args(argv)
+        values[dest] = argv[i + 1]
+        i += 2
     
-    args = parser.parse_args()
+    return SimpleNamespace(**values)
+
+
+def main():
+    args = parse_args()
     
     tool = SimpleDuplicatePreviewTool(db_path=args.db)
     
     try:
-        print("🔍 Fetching duplicate detection results from database...")
-        
-        # Get duplicates directly from database
-        duplicates_data = tool.get_duplicates_from_db(args.mode)
+        # Without --output the page goes to a per-user cache file named after the database state
+        cache_path = None if args.output else tool.cached_preview_path(args.mode, args.images_only)
         
-        if not duplicates_data:
-            print("❌ No duplicate data found. Make sure you've scanned some files first.")
-            return
-        
-        if args.images_only:
-            duplicates_data = tool.filter_image_duplicates(duplicates_data)
-        
-        if not duplicates_data.get("duplicate_groups"):
-            print("❌ No duplicate images found.")
-            return
-        
-        print(f"✅ Found {len(duplicates_data['duplicate_groups'])} duplicate groups")
-        
-        # Create HTML preview
-        html_path = tool.create_html_preview(duplicates_data, args.output)
+        if cache_path and not args.no_cache and _is_own_regular_file(cache_path):
+            print("♻️  Database unchanged since the last preview, reusing it")
+            html_path = cache_path
+        else:
+            print("🔍 Fetching duplicate detection results from database...")
+            
+            # Get duplicates directly from database
+            duplicates_data = tool.get_duplicates_from_db(args.mode)
+            
+            if not duplicates_data:
+                print("❌ No duplicate data found. Make sure you've scanned some files first.")
+                return
+            
+            if args.images_only:
+                duplicates_data = tool.filter_image_duplicates(duplicates_data)
+            
+            if not duplicates_data.get("duplicate_groups"):
+                print("❌ No duplicate images found.")
+                return
+            
+            print(f"✅ Found {len(duplicates_data['duplicate_groups'])} duplicate groups")
+            
+            # Create HTML preview
+            html_path = tool.create_html_preview(duplicates_data, args.output or cache_path)
+            if cache_path and html_path:
+                _prune_preview_cache(keep=cache_path)
         
         if html_path:
             print(f"📄 HTML preview created: {html_path}")
@@ -6,8 +6,6 @@ Creates a small test folder and runs the scanner on it.
 
 import os
 import tempfile
-import shutil
-from pathlib import Path
 
 
 def create_test_files():
@@ -15,36 +13,29 @@ def create_test_files():
     test_dir = tempfile.mkdtemp(prefix="rag_test_")
     print(f"Created test directory: {test_dir}")
     
-    # Create some test files
+    # Create the subdirectory up front so every file can be written in one pass
+    os.makedirs(os.path.join(test_dir, "subfolder"), exist_ok=True)
+    
+    # Create some test files (paths relative to the test directory)
     test_files = [
-        ("test1.txt", "This is test file 1"),
-        ("test2.txt", "This is test file 2"),
-        ("duplicate1.txt", "This is duplicate content"),
-        ("duplicate2.txt", "This is duplicate content"),  # Same content as duplicate1
-        ("unique.txt", "This is unique content"),
+        ("test1.txt", b"This is test file 1"),
+        ("test2.txt", b"This is test file 2"),
+        ("duplicate1.txt", b"This is duplicate content"),
+        ("duplicate2.txt", b"This is duplicate content"),  # Same content as duplicate1
+        ("unique.txt", b"This is unique content"),
+        (os.path.join("subfolder", "sub1.txt"), b"Subfolder file 1"),
+        (os.path.join("subfolder", "sub2.txt"), b"Subfolder file 2"),
     ]
     
+    # Raw descriptors skip the text-mode wrapper each open() would build per file
     for filename, content in test_files:
-        file_path = os.path.join(test_dir, filename)
-        with open(file_path, 'w') as f:
-            f.write(content)
+        fd = os.open(os.path.join(test_dir, filename), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.write(fd, content)
+        finally:
+            os.close(fd)
         print(f"Created: {filename}")
     
-    # Create a subdirectory with more files
-    subdir = os.path.join(test_dir, "subfolder")
-    os.makedirs(subdir, exist_ok=True)
-    
-    sub_files = [
-        ("sub1.txt", "Subfolder file 1"),
-        ("sub2.txt", "Subfolder file 2"),
-    ]
-    
-    for filename, content in sub_files:
-        file_path = os.path.join(subdir, filename)
-        with open(file_path, 'w') as f:
-            f.write(content)
-        print(f"Created: {os.path.join('subfolder', filename)}")
-    
     return test_dir
 
 
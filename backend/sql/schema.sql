@@ -20,8 +20,9 @@ CREATE TABLE IF NOT EXISTS files (
 );
 
 -- Indexes for performance
-CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files(sha256);
-CREATE INDEX IF NOT EXISTS idx_files_perceptual_hash ON files(perceptual_hash);
+CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files(sha256) WHERE sha256 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_files_perceptual_hash ON files(perceptual_hash) WHERE perceptual_hash IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_files_size_sha256 ON files(file_size, sha256);
 CREATE INDEX IF NOT EXISTS idx_files_path ON files(file_path);
 CREATE INDEX IF NOT EXISTS idx_files_type ON files(file_type);
 
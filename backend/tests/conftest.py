@@ -3,134 +3,334 @@ Pytest configuration and fixtures for scanner tests.
 """
 
 import pytest
+import io
 import tempfile
 import os
 import sqlite3
-import shutil
+from contextlib import contextmanager
 from pathlib import Path
 from PIL import Image
-import json
 from datetime import datetime
+from types import MappingProxyType
+from unittest.mock import MagicMock
 
 
-@pytest.fixture
-def temp_db():
-    """Create a temporary database for testing."""
-    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as f:
+# Database fixtures live on a RAM-backed tmpfs when one is available; set
+# SCANNER_TEST_DB_DIR to force another directory (e.g. a real disk).
+# They stay real files rather than shared-cache "file:...?mode=memory" URIs: FileScanner
+# and MigrationManager open plain paths (no uri=True), the scanner switches to WAL, and
+# the backup and lock tests need a file on disk.
+TEST_DB_DIR = os.environ.get('SCANNER_TEST_DB_DIR') or (
+    '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else None
+)
+
+# Files SQLite and the scanner may leave next to a test database
+TEST_DB_SIDECAR_SUFFIXES = ('', '-wal', '-shm', '-journal', '.backup')
+
+
+def _remove_test_db(db_path):
+    """Remove a test database together with its journal and backup files."""
+    for suffix in TEST_DB_SIDECAR_SUFFIXES:
+        try:
+            os.unlink(db_path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skip benchmark tests unless pytest-benchmark is installed and --benchmark-only/--benchmark-enable is given."""
+    if config.pluginmanager.hasplugin('benchmark') and (
+        config.getoption('benchmark_only') or config.getoption('benchmark_enable')
+    ):
+        return
+    
+    skip_benchmark = pytest.mark.skip(reason="benchmarks run with pytest-benchmark and --benchmark-only")
+    for item in items:
+        if 'benchmark' in getattr(item, 'fixturenames', ()):
+            item.add_marker(skip_benchmark)
+
+
+# Pooled connections only write test data around the code under test: commits skip fsync,
+# but locking and journal mode stay default so the connections under test can share the file
+POOLED_CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous = OFF",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+class ConnectionPool:
+    """Reusable sqlite3 connections for test code, kept per database path until discarded."""
+    
+    def __init__(self):
+        self._idle = {}  # db_path -> list of idle connections
+    
+    @contextmanager
+    def checkout(self, db_path):
+        """Borrow a connection to db_path; uncommitted work is rolled back on return, as close() would."""
+        idle = self._idle.setdefault(db_path, [])
+        if idle:
+            conn = idle.pop()
+        else:
+            conn = sqlite3.connect(db_path)
+            for pragma in POOLED_CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+        try:
+            yield conn
+        finally:
+            conn.rollback()
+            idle.append(conn)
+    
+    def discard(self, db_path):
+        """Close the connections to db_path, before its files are removed."""
+        for conn in self._idle.pop(db_path, ()):
+            conn.close()
+    
+    def close_all(self):
+        """Close every pooled connection."""
+        for db_path in list(self._idle):
+            self.discard(db_path)
+
+
+@pytest.fixture(scope="session")
+def db_pool():
+    """Connection pool shared by the session; database fixtures discard their connections on teardown."""
+    pool = ConnectionPool()
+    
+    yield pool
+    
+    pool.close_all()
+
+
+# files table as created by the scanner, and the older layout without width/height
+FILES_TABLE_SQL = """
+    CREATE TABLE files (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        file_path TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        file_size INTEGER,
+        sha256 TEXT,
+        perceptual_hash TEXT,
+        file_type TEXT,
+        mime_type TEXT,
+        width INTEGER,
+        height INTEGER,
+        created_at TIMESTAMP,
+        modified_at TIMESTAMP,
+        metadata_json TEXT,
+        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+FILES_TABLE_NO_DIMENSIONS_SQL = """
+    CREATE TABLE files (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        file_path TEXT NOT NULL,
+        file_name TEXT NOT NULL,
+        file_size INTEGER,
+        sha256 TEXT,
+        perceptual_hash TEXT,
+        file_type TEXT,
+        mime_type TEXT,
+        created_at TIMESTAMP,
+        modified_at TIMESTAMP,
+        metadata_json TEXT,
+        added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+# Tables DuplicateDetectionService reads and writes
+DETECTION_SERVICE_TABLES_SQL = """
+    CREATE TABLE detection_results (
+        id INTEGER PRIMARY KEY,
+        session_id TEXT UNIQUE,
+        detection_mode TEXT,
+        total_files_scanned INTEGER,
+        total_groups_found INTEGER,
+        total_duplicates_found INTEGER,
+        detection_time_ms INTEGER,
+        config_json TEXT,
+        algorithm_performance_json TEXT,
+        errors_json TEXT,
+        success_rate REAL,
+        duplicate_percentage REAL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    
+    CREATE TABLE algorithm_performance (
+        id INTEGER PRIMARY KEY,
+        session_id TEXT,
+        algorithm_name TEXT,
+        files_processed INTEGER,
+        execution_time_ms INTEGER,
+        groups_found INTEGER,
+        errors_encountered INTEGER,
+        files_per_second REAL,
+        error_rate REAL
+    );
+    
+    CREATE TABLE duplicate_groups (
+        id INTEGER PRIMARY KEY,
+        group_hash TEXT,
+        duplicate_type TEXT,
+        similarity_score REAL,
+        detection_method TEXT,
+        confidence_score REAL,
+        session_id TEXT,
+        metadata_json TEXT
+    );
+    
+    CREATE TABLE duplicate_files (
+        id INTEGER PRIMARY KEY,
+        group_id INTEGER,
+        file_id INTEGER,
+        is_original BOOLEAN
+    );
+    
+    CREATE TABLE files (
+        id INTEGER PRIMARY KEY,
+        file_path TEXT,
+        file_name TEXT,
+        file_size INTEGER,
+        file_type TEXT
+    );
+"""
+
+
+@pytest.fixture(scope="session")
+def schema_templates():
+    """In-memory databases holding each fixture schema, built once per test session."""
+    templates = {}
+    for name, ddl in (('files', FILES_TABLE_SQL), ('files_no_dimensions', FILES_TABLE_NO_DIMENSIONS_SQL),
+                      ('detection_service', DETECTION_SERVICE_TABLES_SQL)):
+        conn = sqlite3.connect(':memory:')
+        conn.executescript(ddl)
+        templates[name] = conn
+    
+    yield templates
+    
+    for conn in templates.values():
+        conn.close()
+
+
+# Settings for connections that only build fixture databases: nothing needs to survive a
+# crash, so no fsyncs, an in-memory rollback journal and no lock release between writes
+TEST_DB_PRAGMAS = (
+    "PRAGMA synchronous = OFF",
+    "PRAGMA journal_mode = MEMORY",
+    "PRAGMA locking_mode = EXCLUSIVE",
+    "PRAGMA temp_store = MEMORY",
+)
+
+
+def _apply_test_pragmas(conn):
+    """Apply TEST_DB_PRAGMAS to a fixture setup connection (not to the connections under test)."""
+    for pragma in TEST_DB_PRAGMAS:
+        conn.execute(pragma).fetchone()
+
+
+def _clone_schema(template):
+    """Copy a schema template into a new temporary database file and return its path."""
+    with tempfile.NamedTemporaryFile(suffix='.db', dir=TEST_DB_DIR, delete=False) as f:
         db_path = f.name
     
-    # Create the database with schema
     conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Create basic files table
-    cursor.execute("""
-        CREATE TABLE files (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            file_path TEXT NOT NULL,
-            file_name TEXT NOT NULL,
-            file_size INTEGER,
-            sha256 TEXT,
-            perceptual_hash TEXT,
-            file_type TEXT,
-            mime_type TEXT,
-            width INTEGER,
-            height INTEGER,
-            created_at TIMESTAMP,
-            modified_at TIMESTAMP,
-            metadata_json TEXT,
-            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    conn.commit()
+    _apply_test_pragmas(conn)
+    template.backup(conn)
     conn.close()
+    return db_path
+
+
+@pytest.fixture
+def temp_db(schema_templates, db_pool):
+    """Create a temporary database for testing."""
+    db_path = _clone_schema(schema_templates['files'])
     
     yield db_path
     
     # Cleanup
-    if os.path.exists(db_path):
-        os.unlink(db_path)
+    db_pool.discard(db_path)
+    db_pool.discard(db_path + '.backup')
+    _remove_test_db(db_path)
 
 
 @pytest.fixture
-def temp_db_no_columns():
+def temp_db_no_columns(schema_templates, db_pool):
     """Create a temporary database without width/height columns for migration testing."""
-    with tempfile.NamedTemporaryFile(suffix='.db', delete=False) as f:
-        db_path = f.name
-    
-    # Create the database with old schema (no width/height)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        CREATE TABLE files (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            file_path TEXT NOT NULL,
-            file_name TEXT NOT NULL,
-            file_size INTEGER,
-            sha256 TEXT,
-            perceptual_hash TEXT,
-            file_type TEXT,
-            mime_type TEXT,
-            created_at TIMESTAMP,
-            modified_at TIMESTAMP,
-            metadata_json TEXT,
-            added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    conn.commit()
-    conn.close()
+    db_path = _clone_schema(schema_templates['files_no_dimensions'])
     
     yield db_path
     
     # Cleanup
-    if os.path.exists(db_path):
-        os.unlink(db_path)
+    db_pool.discard(db_path)
+    _remove_test_db(db_path)
 
 
 @pytest.fixture
-def test_files_dir():
-    """Create a temporary directory with test files."""
-    test_dir = tempfile.mkdtemp(prefix="scanner_test_")
-    
-    # Create various test files
-    test_files = {
-        'text_file.txt': 'This is a test text file',
-        'duplicate1.txt': 'This is duplicate content',
-        'duplicate2.txt': 'This is duplicate content',
-        'unique.txt': 'This is unique content',
-        'empty.txt': '',
-        'large_text.txt': 'A' * 10000,  # 10KB file
-    }
-    
-    for filename, content in test_files.items():
-        file_path = os.path.join(test_dir, filename)
-        with open(file_path, 'w') as f:
-            f.write(content)
-    
-    # Create a subdirectory
-    subdir = os.path.join(test_dir, 'subdir')
-    os.makedirs(subdir)
-    
-    with open(os.path.join(subdir, 'sub_file.txt'), 'w') as f:
-        f.write('Subdirectory file')
-    
-    # Create hidden files
-    with open(os.path.join(test_dir, '.hidden_file'), 'w') as f:
-        f.write('Hidden file content')
+def detection_db(schema_templates, db_pool):
+    """Create a temporary database with the duplicate detection service tables."""
+    db_path = _clone_schema(schema_templates['detection_service'])
     
-    yield test_dir
+    yield db_path
     
     # Cleanup
-    shutil.rmtree(test_dir, ignore_errors=True)
+    db_pool.discard(db_path)
+    _remove_test_db(db_path)
+
+
+@pytest.fixture(scope="session")
+def api_client():
+    """FastAPI test client shared by all endpoint tests."""
+    from fastapi.testclient import TestClient
+    from backend.app.main import app
+    
+    # Not entered as a context manager: the startup hook would initialise and migrate the real database
+    client = TestClient(app)
+    
+    yield client
+    
+    client.close()
+
+
+# Contents of test_files_dir, relative to the directory
+TEST_FILES = {
+    'text_file.txt': b'This is a test text file',
+    'duplicate1.txt': b'This is duplicate content',
+    'duplicate2.txt': b'This is duplicate content',
+    'unique.txt': b'This is unique content',
+    'empty.txt': b'',
+    'large_text.txt': b'A' * 10000,  # 10KB file
+    'subdir/sub_file.txt': b'Subdirectory file',
+    '.hidden_file': b'Hidden file content',
+}
 
 
 @pytest.fixture
-def test_images_dir():
-    """Create a temporary directory with test image files."""
-    test_dir = tempfile.mkdtemp(prefix="scanner_images_test_")
+def mocked_db():
+    """Database session mock for the get_db dependency override; works as its own context manager and queries return no rows."""
+    db = MagicMock()
+    db.__enter__.return_value = db
+    db.query.return_value.filter.return_value.all.return_value = []
+    return db
+
+
+@pytest.fixture
+def test_files_dir(tmp_path_factory):
+    """Create a temporary directory with test files."""
+    root = tmp_path_factory.mktemp("scanner_test")
+    (root / 'subdir').mkdir()
+    
+    # Create the test files, subdirectory and hidden files
+    for relative_path, content in TEST_FILES.items():
+        (root / relative_path).write_bytes(content)
+    
+    return str(root)
+
+
+@pytest.fixture(scope="session")
+def test_images_dir(tmp_path_factory):
+    """Create a temporary directory with test image files, shared by the whole session (tests only read it)."""
+    test_dir = str(tmp_path_factory.mktemp("scanner_images_test"))
     
     # Create test images
     images = [
@@ -141,77 +341,85 @@ def test_images_dir():
         ('grayscale.png', (100, 100), 'L'),
     ]
     
+    # Encode each distinct image once; the duplicates reuse the same bytes
+    encoded = {}
     for filename, size, mode in images:
-        img = Image.new(mode, size, color='red' if 'duplicate' in filename else 'blue')
-        img.save(os.path.join(test_dir, filename))
+        color = 'red' if 'duplicate' in filename else 'blue'
+        image_format = 'PNG' if filename.endswith('.png') else 'JPEG'
+        key = (size, mode, color, image_format)
+        if key not in encoded:
+            buffer = io.BytesIO()
+            Image.new(mode, size, color=color).save(buffer, format=image_format)
+            encoded[key] = buffer.getvalue()
+        Path(test_dir, filename).write_bytes(encoded[key])
     
     # Create a corrupted "image" file
-    with open(os.path.join(test_dir, 'corrupted.jpg'), 'wb') as f:
-        f.write(b'This is not a valid image file')
+    Path(test_dir, 'corrupted.jpg').write_bytes(b'This is not a valid image file')
     
-    yield test_dir
-    
-    # Cleanup
-    shutil.rmtree(test_dir, ignore_errors=True)
+    return test_dir
 
 
-@pytest.fixture
-def mixed_files_dir():
-    """Create a directory with mixed file types for comprehensive testing."""
-    test_dir = tempfile.mkdtemp(prefix="scanner_mixed_test_")
+@pytest.fixture(scope="session")
+def mixed_files_dir(tmp_path_factory):
+    """Create a directory with mixed file types for comprehensive testing, shared by the session (tests only read it)."""
+    root = tmp_path_factory.mktemp("scanner_mixed_test")
+    test_dir = str(root)
     
     # Text files
-    with open(os.path.join(test_dir, 'document.txt'), 'w') as f:
-        f.write('Document content')
+    (root / 'document.txt').write_bytes(b'Document content')
     
     # Image files
     img = Image.new('RGB', (100, 100), color='green')
-    img.save(os.path.join(test_dir, 'image.png'))
+    img.save(root / 'image.png')
     
     # Binary file
-    with open(os.path.join(test_dir, 'binary.bin'), 'wb') as f:
-        f.write(b'\x00\x01\x02\x03\x04\x05')
+    (root / 'binary.bin').write_bytes(b'\x00\x01\x02\x03\x04\x05')
     
     # JSON file
-    with open(os.path.join(test_dir, 'data.json'), 'w') as f:
-        json.dump({'test': 'data'}, f)
+    (root / 'data.json').write_bytes(b'{"test": "data"}')
     
     # Create files with permission issues (if possible)
-    restricted_file = os.path.join(test_dir, 'restricted.txt')
-    with open(restricted_file, 'w') as f:
-        f.write('Restricted content')
+    restricted_file = root / 'restricted.txt'
+    restricted_file.write_bytes(b'Restricted content')
     
-    # Try to make it read-only (may not work on all systems)
-    try:
-        os.chmod(restricted_file, 0o444)
-    except OSError:
-        pass  # Ignore if we can't change permissions
+    # Make it read-only; only POSIX permission bits mean anything here
+    restricted = False
+    if os.name == 'posix':
+        try:
+            os.chmod(restricted_file, 0o444)
+            restricted = True
+        except OSError:
+            pass  # Ignore if we can't change permissions
     
     yield test_dir
     
-    # Cleanup - restore permissions first
-    try:
-        os.chmod(restricted_file, 0o644)
-    except (OSError, FileNotFoundError):
-        pass
-    
-    shutil.rmtree(test_dir, ignore_errors=True)
+    # Restore permissions so pytest can prune the directory later
+    if restricted:
+        try:
+            os.chmod(restricted_file, 0o644)
+        except OSError:
+            pass
+
+
+# Read-only template for sample_file_metadata; timestamps are fixed so tests are repeatable
+SAMPLE_FILE_TIMESTAMP = datetime(2024, 1, 1)
+SAMPLE_FILE_METADATA = MappingProxyType({
+    'file_path': '/test/path/file.txt',
+    'file_name': 'file.txt',
+    'file_size': 1024,
+    'sha256': 'abc123def456',
+    'perceptual_hash': 'hash123',
+    'file_type': '.txt',
+    'mime_type': 'text/plain',
+    'width': None,
+    'height': None,
+    'created_at': SAMPLE_FILE_TIMESTAMP,
+    'modified_at': SAMPLE_FILE_TIMESTAMP,
+    'metadata_json': '{}',
+})
 
 
 @pytest.fixture
 def sample_file_metadata():
-    """Sample file metadata for testing."""
-    return {
-        'file_path': '/test/path/file.txt',
-        'file_name': 'file.txt',
-        'file_size': 1024,
-        'sha256': 'abc123def456',
-        'perceptual_hash': 'hash123',
-        'file_type': '.txt',
-        'mime_type': 'text/plain',
-        'width': None,
-        'height': None,
-        'created_at': datetime.now(),
-        'modified_at': datetime.now(),
-        'metadata_json': '{}',
-    }
\ No newline at end of file
+    """Sample file metadata for testing (a fresh copy tests may modify)."""
+    return dict(SAMPLE_FILE_METADATA)
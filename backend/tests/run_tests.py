@@ -6,12 +6,19 @@ Provides comprehensive testing with coverage reporting.
 
 import sys
 import os
-import subprocess
 import argparse
 from pathlib import Path
+from importlib.util import find_spec
 
 
-def run_tests(test_type='all', verbose=False, coverage=False, specific_test=None):
+SEPARATOR = "=" * 60
+
+# Benchmark runs fail when a mean is this much slower than the last run saved on the same machine
+BENCHMARK_MAX_REGRESSION = "mean:20%"
+
+
+def run_tests(test_type='all', verbose=False, coverage=False, specific_test=None, parallel=False,
+              maxfail=10, fail_fast=False, benchmark=False):
     """
     Run the test suite with specified options.
     
@@ -20,19 +27,39 @@ def run_tests(test_type='all', verbose=False, coverage=False, specific_test=None
         verbose: Enable verbose output
         coverage: Enable coverage reporting
         specific_test: Run specific test file or test function
+        parallel: Spread tests over all CPU cores with pytest-xdist
+        maxfail: Stop after this many failures (0 runs everything)
+        fail_fast: Stop on the first failure
+        benchmark: Run only the pytest-benchmark tests, comparing against the last saved run
     """
     
-    # Ensure we're in the right directory
-    test_dir = Path(__file__).parent
-    os.chdir(test_dir)
-    
-    # Build pytest command
-    cmd = ['python', '-m', 'pytest']
+    # Build pytest arguments
+    cmd = []
     
     # Add coverage if requested
     if coverage:
         cmd.extend(['--cov=../scripts', '--cov-report=html', '--cov-report=term'])
     
+    # Spread test files over all cores; whole files go to one worker because
+    # session fixtures (test client, schema templates, image directory) are shared within them
+    if parallel:
+        if find_spec('xdist') is None:
+            print("⚠️  pytest-xdist not installed, running tests serially")
+        else:
+            cmd.extend(['-n', 'auto', '--dist=loadfile'])
+    
+    # Benchmarks are skipped in ordinary runs; each benchmark run is saved (plus benchmark.json
+    # for CI) and, once a run exists for this machine, compared against the latest one
+    if benchmark:
+        if find_spec('pytest_benchmark') is None:
+            print("❌ pytest-benchmark not installed, cannot run benchmarks")
+            return False
+        from pytest_benchmark.utils import get_machine_id
+        
+        cmd.extend(['--benchmark-only', '--benchmark-autosave', '--benchmark-json=benchmark.json'])
+        if any((Path(__file__).parent / '.benchmarks' / get_machine_id()).glob('*.json')):
+            cmd.extend(['--benchmark-compare', f'--benchmark-compare-fail={BENCHMARK_MAX_REGRESSION}'])
+    
     # Add verbosity
     if verbose:
         cmd.append('-v')
@@ -61,29 +88,41 @@ def run_tests(test_type='all', verbose=False, coverage=False, specific_test=None
     cmd.extend([
         '--tb=short',  # Shorter traceback format
         '--strict-markers',  # Strict marker checking
-        '-x',  # Stop on first failure (remove for full run)
     ])
     
-    print(f"Running command: {' '.join(cmd)}")
-    print("=" * 60)
+    # Report as many failures as possible from one run, unless asked to stop early
+    if fail_fast:
+        cmd.append('-x')
+    elif maxfail:
+        cmd.append(f'--maxfail={maxfail}')
     
+    if verbose:
+        sys.stdout.write(f"Running command: pytest {' '.join(cmd)}\n{SEPARATOR}\n")
+    
+    # Run pytest in this interpreter rather than starting a second one,
+    # from the test directory so the relative paths above resolve
+    import pytest
+    
+    original_dir = os.getcwd()
+    os.chdir(Path(__file__).parent)
     try:
-        result = subprocess.run(cmd, check=False)
-        return result.returncode == 0
+        return pytest.main(cmd) == 0
     except KeyboardInterrupt:
         print("\nTests interrupted by user")
         return False
     except Exception as e:
         print(f"Error running tests: {e}")
         return False
+    finally:
+        os.chdir(original_dir)
 
 
 def check_dependencies():
     """Check if required test dependencies are installed."""
+    # sqlite3 ships with Python and is not checked
     required_packages = [
         'pytest',
         'PIL',  # Pillow
-        'sqlite3',  # Built-in
     ]
     
     optional_packages = [
@@ -92,22 +131,12 @@ def check_dependencies():
         'exifread',
         'numpy',
         'sklearn',
+        'pytest_benchmark',
     ]
     
-    missing_required = []
-    missing_optional = []
-    
-    for package in required_packages:
-        try:
-            __import__(package)
-        except ImportError:
-            missing_required.append(package)
-    
-    for package in optional_packages:
-        try:
-            __import__(package)
-        except ImportError:
-            missing_optional.append(package)
+    # find_spec only locates the packages; importing them would run numpy/sklearn start-up code
+    missing_required = [package for package in required_packages if find_spec(package) is None]
+    missing_optional = [package for package in optional_packages if find_spec(package) is None]
     
     if missing_required:
         print("❌ Missing required packages:")
@@ -149,6 +178,27 @@ def main():
         '--test', '-t',
         help='Run specific test file or test function'
     )
+    parser.add_argument(
+        '--parallel', '-p',
+        action='store_true',
+        help='Run tests in parallel with pytest-xdist'
+    )
+    parser.add_argument(
+        '--maxfail',
+        type=int,
+        default=10,
+        help='Stop after this many failures, 0 for no limit (default: 10)'
+    )
+    parser.add_argument(
+        '--fail-fast', '-x',
+        action='store_true',
+        help='Stop on the first failure'
+    )
+    parser.add_argument(
+        '--benchmark', '-b',
+        action='store_true',
+        help='Run only the benchmarks and fail on regressions against the last saved run'
+    )
     parser.add_argument(
         '--check-deps',
         action='store_true',
@@ -158,7 +208,7 @@ def main():
     args = parser.parse_args()
     
     print("🧪 Scanner Test Suite")
-    print("=" * 60)
+    print(SEPARATOR)
     
     # Check dependencies
     if not check_dependencies():
@@ -175,10 +225,14 @@ def main():
         test_type=args.type,
         verbose=args.verbose,
         coverage=args.coverage,
-        specific_test=args.test
+        specific_test=args.test,
+        parallel=args.parallel,
+        maxfail=args.maxfail,
+        fail_fast=args.fail_fast,
+        benchmark=args.benchmark
     )
     
-    print("=" * 60)
+    print(SEPARATOR)
     if success:
         print("✅ All tests passed!")
         sys.exit(0)
@@ -3,28 +3,76 @@ Unit tests for updated API endpoints.
 """
 
 import pytest
-from unittest.mock import Mock, patch
-from fastapi.testclient import TestClient
+from dataclasses import replace
+from types import SimpleNamespace
+from unittest.mock import Mock
 
-from backend.app.main import app
+from backend.app.db.database import get_db
 from backend.app.core.detection.models import DetectionResults, DetectionMode, DuplicateGroup, DuplicateFile, DetectionMethod, DetectionConfig
 
 
+# Defaults shared by the mocked detection results; tests replace only the fields they care about
+DEFAULT_CONFIG = DetectionConfig()
+EMPTY_RESULTS = DetectionResults(
+    session_id="",
+    detection_mode=DetectionMode.EXACT,
+    groups=[],
+    total_files_scanned=0,
+    total_groups_found=0,
+    total_duplicates_found=0,
+    detection_time_ms=0,
+    config=DEFAULT_CONFIG,
+    algorithm_performance={}
+)
+
+
+@pytest.fixture(autouse=True)
+def _override_get_db(api_client, mocked_db):
+    """Serve the mocked database session to every endpoint that depends on get_db."""
+    # Depends(get_db) is bound when the routes are declared, so patching the module name would not reach them
+    overrides = api_client.app.dependency_overrides
+    overrides[get_db] = lambda: mocked_db
+    
+    yield
+    
+    overrides.pop(get_db, None)
+
+
+@pytest.fixture
+def mock_service(monkeypatch):
+    """Service mock returned by every DuplicateDetectionService(...) the endpoints create."""
+    service = Mock()
+    monkeypatch.setattr('backend.app.services.duplicate_detection_service.DuplicateDetectionService', lambda *args, **kwargs: service)
+    return service
+
+
+def _image_record(image_id, **overrides):
+    """Stand-in for a files row as read by the /images endpoint (attribute access only)."""
+    fields = {
+        'id': image_id,
+        'file_name': f"image{image_id}.jpg",
+        'file_path': f"/test/image{image_id}.jpg",
+        'file_size': 1000,
+        'file_type': ".jpg",
+        'width': 1920,
+        'height': 1080,
+        'perceptual_hash': "abc123",
+        'added_at': None,
+    }
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
 class TestDuplicatesEndpoint:
     """Test the enhanced /duplicates endpoint."""
     
-    def setup_method(self):
-        """Setup test fixtures."""
-        self.client = TestClient(app)
+    @pytest.fixture(autouse=True)
+    def _use_api_client(self, api_client):
+        """Use the session-wide test client."""
+        self.client = api_client
     
-    @patch('backend.app.main.DuplicateDetectionService')
-    @patch('backend.app.main.get_db')
-    def test_duplicates_exact_mode(self, mock_get_db, mock_service_class):
+    def test_duplicates_exact_mode(self, mock_service):
         """Test duplicates endpoint with exact mode."""
-        # Setup mock service
-        mock_service = Mock()
-        mock_service_class.return_value = mock_service
-        
         # Create mock results
         file1 = DuplicateFile(1, "/test/file1.jpg", "file1.jpg", 1000)
         file2 = DuplicateFile(2, "/test/file2.jpg", "file2.jpg", 1000)
@@ -37,7 +85,8 @@ class TestDuplicatesEndpoint:
             files=[file1, file2]
         )
         
-        mock_results = DetectionResults(
+        mock_results = replace(
+            EMPTY_RESULTS,
             session_id="test_session",
             detection_mode=DetectionMode.EXACT,
             groups=[group],
@@ -45,7 +94,6 @@ class TestDuplicatesEndpoint:
             total_groups_found=1,
             total_duplicates_found=2,
             detection_time_ms=1000,
-            config=DetectionConfig(),
             algorithm_performance={"SHA256Detector": {"files_processed": 10}}
         )
         
@@ -69,13 +117,8 @@ class TestDuplicatesEndpoint:
         assert group_data["confidence_score"] == 100.0
         assert len(group_data["files"]) == 2
     
-    @patch('backend.app.main.DuplicateDetectionService')
-    @patch('backend.app.main.get_db')
-    def test_duplicates_similar_mode(self, mock_get_db, mock_service_class):
+    def test_duplicates_similar_mode(self, mock_service):
         """Test duplicates endpoint with similar mode."""
-        mock_service = Mock()
-        mock_service_class.return_value = mock_service
-        
         # Create mock results for similar detection
         file1 = DuplicateFile(1, "/test/img1.jpg", "img1.jpg", 1000, confidence_score=85.0)
         file2 = DuplicateFile(2, "/test/img2.jpg", "img2.jpg", 1000, confidence_score=85.0)
@@ -88,7 +131,8 @@ class TestDuplicatesEndpoint:
             files=[file1, file2]
         )
         
-        mock_results = DetectionResults(
+        mock_results = replace(
+            EMPTY_RESULTS,
             session_id="similar_session",
             detection_mode=DetectionMode.SIMILAR,
             groups=[group],
@@ -96,7 +140,6 @@ class TestDuplicatesEndpoint:
             total_groups_found=1,
             total_duplicates_found=2,
             detection_time_ms=2000,
-            config=DetectionConfig(),
             algorithm_performance={"PerceptualHashDetector": {"files_processed": 20}}
         )
         
@@ -112,23 +155,14 @@ class TestDuplicatesEndpoint:
         assert data["configuration"]["similarity_threshold"] == 85.0
         mock_service.detect_duplicates_similar.assert_called_once_with(similarity_threshold=85.0)
     
-    @patch('backend.app.main.DuplicateDetectionService')
-    @patch('backend.app.main.get_db')
-    def test_duplicates_comprehensive_mode(self, mock_get_db, mock_service_class):
+    def test_duplicates_comprehensive_mode(self, mock_service):
         """Test duplicates endpoint with comprehensive mode."""
-        mock_service = Mock()
-        mock_service_class.return_value = mock_service
-        
-        mock_results = DetectionResults(
+        mock_results = replace(
+            EMPTY_RESULTS,
             session_id="comprehensive_session",
             detection_mode=DetectionMode.COMPREHENSIVE,
-            groups=[],
             total_files_scanned=50,
-            total_groups_found=0,
-            total_duplicates_found=0,
-            detection_time_ms=5000,
-            config=DetectionConfig(),
-            algorithm_performance={}
+            detection_time_ms=5000
         )
         
         mock_service.detect_duplicates_comprehensive.return_value = mock_results
@@ -142,23 +176,14 @@ class TestDuplicatesEndpoint:
         assert data["configuration"]["confidence_threshold"] == 70.0
         mock_service.detect_duplicates_comprehensive.assert_called_once()
     
-    @patch('backend.app.main.DuplicateDetectionService')
-    @patch('backend.app.main.get_db')
-    def test_duplicates_metadata_mode(self, mock_get_db, mock_service_class):
+    def test_duplicates_metadata_mode(self, mock_service):
         """Test duplicates endpoint with metadata mode."""
-        mock_service = Mock()
-        mock_service_class.return_value = mock_service
-        
-        mock_results = DetectionResults(
+        mock_results = replace(
+            EMPTY_RESULTS,
             session_id="metadata_session",
             detection_mode=DetectionMode.METADATA,
-            groups=[],
             total_files_scanned=30,
-            total_groups_found=0,
-            total_duplicates_found=0,
-            detection_time_ms=3000,
-            config=DetectionConfig(),
-            algorithm_performance={}
+            detection_time_ms=3000
         )
         
         mock_service.detect_duplicates_metadata.return_value = mock_results
@@ -171,60 +196,35 @@ class TestDuplicatesEndpoint:
         assert data["detection_mode"] == "metadata"
         mock_service.detect_duplicates_metadata.assert_called_once()
     
-    @patch('backend.app.main.get_db')
-    def test_duplicates_invalid_mode(self, mock_get_db):
+    def test_duplicates_invalid_mode(self):
         """Test duplicates endpoint with invalid mode."""
         response = self.client.get("/duplicates?mode=invalid")
         
         assert response.status_code == 400
-        assert "Invalid detection mode" in response.json()["detail"]
+        assert b"Invalid detection mode" in response.content
     
-    @patch('backend.app.main.DuplicateDetectionService')
-    @patch('backend.app.main.get_db')
-    def test_duplicates_service_error(self, mock_get_db, mock_service_class):
+    def test_duplicates_service_error(self, mock_service):
         """Test duplicates endpoint with service error."""
-        mock_service = Mock()
-        mock_service_class.return_value = mock_service
         mock_service.detect_duplicates_exact.side_effect = Exception("Service error")
         
         response = self.client.get("/duplicates?mode=exact")
         
         assert response.status_code == 500
-        assert "Failed to find duplicates" in response.json()["detail"]
+        assert b"Failed to find duplicates" in response.content
 
 
 class TestImagesEndpoint:
     """Test the enhanced /images endpoint."""
     
-    def setup_method(self):
-        """Setup test fixtures."""
-        self.client = TestClient(app)
+    @pytest.fixture(autouse=True)
+    def _use_api_client(self, api_client):
+        """Use the session-wide test client."""
+        self.client = api_client
     
-    @patch('backend.app.main.DuplicateDetectionService')
-    @patch('backend.app.main.get_db')
-    def test_images_similar_mode(self, mock_get_db, mock_service_class):
+    def test_images_similar_mode(self, mock_service, mocked_db):
         """Test images endpoint with similar mode."""
-        # Setup mock database query
-        mock_db = Mock()
-        mock_get_db.return_value.__enter__.return_value = mock_db
-        
         # Mock image files
-        mock_image1 = Mock()
-        mock_image1.id = 1
-        mock_image1.file_name = "image1.jpg"
-        mock_image1.file_path = "/test/image1.jpg"
-        mock_image1.file_size = 1000
-        mock_image1.file_type = ".jpg"
-        mock_image1.width = 1920
-        mock_image1.height = 1080
-        mock_image1.perceptual_hash = "abc123"
-        mock_image1.added_at = None
-        
-        mock_db.query.return_value.filter.return_value.all.return_value = [mock_image1]
-        
-        # Setup mock service
-        mock_service = Mock()
-        mock_service_class.return_value = mock_service
+        mocked_db.query.return_value.filter.return_value.all.return_value = [_image_record(1)]
         
         # Create mock detection results
         file1 = DuplicateFile(1, "/test/image1.jpg", "image1.jpg", 1000, 
@@ -242,7 +242,8 @@ class TestImagesEndpoint:
             files=[file1, file2]
         )
         
-        mock_results = DetectionResults(
+        mock_results = replace(
+            EMPTY_RESULTS,
             session_id="image_session",
             detection_mode=DetectionMode.SIMILAR,
             groups=[group],
@@ -250,7 +251,6 @@ class TestImagesEndpoint:
             total_groups_found=1,
             total_duplicates_found=2,
             detection_time_ms=1500,
-            config=DetectionConfig(),
             algorithm_performance={"PerceptualHashDetector": {"files_processed": 2}}
         )
         
@@ -282,27 +282,13 @@ class TestImagesEndpoint:
         assert len(original_files) == 1
         assert original_files[0]["id"] == 1
     
-    @patch('backend.app.main.DuplicateDetectionService')
-    @patch('backend.app.main.get_db')
-    def test_images_exact_mode(self, mock_get_db, mock_service_class):
+    def test_images_exact_mode(self, mock_service):
         """Test images endpoint with exact mode."""
-        mock_db = Mock()
-        mock_get_db.return_value.__enter__.return_value = mock_db
-        mock_db.query.return_value.filter.return_value.all.return_value = []
-        
-        mock_service = Mock()
-        mock_service_class.return_value = mock_service
-        
-        mock_results = DetectionResults(
+        mock_results = replace(
+            EMPTY_RESULTS,
             session_id="exact_session",
             detection_mode=DetectionMode.EXACT,
-            groups=[],
-            total_files_scanned=0,
-            total_groups_found=0,
-            total_duplicates_found=0,
-            detection_time_ms=100,
-            config=DetectionConfig(),
-            algorithm_performance={}
+            detection_time_ms=100
         )
         
         mock_service.detect_duplicates_exact.return_value = mock_results
@@ -315,27 +301,13 @@ class TestImagesEndpoint:
         assert data["detection_mode"] == "exact"
         mock_service.detect_duplicates_exact.assert_called_once()
     
-    @patch('backend.app.main.DuplicateDetectionService')
-    @patch('backend.app.main.get_db')
-    def test_images_comprehensive_mode(self, mock_get_db, mock_service_class):
+    def test_images_comprehensive_mode(self, mock_service):
         """Test images endpoint with comprehensive mode."""
-        mock_db = Mock()
-        mock_get_db.return_value.__enter__.return_value = mock_db
-        mock_db.query.return_value.filter.return_value.all.return_value = []
-        
-        mock_service = Mock()
-        mock_service_class.return_value = mock_service
-        
-        mock_results = DetectionResults(
+        mock_results = replace(
+            EMPTY_RESULTS,
             session_id="comp_session",
             detection_mode=DetectionMode.COMPREHENSIVE,
-            groups=[],
-            total_files_scanned=0,
-            total_groups_found=0,
-            total_duplicates_found=0,
-            detection_time_ms=200,
-            config=DetectionConfig(),
-            algorithm_performance={}
+            detection_time_ms=200
         )
         
         mock_service.detect_duplicates_comprehensive.return_value = mock_results
@@ -348,56 +320,29 @@ class TestImagesEndpoint:
         assert data["detection_mode"] == "comprehensive"
         mock_service.detect_duplicates_comprehensive.assert_called_once()
     
-    @patch('backend.app.main.get_db')
-    def test_images_invalid_mode(self, mock_get_db):
+    def test_images_invalid_mode(self):
         """Test images endpoint with invalid detection mode."""
-        mock_db = Mock()
-        mock_get_db.return_value.__enter__.return_value = mock_db
-        mock_db.query.return_value.filter.return_value.all.return_value = []
-        
         response = self.client.get("/images?detection_mode=invalid")
         
         assert response.status_code == 400
-        assert "Invalid detection mode" in response.json()["detail"]
+        assert b"Invalid detection mode" in response.content
     
-    @patch('backend.app.main.DuplicateDetectionService')
-    @patch('backend.app.main.get_db')
-    def test_images_service_error(self, mock_get_db, mock_service_class):
+    def test_images_service_error(self, mock_service):
         """Test images endpoint with service error."""
-        mock_db = Mock()
-        mock_get_db.return_value.__enter__.return_value = mock_db
-        mock_db.query.return_value.filter.return_value.all.return_value = []
-        
-        mock_service = Mock()
-        mock_service_class.return_value = mock_service
         mock_service.detect_duplicates_similar.side_effect = Exception("Service error")
         
         response = self.client.get("/images")
         
         assert response.status_code == 500
-        assert "Failed to get images" in response.json()["detail"]
+        assert b"Failed to get images" in response.content
     
-    @patch('backend.app.main.DuplicateDetectionService')
-    @patch('backend.app.main.get_db')
-    def test_images_with_file_filters(self, mock_get_db, mock_service_class):
+    def test_images_with_file_filters(self, mock_service):
         """Test that images endpoint applies correct file filters."""
-        mock_db = Mock()
-        mock_get_db.return_value.__enter__.return_value = mock_db
-        mock_db.query.return_value.filter.return_value.all.return_value = []
-        
-        mock_service = Mock()
-        mock_service_class.return_value = mock_service
-        
-        mock_results = DetectionResults(
+        mock_results = replace(
+            EMPTY_RESULTS,
             session_id="filter_session",
             detection_mode=DetectionMode.SIMILAR,
-            groups=[],
-            total_files_scanned=0,
-            total_groups_found=0,
-            total_duplicates_found=0,
-            detection_time_ms=100,
-            config=DetectionConfig(),
-            algorithm_performance={}
+            detection_time_ms=100
         )
         
         mock_service.detect_duplicates_similar.return_value = mock_results
@@ -4,7 +4,6 @@ Unit tests for core detection engine components.
 
 import pytest
 from datetime import datetime
-from unittest.mock import Mock, patch
 import uuid
 
 from backend.app.core.detection.models import (
@@ -16,6 +15,26 @@ from backend.app.core.detection.config import ConfigManager
 from backend.app.core.detection.engine import DuplicateDetectionEngine, ResultsProcessor
 
 
+def _file_pair(**overrides):
+    """Build the two 1 KiB duplicates most tests group together."""
+    return (
+        DuplicateFile(1, "/test/file1.jpg", "file1.jpg", 1024, **overrides),
+        DuplicateFile(2, "/test/file2.jpg", "file2.jpg", 1024)
+    )
+
+
+@pytest.fixture(scope="module")
+def dup_pair():
+    """Shared file pair for tests that only read it."""
+    return _file_pair()
+
+
+@pytest.fixture
+def make_pair():
+    """Factory for fresh file pairs, for tests that mark originals."""
+    return _file_pair
+
+
 class TestDetectionConfig:
     """Test DetectionConfig validation and functionality."""
     
@@ -25,33 +44,18 @@ class TestDetectionConfig:
         errors = config.validate()
         assert errors == []
     
-    def test_invalid_perceptual_threshold(self):
-        """Test validation of perceptual threshold."""
-        config = DetectionConfig(perceptual_threshold=150.0)
-        errors = config.validate()
-        assert any("perceptual_threshold" in error for error in errors)
-    
-    def test_invalid_hash_size(self):
-        """Test validation of perceptual hash size."""
-        config = DetectionConfig(perceptual_hash_size=12)
-        errors = config.validate()
-        assert any("perceptual_hash_size" in error for error in errors)
-    
-    def test_invalid_feature_weights(self):
-        """Test validation of feature weights."""
-        config = DetectionConfig(
-            feature_weight_perceptual=0.5,
-            feature_weight_color=0.3,
-            feature_weight_edge=0.3  # Sum > 1.0
-        )
-        errors = config.validate()
-        assert any("feature weights" in error for error in errors)
-    
-    def test_negative_tolerances(self):
-        """Test validation of negative tolerance values."""
-        config = DetectionConfig(size_tolerance=-100, time_tolerance=-60)
-        errors = config.validate()
-        assert len(errors) >= 2
+    @pytest.mark.parametrize("kwargs,needles", [
+        (dict(perceptual_threshold=150.0), ["perceptual_threshold"]),
+        (dict(perceptual_hash_size=12), ["perceptual_hash_size"]),
+        (dict(feature_weight_perceptual=0.5, feature_weight_color=0.3,
+              feature_weight_edge=0.3), ["feature weights"]),  # Sum > 1.0
+        (dict(size_tolerance=-100, time_tolerance=-60), ["size_tolerance", "time_tolerance"]),
+    ], ids=["perceptual_threshold", "hash_size", "feature_weights", "negative_tolerances"])
+    def test_invalid_config(self, kwargs, needles):
+        """Test validation of out-of-range configuration values."""
+        errors = DetectionConfig(**kwargs).validate()
+        for needle in needles:
+            assert any(needle in error for error in errors)
 
 
 class TestDuplicateFile:
@@ -72,15 +76,32 @@ class TestDuplicateFile:
         assert file.file_path == "/test/file.jpg"
         assert file.confidence_score == 95.0
         assert file.detection_reasons == []
+    
+    def test_duplicate_file_identity_by_id(self):
+        """Test files compare and hash by database id only."""
+        file = DuplicateFile(1, "/test/file.jpg", "file.jpg", 1024)
+        same_id = DuplicateFile(1, "/other/copy.jpg", "copy.jpg", 2048, confidence_score=50.0)
+        
+        assert hash(file) == 1
+        assert file == same_id
+        assert file != DuplicateFile(2, "/test/file.jpg", "file.jpg", 1024)
+        assert len({file, same_id}) == 1
+    
+    def test_duplicate_file_uses_slots(self):
+        """Test that DuplicateFile instances carry no per-instance __dict__."""
+        file = DuplicateFile(1, "/test/file.jpg", "file.jpg", 1024)
+        
+        assert not hasattr(file, '__dict__')
+        with pytest.raises(AttributeError):
+            file.unknown_field = True
 
 
 class TestDuplicateGroup:
     """Test DuplicateGroup model."""
     
-    def test_create_duplicate_group(self):
+    def test_create_duplicate_group(self, dup_pair):
         """Test creating a DuplicateGroup with files."""
-        file1 = DuplicateFile(1, "/test/file1.jpg", "file1.jpg", 1024)
-        file2 = DuplicateFile(2, "/test/file2.jpg", "file2.jpg", 1024)
+        file1, file2 = dup_pair
         
         group = DuplicateGroup(
             id="group1",
@@ -93,34 +114,35 @@ class TestDuplicateGroup:
         assert group.file_count == 2
         assert group.total_size == 2048
     
-    def test_empty_group_raises_error(self):
-        """Test that empty group raises ValueError."""
-        with pytest.raises(ValueError, match="must contain at least one file"):
-            DuplicateGroup(
-                id="group1",
-                detection_method=DetectionMethod.SHA256,
-                confidence_score=100.0,
-                similarity_percentage=100.0,
-                files=[]
-            )
-    
-    def test_single_file_group_raises_error(self):
-        """Test that single file group raises ValueError."""
-        file1 = DuplicateFile(1, "/test/file1.jpg", "file1.jpg", 1024)
+    def test_duplicate_group_identity_by_id(self, dup_pair):
+        """Test groups compare and hash by group id only."""
+        group = DuplicateGroup("group1", DetectionMethod.SHA256, 100.0, 100.0, list(dup_pair))
+        rescored = DuplicateGroup("group1", DetectionMethod.PERCEPTUAL_HASH, 80.0, 80.0, list(dup_pair))
         
-        with pytest.raises(ValueError, match="must contain at least two files"):
+        assert group == rescored
+        assert {group: 1}[rescored] == 1
+    
+    @pytest.mark.parametrize("file_count,message", [
+        (0, "must contain at least one file"),
+        (1, "must contain at least two files"),
+    ], ids=["empty", "single_file"])
+    def test_undersized_group_raises_error(self, file_count, message):
+        """Test that groups with fewer than two files raise ValueError."""
+        files = [DuplicateFile(i, f"/test/file{i}.jpg", f"file{i}.jpg", 1024)
+                 for i in range(1, file_count + 1)]
+        
+        with pytest.raises(ValueError, match=message):
             DuplicateGroup(
                 id="group1",
                 detection_method=DetectionMethod.SHA256,
                 confidence_score=100.0,
                 similarity_percentage=100.0,
-                files=[file1]
+                files=files
             )
     
-    def test_suggested_original(self):
+    def test_suggested_original(self, make_pair):
         """Test suggested original file functionality."""
-        file1 = DuplicateFile(1, "/test/file1.jpg", "file1.jpg", 1024, is_original=True)
-        file2 = DuplicateFile(2, "/test/file2.jpg", "file2.jpg", 1024)
+        file1, file2 = make_pair(is_original=True)
         
         group = DuplicateGroup(
             id="group1",
@@ -190,6 +212,16 @@ class MockDetectionAlgorithm(DetectionAlgorithm):
         return [".jpg", ".png"]
 
 
+class StubAlgorithmRegistry:
+    """Registry stand-in that hands out a fixed list of algorithms."""
+    
+    def __init__(self, algorithms):
+        self._algorithms = algorithms
+    
+    def get_all_algorithms(self, config):
+        return self._algorithms
+
+
 class TestAlgorithmRegistry:
     """Test AlgorithmRegistry functionality."""
     
@@ -211,6 +243,40 @@ class TestAlgorithmRegistry:
         assert algorithm is not None
         assert isinstance(algorithm, MockDetectionAlgorithm)
     
+    def test_get_algorithm_reuses_instance_per_config(self):
+        """Test instances are reused for the same config object and rebuilt otherwise."""
+        registry = AlgorithmRegistry()
+        registry.register(MockDetectionAlgorithm)
+        config = DetectionConfig()
+        
+        algorithm = registry.get_algorithm("MockDetectionAlgorithm", config)
+        
+        assert registry.get_algorithm("MockDetectionAlgorithm", config) is algorithm
+        assert registry.get_algorithm("MockDetectionAlgorithm", DetectionConfig()) is not algorithm
+        
+        # Re-registering drops the cached instance
+        config = DetectionConfig()
+        algorithm = registry.get_algorithm("MockDetectionAlgorithm", config)
+        registry.register(MockDetectionAlgorithm)
+        assert registry.get_algorithm("MockDetectionAlgorithm", config) is not algorithm
+    
+    def test_get_algorithm_resets_metrics_of_reused_instance(self):
+        """Test a reused instance does not carry metrics over from the previous caller."""
+        registry = AlgorithmRegistry()
+        registry.register(MockDetectionAlgorithm)
+        config = DetectionConfig()
+        
+        algorithm = registry.get_algorithm("MockDetectionAlgorithm", config)
+        algorithm.run_detection([DuplicateFile(1, "/test/file1.jpg", "file1.jpg", 1000)])
+        first_metrics = algorithm.get_performance_metrics()
+        assert first_metrics.files_processed == 1
+        
+        reused = registry.get_algorithm("MockDetectionAlgorithm", config)
+        
+        assert reused is algorithm
+        assert reused.get_performance_metrics().files_processed == 0
+        assert first_metrics.files_processed == 1
+    
     def test_get_nonexistent_algorithm(self):
         """Test getting a non-existent algorithm."""
         registry = AlgorithmRegistry()
@@ -267,13 +333,12 @@ class TestResultsProcessor:
         consolidated = processor.consolidate_results([], config)
         assert consolidated == []
     
-    def test_filter_by_confidence_threshold(self):
+    def test_filter_by_confidence_threshold(self, make_pair):
         """Test filtering groups by confidence threshold."""
         processor = ResultsProcessor()
         config = DetectionConfig(min_confidence_threshold=80.0)
         
-        file1 = DuplicateFile(1, "/test/file1.jpg", "file1.jpg", 1024)
-        file2 = DuplicateFile(2, "/test/file2.jpg", "file2.jpg", 1024)
+        file1, file2 = make_pair()
         
         high_confidence_group = DuplicateGroup(
             id="high",
@@ -332,18 +397,16 @@ class TestDuplicateDetectionEngine:
         assert len(engine.algorithms) == 1
         assert engine.algorithms[0] == algorithm
     
-    @patch('backend.app.core.detection.engine.algorithm_registry')
-    def test_detect_duplicates_with_mock_algorithm(self, mock_registry):
+    def test_detect_duplicates_with_mock_algorithm(self, monkeypatch, make_pair):
         """Test duplicate detection with mock algorithm."""
-        # Setup mock registry
+        # Setup stub registry
         mock_algorithm = MockDetectionAlgorithm(DetectionConfig())
-        mock_registry.get_all_algorithms.return_value = [mock_algorithm]
+        monkeypatch.setattr('backend.app.core.detection.engine.algorithm_registry',
+                            StubAlgorithmRegistry([mock_algorithm]))
         
         engine = DuplicateDetectionEngine()
         
-        file1 = DuplicateFile(1, "/test/file1.jpg", "file1.jpg", 1024)
-        file2 = DuplicateFile(2, "/test/file2.jpg", "file2.jpg", 1024)
-        files = [file1, file2]
+        files = list(make_pair())
         
         results = engine.detect_duplicates(files, DetectionMode.EXACT)
         
@@ -352,12 +415,11 @@ class TestDuplicateDetectionEngine:
         assert results.detection_mode == DetectionMode.EXACT
         assert len(results.groups) == 1
     
-    def test_get_detection_report(self):
+    def test_get_detection_report(self, dup_pair):
         """Test generating detection report."""
         engine = DuplicateDetectionEngine()
         
-        file1 = DuplicateFile(1, "/test/file1.jpg", "file1.jpg", 1024)
-        file2 = DuplicateFile(2, "/test/file2.jpg", "file2.jpg", 1024)
+        file1, file2 = dup_pair
         
         group = DuplicateGroup(
             id="test_group",
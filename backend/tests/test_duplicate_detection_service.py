@@ -3,9 +3,9 @@ Unit tests for duplicate detection service layer.
 """
 
 import pytest
-import tempfile
-import sqlite3
 import json
+import itertools
+import timeit
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime
 
@@ -13,11 +13,19 @@ from backend.app.services.duplicate_detection_service import DuplicateDetectionS
 from backend.app.core.detection.models import DetectionConfig, DetectionMode, DetectionResults, DuplicateGroup, DuplicateFile, DetectionMethod
 from backend.app.models.file import File
 
+# Engine configs shared by the engine reuse tests; nothing mutates them
+CONFIG_THRESHOLD_85 = DetectionConfig(perceptual_threshold=85.0)
+CONFIG_THRESHOLD_90 = DetectionConfig(perceptual_threshold=90.0)
+
+# Enough groups/sessions per benchmark round to expose per-row query regressions
+BENCHMARK_ROW_COUNT = 1000
+
 
 class TestDuplicateDetectionService:
     """Test DuplicateDetectionService functionality."""
     
-    def setup_method(self):
+    @pytest.fixture(autouse=True)
+    def _setup(self):
         """Setup test fixtures."""
         # Create mock database session
         self.mock_db_session = Mock()
@@ -25,96 +33,10 @@ class TestDuplicateDetectionService:
         
         # Create service instance
         self.service = DuplicateDetectionService(self.mock_db_session)
-        
-        # Create temporary database for testing storage operations
-        self.temp_db = tempfile.NamedTemporaryFile(delete=False, suffix='.db')
-        self.temp_db.close()
-        self.temp_db_path = self.temp_db.name
-        
-        # Setup test database schema
-        self._setup_test_database()
-    
-    def teardown_method(self):
-        """Cleanup test fixtures."""
-        import os
-        if os.path.exists(self.temp_db_path):
-            os.unlink(self.temp_db_path)
-    
-    def _setup_test_database(self):
-        """Setup test database with required tables."""
-        with sqlite3.connect(self.temp_db_path) as conn:
-            # Create required tables for testing
-            conn.execute("""
-                CREATE TABLE detection_results (
-                    id INTEGER PRIMARY KEY,
-                    session_id TEXT UNIQUE,
-                    detection_mode TEXT,
-                    total_files_scanned INTEGER,
-                    total_groups_found INTEGER,
-                    total_duplicates_found INTEGER,
-                    detection_time_ms INTEGER,
-                    config_json TEXT,
-                    algorithm_performance_json TEXT,
-                    errors_json TEXT,
-                    success_rate REAL,
-                    duplicate_percentage REAL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            conn.execute("""
-                CREATE TABLE algorithm_performance (
-                    id INTEGER PRIMARY KEY,
-                    session_id TEXT,
-                    algorithm_name TEXT,
-                    files_processed INTEGER,
-                    execution_time_ms INTEGER,
-                    groups_found INTEGER,
-                    errors_encountered INTEGER,
-                    files_per_second REAL,
-                    error_rate REAL
-                )
-            """)
-            
-            conn.execute("""
-                CREATE TABLE duplicate_groups (
-                    id INTEGER PRIMARY KEY,
-                    group_hash TEXT,
-                    duplicate_type TEXT,
-                    similarity_score REAL,
-                    detection_method TEXT,
-                    confidence_score REAL,
-                    session_id TEXT,
-                    metadata_json TEXT
-                )
-            """)
-            
-            conn.execute("""
-                CREATE TABLE duplicate_files (
-                    id INTEGER PRIMARY KEY,
-                    group_id INTEGER,
-                    file_id INTEGER,
-                    is_original BOOLEAN
-                )
-            """)
-            
-            conn.execute("""
-                CREATE TABLE files (
-                    id INTEGER PRIMARY KEY,
-                    file_path TEXT,
-                    file_name TEXT,
-                    file_size INTEGER,
-                    file_type TEXT
-                )
-            """)
-            
-            conn.commit()
     
     def test_get_detection_engine(self):
         """Test getting detection engine with configuration."""
-        config = DetectionConfig(perceptual_threshold=85.0)
-        
-        engine = self.service.get_detection_engine(config)
+        engine = self.service.get_detection_engine(CONFIG_THRESHOLD_85)
         
         assert engine is not None
         assert engine.config.perceptual_threshold == 85.0
@@ -122,122 +44,43 @@ class TestDuplicateDetectionService:
     
     def test_get_detection_engine_reuse(self):
         """Test that detection engine is reused with same config."""
-        config = DetectionConfig(perceptual_threshold=85.0)
-        
-        engine1 = self.service.get_detection_engine(config)
-        engine2 = self.service.get_detection_engine(config)
+        engine1 = self.service.get_detection_engine(CONFIG_THRESHOLD_85)
+        engine2 = self.service.get_detection_engine(CONFIG_THRESHOLD_85)
         
         assert engine1 is engine2  # Should be the same instance
     
-    def test_get_detection_engine_new_config(self):
-        """Test that new engine is created with different config."""
-        config1 = DetectionConfig(perceptual_threshold=85.0)
-        config2 = DetectionConfig(perceptual_threshold=90.0)
-        
-        engine1 = self.service.get_detection_engine(config1)
-        engine2 = self.service.get_detection_engine(config2)
-        
-        assert engine1 is not engine2  # Should be different instances
-    
-    @patch('backend.app.services.duplicate_detection_service.DuplicateDetectionEngine')
-    def test_detect_duplicates_exact(self, mock_engine_class):
-        """Test exact duplicate detection."""
-        # Setup mock engine
-        mock_engine = Mock()
-        mock_results = Mock(spec=DetectionResults)
-        mock_engine.detect_duplicates.return_value = mock_results
-        mock_engine_class.return_value = mock_engine
-        
-        # Setup mock files
-        self._setup_mock_files()
-        
-        # Mock storage method
-        self.service._store_detection_results = Mock()
-        
-        results = self.service.detect_duplicates_exact()
-        
-        assert results == mock_results
-        mock_engine.detect_duplicates.assert_called_once()
-        args, kwargs = mock_engine.detect_duplicates.call_args
-        assert args[1] == DetectionMode.EXACT  # Detection mode
-        self.service._store_detection_results.assert_called_once_with(mock_results)
-    
-    @patch('backend.app.services.duplicate_detection_service.DuplicateDetectionEngine')
-    def test_detect_duplicates_similar(self, mock_engine_class):
-        """Test similar duplicate detection."""
-        mock_engine = Mock()
-        mock_results = Mock(spec=DetectionResults)
-        mock_engine.detect_duplicates.return_value = mock_results
-        mock_engine_class.return_value = mock_engine
-        
-        self._setup_mock_files()
-        self.service._store_detection_results = Mock()
-        
-        results = self.service.detect_duplicates_similar(similarity_threshold=85.0)
-        
-        assert results == mock_results
-        mock_engine.detect_duplicates.assert_called_once()
-        args, kwargs = mock_engine.detect_duplicates.call_args
-        assert args[1] == DetectionMode.SIMILAR
-        self.service._store_detection_results.assert_called_once_with(mock_results)
-    
-    @patch('backend.app.services.duplicate_detection_service.DuplicateDetectionEngine')
-    def test_detect_duplicates_comprehensive(self, mock_engine_class):
-        """Test comprehensive duplicate detection."""
-        mock_engine = Mock()
-        mock_results = Mock(spec=DetectionResults)
-        mock_engine.detect_duplicates.return_value = mock_results
-        mock_engine_class.return_value = mock_engine
+    def test_get_detection_engine_reuse_is_fast(self):
+        """Test that a cached engine is returned much faster than a new one is built."""
+        def build_engine():
+            self.service._engine = None
+            self.service.get_detection_engine(CONFIG_THRESHOLD_85)
         
-        self._setup_mock_files()
-        self.service._store_detection_results = Mock()
+        # Best of many single calls; the minimum is the least noisy estimate
+        build_time = min(timeit.repeat(build_engine, number=1, repeat=50))
         
-        config = DetectionConfig(min_confidence_threshold=70.0)
-        results = self.service.detect_duplicates_comprehensive(config=config)
+        # The last build above left the engine cached
+        reuse_time = min(timeit.repeat(
+            lambda: self.service.get_detection_engine(CONFIG_THRESHOLD_85), number=1, repeat=50
+        ))
         
-        assert results == mock_results
-        mock_engine.detect_duplicates.assert_called_once()
-        args, kwargs = mock_engine.detect_duplicates.call_args
-        assert args[1] == DetectionMode.COMPREHENSIVE
-        self.service._store_detection_results.assert_called_once_with(mock_results)
+        assert reuse_time < build_time * 0.5
     
-    @patch('backend.app.services.duplicate_detection_service.DuplicateDetectionEngine')
-    def test_detect_duplicates_metadata(self, mock_engine_class):
-        """Test metadata-based duplicate detection."""
-        mock_engine = Mock()
-        mock_results = Mock(spec=DetectionResults)
-        mock_engine.detect_duplicates.return_value = mock_results
-        mock_engine_class.return_value = mock_engine
-        
-        self._setup_mock_files()
-        self.service._store_detection_results = Mock()
-        
-        results = self.service.detect_duplicates_metadata(
-            metadata_fields=['file_size', 'width', 'height']
-        )
+    def test_get_detection_engine_new_config(self):
+        """Test that new engine is created with different config."""
+        engine1 = self.service.get_detection_engine(CONFIG_THRESHOLD_85)
+        engine2 = self.service.get_detection_engine(CONFIG_THRESHOLD_90)
         
-        assert results == mock_results
-        mock_engine.detect_duplicates.assert_called_once()
-        args, kwargs = mock_engine.detect_duplicates.call_args
-        assert args[1] == DetectionMode.METADATA
-        self.service._store_detection_results.assert_called_once_with(mock_results)
+        assert engine1 is not engine2  # Should be different instances
     
     def test_get_files_for_detection_no_filters(self):
         """Test getting files for detection without filters."""
         # Setup mock query
-        mock_file1 = Mock(spec=File)
-        mock_file1.id = 1
-        mock_file1.file_path = "/test/file1.jpg"
-        mock_file1.file_name = "file1.jpg"
-        mock_file1.file_size = 1024
-        mock_file1.sha256 = "abc123"
-        mock_file1.perceptual_hash = "def456"
-        mock_file1.file_type = ".jpg"
-        mock_file1.mime_type = "image/jpeg"
-        mock_file1.width = 1920
-        mock_file1.height = 1080
-        mock_file1.created_at = datetime.now()
-        mock_file1.modified_at = datetime.now()
+        now = datetime.now()
+        mock_file1 = Mock(
+            spec=File, id=1, file_path="/test/file1.jpg", file_name="file1.jpg", file_size=1024,
+            sha256="abc123", perceptual_hash="def456", file_type=".jpg", mime_type="image/jpeg",
+            width=1920, height=1080, created_at=now, modified_at=now
+        )
         
         mock_query = Mock()
         mock_query.all.return_value = [mock_file1]
@@ -270,11 +113,41 @@ class TestDuplicateDetectionService:
         assert mock_query.filter.call_count == 4  # One for each filter
         assert len(files) == 0  # Empty result from mock
     
-    def test_store_detection_results(self):
-        """Test storing detection results in database."""
-        # Override database path for testing
+    def test_config_to_dict(self):
+        """Test converting DetectionConfig to dictionary."""
+        config = DetectionConfig(
+            perceptual_threshold=85.0,
+            metadata_fields=['file_size', 'modified_at'],
+            min_confidence_threshold=70.0
+        )
+        
+        config_dict = self.service._config_to_dict(config)
+        
+        assert config_dict['perceptual_threshold'] == 85.0
+        assert config_dict['metadata_fields'] == ['file_size', 'modified_at']
+        assert config_dict['min_confidence_threshold'] == 70.0
+        assert 'perceptual_hash_size' in config_dict
+        assert 'enable_cross_algorithm_validation' in config_dict
+
+
+class TestDuplicateDetectionServiceStorage:
+    """Test the persistence-layer methods against the detection database."""
+    
+    @pytest.fixture(autouse=True)
+    def _setup(self, detection_db, db_pool):
+        """Setup test fixtures."""
+        # Database with the detection tables (schema built once per session)
+        self.temp_db_path = detection_db
+        self.db_pool = db_pool
+        
+        # Mock session that points the service at the detection database
+        self.mock_db_session = Mock()
         self.mock_db_session.get_bind.return_value.url.database = self.temp_db_path
         
+        self.service = DuplicateDetectionService(self.mock_db_session)
+    
+    def test_store_detection_results(self):
+        """Test storing detection results in database."""
         # Create test results
         file1 = DuplicateFile(1, "/test/file1.jpg", "file1.jpg", 1000)
         file2 = DuplicateFile(2, "/test/file2.jpg", "file2.jpg", 1000)
@@ -304,7 +177,7 @@ class TestDuplicateDetectionService:
         self.service._store_detection_results(results)
         
         # Verify storage
-        with sqlite3.connect(self.temp_db_path) as conn:
+        with self.db_pool.checkout(self.temp_db_path) as conn:
             cursor = conn.execute("SELECT session_id FROM detection_results")
             assert cursor.fetchone()[0] == "test_session"
             
@@ -313,14 +186,20 @@ class TestDuplicateDetectionService:
             
             cursor = conn.execute("SELECT group_hash FROM duplicate_groups")
             assert cursor.fetchone()[0] == "test_group"
+            
+            # Each group file is linked to the stored group's row id
+            cursor = conn.execute("""
+                SELECT df.file_id FROM duplicate_files df
+                JOIN duplicate_groups dg ON df.group_id = dg.id
+                WHERE dg.group_hash = 'test_group'
+                ORDER BY df.file_id
+            """)
+            assert [row[0] for row in cursor.fetchall()] == [1, 2]
     
     def test_get_detection_results(self):
         """Test retrieving detection results by session ID."""
-        # Override database path for testing
-        self.mock_db_session.get_bind.return_value.url.database = self.temp_db_path
-        
         # Insert test data
-        with sqlite3.connect(self.temp_db_path) as conn:
+        with self.db_pool.checkout(self.temp_db_path) as conn:
             conn.execute("""
                 INSERT INTO detection_results (
                     session_id, detection_mode, total_files_scanned,
@@ -359,33 +238,24 @@ class TestDuplicateDetectionService:
     
     def test_get_detection_results_not_found(self):
         """Test retrieving non-existent detection results."""
-        self.mock_db_session.get_bind.return_value.url.database = self.temp_db_path
-        
         results = self.service.get_detection_results("nonexistent_session")
         
         assert results is None
     
     def test_list_detection_sessions(self):
         """Test listing detection sessions."""
-        self.mock_db_session.get_bind.return_value.url.database = self.temp_db_path
-        
         # Insert test sessions
-        with sqlite3.connect(self.temp_db_path) as conn:
-            conn.execute("""
+        with self.db_pool.checkout(self.temp_db_path) as conn:
+            conn.executemany("""
                 INSERT INTO detection_results (
                     session_id, detection_mode, total_files_scanned,
                     total_groups_found, total_duplicates_found, detection_time_ms,
                     success_rate
                 ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, ("session1", "exact", 10, 2, 5, 1000, 95.0))
-            
-            conn.execute("""
-                INSERT INTO detection_results (
-                    session_id, detection_mode, total_files_scanned,
-                    total_groups_found, total_duplicates_found, detection_time_ms,
-                    success_rate
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            """, ("session2", "similar", 20, 3, 8, 2000, 90.0))
+            """, [
+                ("session1", "exact", 10, 2, 5, 1000, 95.0),
+                ("session2", "similar", 20, 3, 8, 2000, 90.0),
+            ])
             
             conn.commit()
         
@@ -397,10 +267,8 @@ class TestDuplicateDetectionService:
     
     def test_delete_detection_session(self):
         """Test deleting a detection session."""
-        self.mock_db_session.get_bind.return_value.url.database = self.temp_db_path
-        
         # Insert test data
-        with sqlite3.connect(self.temp_db_path) as conn:
+        with self.db_pool.checkout(self.temp_db_path) as conn:
             conn.execute("""
                 INSERT INTO detection_results (session_id, detection_mode, total_files_scanned)
                 VALUES ('test_session', 'exact', 10)
@@ -419,7 +287,7 @@ class TestDuplicateDetectionService:
         assert result is True
         
         # Verify deletion
-        with sqlite3.connect(self.temp_db_path) as conn:
+        with self.db_pool.checkout(self.temp_db_path) as conn:
             cursor = conn.execute("SELECT COUNT(*) FROM detection_results WHERE session_id = ?", ("test_session",))
             assert cursor.fetchone()[0] == 0
             
@@ -428,23 +296,17 @@ class TestDuplicateDetectionService:
     
     def test_get_detection_statistics(self):
         """Test getting detection statistics."""
-        self.mock_db_session.get_bind.return_value.url.database = self.temp_db_path
-        
         # Insert test data
-        with sqlite3.connect(self.temp_db_path) as conn:
-            conn.execute("""
-                INSERT INTO detection_results (
-                    session_id, detection_mode, total_files_scanned,
-                    total_groups_found, detection_time_ms, success_rate
-                ) VALUES ('session1', 'exact', 10, 2, 1000, 95.0)
-            """)
-            
-            conn.execute("""
+        with self.db_pool.checkout(self.temp_db_path) as conn:
+            conn.executemany("""
                 INSERT INTO detection_results (
                     session_id, detection_mode, total_files_scanned,
                     total_groups_found, detection_time_ms, success_rate
-                ) VALUES ('session2', 'similar', 20, 3, 2000, 90.0)
-            """)
+                ) VALUES (?, ?, ?, ?, ?, ?)
+            """, [
+                ('session1', 'exact', 10, 2, 1000, 95.0),
+                ('session2', 'similar', 20, 3, 2000, 90.0),
+            ])
             
             conn.execute("""
                 INSERT INTO algorithm_performance (
@@ -471,25 +333,134 @@ class TestDuplicateDetectionService:
         algo_perf = stats['algorithm_performance']
         assert 'SHA256Detector' in algo_perf
     
-    def test_config_to_dict(self):
-        """Test converting DetectionConfig to dictionary."""
-        config = DetectionConfig(
-            perceptual_threshold=85.0,
-            metadata_fields=['file_size', 'modified_at'],
-            min_confidence_threshold=70.0
+    @staticmethod
+    def _benchmark_results(session_id):
+        """Detection results with BENCHMARK_ROW_COUNT two-file groups."""
+        groups = [
+            DuplicateGroup(
+                id=f"{session_id}_group_{i}",
+                detection_method=DetectionMethod.SHA256,
+                confidence_score=100.0,
+                similarity_percentage=100.0,
+                files=[
+                    DuplicateFile(2 * i, f"/test/{i}_a.jpg", f"{i}_a.jpg", 1000, is_original=True),
+                    DuplicateFile(2 * i + 1, f"/test/{i}_b.jpg", f"{i}_b.jpg", 1000)
+                ]
+            )
+            for i in range(BENCHMARK_ROW_COUNT)
+        ]
+        return DetectionResults(
+            session_id=session_id,
+            detection_mode=DetectionMode.EXACT,
+            groups=groups,
+            total_files_scanned=2 * BENCHMARK_ROW_COUNT,
+            total_groups_found=BENCHMARK_ROW_COUNT,
+            total_duplicates_found=BENCHMARK_ROW_COUNT,
+            detection_time_ms=1000,
+            config=DetectionConfig(),
+            algorithm_performance={'SHA256Detector': {'files_processed': 2 * BENCHMARK_ROW_COUNT}}
         )
+    
+    def test_benchmark_store_detection_results(self, benchmark):
+        """Benchmark storing a large detection session."""
+        # session_id is unique, so every round stores freshly built results
+        session_ids = (f"benchmark_session_{n}" for n in itertools.count())
         
-        config_dict = self.service._config_to_dict(config)
+        def next_results():
+            return (self._benchmark_results(next(session_ids)),), {}
         
-        assert config_dict['perceptual_threshold'] == 85.0
-        assert config_dict['metadata_fields'] == ['file_size', 'modified_at']
-        assert config_dict['min_confidence_threshold'] == 70.0
-        assert 'perceptual_hash_size' in config_dict
-        assert 'enable_cross_algorithm_validation' in config_dict
+        benchmark.pedantic(
+            self.service._store_detection_results, setup=next_results, rounds=5, warmup_rounds=1
+        )
+        
+        # Storage errors are only logged, so check that every round was written
+        with self.db_pool.checkout(self.temp_db_path) as conn:
+            cursor = conn.execute("SELECT COUNT(*) FROM duplicate_groups")
+            assert cursor.fetchone()[0] == 6 * BENCHMARK_ROW_COUNT
+    
+    def test_benchmark_get_detection_statistics(self, benchmark):
+        """Benchmark statistics over many stored sessions."""
+        with self.db_pool.checkout(self.temp_db_path) as conn:
+            conn.executemany("""
+                INSERT INTO detection_results (
+                    session_id, detection_mode, total_files_scanned,
+                    total_groups_found, detection_time_ms, success_rate
+                ) VALUES (?, ?, ?, ?, ?, ?)
+            """, [
+                (f"session{i}", ('exact', 'similar')[i % 2], 10, 2, 1000, 95.0)
+                for i in range(BENCHMARK_ROW_COUNT)
+            ])
+            
+            conn.executemany("""
+                INSERT INTO algorithm_performance (
+                    session_id, algorithm_name, files_per_second, error_rate
+                ) VALUES (?, ?, ?, ?)
+            """, [
+                (f"session{i}", 'SHA256Detector', 10.0, 5.0)
+                for i in range(BENCHMARK_ROW_COUNT)
+            ])
+            
+            conn.commit()
+        
+        stats = benchmark.pedantic(
+            self.service.get_detection_statistics, rounds=5, iterations=3, warmup_rounds=1
+        )
+        
+        assert stats['session_statistics']['total_sessions'] == BENCHMARK_ROW_COUNT
+
+
+class TestDuplicateDetectionServiceModes:
+    """Test the detect_duplicates_* entry points against one class-wide engine patch."""
+    
+    @pytest.fixture(scope="class")
+    def engine_class_patch(self):
+        """Patch DuplicateDetectionEngine once for every test in the class."""
+        with patch('backend.app.services.duplicate_detection_service.DuplicateDetectionEngine') as mock_engine_class:
+            yield mock_engine_class
     
-    def _setup_mock_files(self):
-        """Setup mock files for testing."""
+    @pytest.fixture(scope="class")
+    def empty_file_query(self):
+        """Query mock whose filter chain returns no files, built once for the class."""
         mock_query = Mock()
         mock_query.filter.return_value = mock_query
         mock_query.all.return_value = []
-        self.mock_db_session.query.return_value = mock_query
\ No newline at end of file
+        return mock_query
+    
+    @pytest.fixture(autouse=True)
+    def _setup(self, engine_class_patch, empty_file_query):
+        """Setup test fixtures."""
+        engine_class_patch.reset_mock()
+        self._mock_engine_class = engine_class_patch
+        
+        self.mock_db_session = Mock()
+        self.mock_db_session.get_bind.return_value.url.database = ":memory:"
+        self.mock_db_session.query.return_value = empty_file_query
+        
+        self.service = DuplicateDetectionService(self.mock_db_session)
+    
+    @pytest.mark.parametrize("method_name,mode,kwargs", [
+        ("detect_duplicates_exact", DetectionMode.EXACT, {}),
+        ("detect_duplicates_similar", DetectionMode.SIMILAR, {"similarity_threshold": 85.0}),
+        ("detect_duplicates_comprehensive", DetectionMode.COMPREHENSIVE,
+         {"config": DetectionConfig(min_confidence_threshold=70.0)}),
+        ("detect_duplicates_metadata", DetectionMode.METADATA,
+         {"metadata_fields": ['file_size', 'width', 'height']}),
+    ])
+    def test_detect_duplicates(self, method_name, mode, kwargs):
+        """Test each detection mode runs the engine and stores its results."""
+        # Setup mock engine
+        mock_engine = Mock()
+        mock_results = object()
+        mock_engine.detect_duplicates.return_value = mock_results
+        self._mock_engine_class.return_value = mock_engine
+        
+        # Mock storage method
+        self.service._store_detection_results = Mock()
+        
+        results = getattr(self.service, method_name)(**kwargs)
+        
+        assert results == mock_results
+        mock_engine.detect_duplicates.assert_called_once()
+        args, _ = mock_engine.detect_duplicates.call_args
+        assert args[1] == mode  # Detection mode
+        self.service._store_detection_results.assert_called_once_with(mock_results)
@@ -5,16 +5,12 @@ Tests Requirements: 1.4, 3.1, 3.2, 3.3, 4.4
 
 import pytest
 import os
-import sys
 import tempfile
 import sqlite3
 import shutil
 from unittest.mock import patch, MagicMock
 from pathlib import Path
 
-# Add the scripts directory to the path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
-
 from scan_folder import FileScanner
 
 
@@ -5,15 +5,13 @@ Tests Requirements: 1.1, 1.2, 4.1, 4.2, 4.3, 4.4
 
 import pytest
 import os
-import sys
 import tempfile
 import json
+import hashlib
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 from PIL import Image
 
-# Add the scripts directory to the path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
-
 from scan_folder import FileScanner
 
 
@@ -138,6 +136,79 @@ class TestHashComputation:
         
         assert sha256 != ""
         assert len(sha256) == 64
+    
+    def test_compute_sha256_multi_chunk_file(self, tmp_path):
+        """Test SHA256 computation for a file spanning several read chunks."""
+        scanner = FileScanner(':memory:')
+        
+        content = os.urandom(2 * 1024 * 1024 + 123)  # Two full 1 MiB chunks plus a partial one
+        multi_chunk_file = tmp_path / 'multi_chunk.bin'
+        multi_chunk_file.write_bytes(content)
+        
+        assert scanner.compute_sha256(str(multi_chunk_file)) == hashlib.sha256(content).hexdigest()
+        # The read buffer is reused across calls
+        assert scanner.compute_sha256(str(multi_chunk_file)) == hashlib.sha256(content).hexdigest()
+    
+    def test_compute_sha256_memory_mapped(self, tmp_path, monkeypatch):
+        """Test large files hashed through mmap match streamed hashing, with a read fallback."""
+        import mmap
+        import scan_folder
+        monkeypatch.setattr(scan_folder, 'MMAP_MIN_SIZE', 1024)
+        scanner = FileScanner(':memory:')
+        
+        content = os.urandom(64 * 1024)
+        mapped_file = tmp_path / 'mapped.bin'
+        mapped_file.write_bytes(content)
+        expected = hashlib.sha256(content).hexdigest()
+        
+        assert scanner.compute_sha256(str(mapped_file)) == expected
+        
+        # Filesystems that refuse mmap fall back to buffered reads
+        with patch.object(mmap, 'mmap', side_effect=OSError("mmap not supported")):
+            assert scanner.compute_sha256(str(mapped_file)) == expected
+    
+    @pytest.mark.skipif(not hasattr(hashlib, 'file_digest'), reason="hashlib.file_digest requires Python 3.11")
+    def test_compute_sha256_matches_file_digest(self, tmp_path):
+        """Test the reusable-buffer hash loop agrees with hashlib.file_digest around chunk boundaries."""
+        import scan_folder
+        scanner = FileScanner(':memory:')
+        
+        for size in (0, 1, scan_folder.HASH_CHUNK_SIZE - 1, scan_folder.HASH_CHUNK_SIZE, scan_folder.HASH_CHUNK_SIZE + 1):
+            test_file = tmp_path / f'chunk_{size}.bin'
+            test_file.write_bytes(os.urandom(size))
+            with open(test_file, 'rb') as f:
+                expected = hashlib.file_digest(f, 'sha256').hexdigest()
+            assert scanner.compute_sha256(str(test_file)) == expected
+    
+    def test_compute_blake3_without_update_mmap(self, tmp_path, monkeypatch):
+        """Test blake3 releases without update_mmap fall back to chunked update() reads."""
+        import scan_folder
+        if scan_folder.blake3 is None:
+            pytest.skip("blake3 is not installed")
+        real_blake3 = scan_folder.blake3
+        
+        class LegacyBlake3:
+            """blake3 < 0.4 hasher: update() and hexdigest() only."""
+            AUTO = real_blake3.blake3.AUTO
+            
+            def __init__(self, max_threads=1):
+                self._hasher = real_blake3.blake3(max_threads=max_threads)
+            
+            def update(self, data):
+                self._hasher.update(data)
+                return self
+            
+            def hexdigest(self):
+                return self._hasher.hexdigest()
+        
+        monkeypatch.setattr(scan_folder, 'blake3', SimpleNamespace(blake3=LegacyBlake3))
+        scanner = FileScanner(':memory:', hash_algo='blake3')
+        
+        content = os.urandom(scan_folder.HASH_CHUNK_SIZE + 123)
+        large_file = tmp_path / 'large.bin'
+        large_file.write_bytes(content)
+        
+        assert scanner.compute_blake3(str(large_file)) == real_blake3.blake3(content).hexdigest()
 
 
 class TestPerceptualHashing:
@@ -173,6 +244,22 @@ class TestPerceptualHashing:
         assert hash2 is not None
         # Similar images should have similar hashes (but may not be identical)
     
+    def test_compute_perceptual_hash_matches_imagehash(self, test_images_dir):
+        """Test the NumPy average hash reproduces imagehash output so stored hashes stay comparable."""
+        scanner = FileScanner(':memory:')
+        
+        if not scanner._is_dependency_available('imagehash') or not scanner._is_dependency_available('numpy'):
+            pytest.skip("imagehash or numpy not available")
+        
+        import imagehash
+        
+        for name in ['test_image_100x100.png', 'test_image_200x150.jpg', 'grayscale.png']:
+            image_file = os.path.join(test_images_dir, name)
+            with Image.open(image_file) as img:
+                expected = str(imagehash.average_hash(img.convert('RGB'), hash_size=16))
+            
+            assert scanner.compute_perceptual_hash(image_file) == expected
+    
     def test_compute_perceptual_hash_corrupted_image(self, test_images_dir):
         """Test perceptual hash computation for corrupted image."""
         scanner = FileScanner(':memory:')
@@ -201,6 +288,124 @@ class TestPerceptualHashing:
             assert phash is None
 
 
+class TestImageSimilarity:
+    """Test perceptual hash similarity grouping."""
+    
+    def _insert_hashes(self, scanner, hashes):
+        for i, phash in enumerate(hashes):
+            scanner.cursor.execute(
+                "INSERT INTO files (file_path, file_name, file_type, perceptual_hash) VALUES (?, ?, ?, ?)",
+                (f'/images/img{i}.png', f'img{i}.png', '.png', phash)
+            )
+        scanner.conn.commit()
+    
+    def test_find_similar_images_vectorized_matches_pairwise(self, temp_db):
+        """Test the NumPy Hamming path groups images exactly like the pairwise path."""
+        scanner = FileScanner(temp_db)
+        scanner.connect_db()
+        
+        if not scanner._is_dependency_available('imagehash') or not scanner._is_dependency_available('numpy'):
+            pytest.skip("imagehash and numpy required")
+        
+        base = int('f0' * 32, 16)
+        hashes = [
+            f'{base:064x}',
+            f'{base ^ 0b1:064x}',           # 1 bit away
+            f'{base ^ (2 ** 40 - 1):064x}',  # 40 bits away
+            f'{~base & (2 ** 256 - 1):064x}',  # every bit flipped
+            f'{base ^ (2 ** 60 - 1):064x}',  # 60 bits away
+        ]
+        self._insert_hashes(scanner, hashes)
+        
+        image_files = scanner.cursor.execute(
+            "SELECT id, file_path, file_name, perceptual_hash FROM files ORDER BY id"
+        ).fetchall()
+        
+        for threshold in (80.0, 90.0, 99.0):
+            vectorized = scanner.find_similar_images(threshold)
+            pairwise = scanner._find_similar_images_pairwise(image_files, threshold)
+            assert vectorized == pairwise
+        
+        assert len(scanner.find_similar_images(80.0)[0]['images']) == 3
+        scanner.conn.close()
+    
+    def test_find_similar_images_bktree_matches_pairwise(self, temp_db):
+        """Test the BK-tree path groups images exactly like the pairwise path."""
+        scanner = FileScanner(temp_db)
+        scanner.connect_db()
+        
+        if not scanner._is_dependency_available('imagehash') or not scanner._is_dependency_available('pybktree'):
+            pytest.skip("imagehash and pybktree required")
+        
+        base = int('f0' * 32, 16)
+        self._insert_hashes(scanner, [
+            f'{base:064x}',
+            f'{base ^ 0b1:064x}',
+            f'{base ^ (2 ** 40 - 1):064x}',
+            f'{~base & (2 ** 256 - 1):064x}',
+            f'{base ^ (2 ** 60 - 1):064x}',
+        ])
+        
+        image_files = scanner.cursor.execute(
+            "SELECT id, file_path, file_name, perceptual_hash FROM files ORDER BY id"
+        ).fetchall()
+        
+        for threshold in (80.0, 90.0, 99.0):
+            bktree = scanner._find_similar_images_bktree(image_files, threshold)
+            pairwise = scanner._find_similar_images_pairwise(image_files, threshold)
+            assert bktree == pairwise
+        
+        # The tree is reused until a new file is inserted
+        tree = scanner._get_phash_tree(image_files)
+        assert scanner._get_phash_tree(image_files) is tree
+        scanner.insert_file({'file_path': '/images/new.png', 'file_name': 'new.png'})
+        assert scanner._phash_tree is None
+        scanner.conn.close()
+    
+    def test_find_similar_images_binary_hashes(self, temp_db):
+        """Test binary perceptual hashes are backfilled on connect, written on insert and used for grouping."""
+        scanner = FileScanner(temp_db)
+        scanner.connect_db()
+        
+        if not scanner._is_dependency_available('imagehash') or not scanner._is_dependency_available('numpy'):
+            pytest.skip("imagehash and numpy required")
+        
+        base = int('f0' * 32, 16)
+        self._insert_hashes(scanner, [f'{base:064x}', f'{base ^ 0b1:064x}'])
+        scanner.conn.close()
+        
+        # Rows written without the binary copy are backfilled when the next scanner connects
+        scanner = FileScanner(temp_db)
+        scanner.connect_db()
+        scanner.insert_file({'file_path': '/images/new.png', 'file_name': 'new.png', 'file_type': '.png',
+                             'perceptual_hash': f'{base ^ (2 ** 40 - 1):064x}'})
+        
+        rows = scanner.cursor.execute(
+            "SELECT id, file_path, file_name, perceptual_hash, perceptual_hash_bits FROM files ORDER BY id"
+        ).fetchall()
+        assert all(bytes(row[4]) == bytes.fromhex(row[3]) for row in rows)
+        
+        image_files = [row[:4] for row in rows]
+        pairwise = scanner._find_similar_images_pairwise(image_files, 80.0)
+        assert scanner.find_similar_images(80.0) == pairwise
+        scanner.conn.close()
+    
+    def test_find_similar_images_mixed_hash_lengths(self, temp_db):
+        """Test hashes of different lengths fall back to the pairwise comparison."""
+        scanner = FileScanner(temp_db)
+        scanner.connect_db()
+        
+        if not scanner._is_dependency_available('imagehash'):
+            pytest.skip("imagehash not available")
+        
+        self._insert_hashes(scanner, ['ff00ff00ff00ff00', 'ff00ff00ff00ff01', 'f0' * 32])
+        
+        groups = scanner.find_similar_images(90.0)
+        assert len(groups) == 1
+        assert len(groups[0]['images']) == 2
+        scanner.conn.close()
+
+
 class TestImageProcessing:
     """Test image-specific processing functionality."""
     
@@ -329,6 +534,19 @@ class TestFileTypeHandling:
         assert isinstance(result, bool)
         
         scanner.conn.close()
+    
+    def test_file_extension_matches_pathlib(self):
+        """Test the extension helper agrees with Path.suffix, including dotfiles and dotted folders."""
+        from pathlib import Path
+        from scan_folder import _file_extension
+        scanner = FileScanner(':memory:')
+        
+        for path in ('/a/photo.JPG', '/a/archive.tar.gz', '/a/.hidden', '/a.b/README',
+                     '/a/trailing.', '/a/..double', 'relative/name.Png', ''):
+            assert _file_extension(path) == Path(path).suffix.lower()
+        
+        assert scanner._is_image_file('.PNG') is True
+        assert scanner._is_image_file('.txt') is False
 
 
 class TestErrorHandling:
@@ -5,16 +5,12 @@ Tests Requirements: 4.1, 4.2, 4.3, 4.4
 
 import pytest
 import os
-import sys
 import tempfile
 import shutil
 import json
 from pathlib import Path
 from PIL import Image
 
-# Add the scripts directory to the path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
-
 from scan_folder import FileScanner
 
 
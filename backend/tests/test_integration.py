@@ -5,14 +5,12 @@ Tests Requirements: 1.1, 1.3, 1.4, 3.1, 3.2, 3.3
 
 import pytest
 import os
-import sys
+import hashlib
 import tempfile
 import sqlite3
 import shutil
 from pathlib import Path
-
-# Add the scripts directory to the path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
+from unittest.mock import patch
 
 from scan_folder import FileScanner
 
@@ -121,6 +119,211 @@ class TestEndToEndScanning:
         
         scanner.conn.close()
     
+    def test_duplicate_count_during_scan(self, test_files_dir, temp_db):
+        """Test duplicates are counted from the in-memory hash index, including on rescans."""
+        scanner = FileScanner(temp_db)
+        scanner.connect_db()
+        
+        scanner.scan_folder(test_files_dir)
+        
+        # duplicate1.txt and duplicate2.txt share content
+        assert scanner.stats['duplicates_found'] == 1
+        
+        # A second scanner sees every file already stored in the database
+        rescanner = FileScanner(temp_db)
+        rescanner.connect_db()
+        rescanner.scan_folder(test_files_dir)
+        
+        assert rescanner.stats['duplicates_found'] == rescanner.stats['processed_files']
+        
+        scanner.conn.close()
+        rescanner.conn.close()
+    
+    def test_scan_batches_inserts(self, test_files_dir, temp_db, monkeypatch):
+        """Test scan rows are written in batches and flushed when the scan ends."""
+        import scan_folder
+        monkeypatch.setattr(scan_folder, 'INSERT_BATCH_SIZE', 2)
+        
+        scanner = FileScanner(temp_db)
+        scanner.connect_db()
+        
+        batch_sizes = []
+        original_flush = scanner._flush_pending_inserts
+        
+        def recording_flush():
+            batch_sizes.append(len(scanner._pending or []))
+            original_flush()
+        
+        scanner._flush_pending_inserts = recording_flush
+        scanner.scan_folder(test_files_dir)
+        
+        assert sum(batch_sizes) == scanner.stats['processed_files']
+        assert max(batch_sizes) <= 2
+        assert scanner._pending is None
+        
+        scanner.cursor.execute("SELECT COUNT(*) FROM files")
+        assert scanner.cursor.fetchone()[0] == scanner.stats['processed_files']
+        
+        scanner.conn.close()
+    
+    @pytest.mark.parametrize("quick_hash", [False, True])
+    def test_failed_batch_row_leaves_duplicate_index(self, temp_db, tmp_path, monkeypatch, quick_hash):
+        """Test a queued row that fails to write is not matched by later copies of the file."""
+        import scan_folder
+        monkeypatch.setattr(scan_folder, 'INSERT_BATCH_SIZE', 1)
+        
+        scanner = FileScanner(temp_db, quick_hash=quick_hash)
+        scanner.connect_db()
+        scanner.cursor.execute("""
+            CREATE TRIGGER reject_bad BEFORE INSERT ON files WHEN NEW.file_name = 'bad.bin'
+            BEGIN SELECT RAISE(ABORT, 'rejected'); END
+        """)
+        
+        # Queue rows as scan_folder does, flushing after every file
+        scanner._pending = []
+        for name in ('bad.bin', 'copy.bin'):
+            file_path = tmp_path / name
+            file_path.write_bytes(b'x' * 5000)
+            scanner._process_file(str(file_path))
+        scanner._flush_pending_inserts()
+        scanner._pending = None
+        
+        rows = scanner.cursor.execute("SELECT file_name, sha256 FROM files").fetchall()
+        assert [name for name, _ in rows] == ['copy.bin']
+        # With --quick-hash the copy has no stored match left and stays unhashed
+        assert (rows[0][1] is None) == quick_hash
+        assert scanner.stats['duplicates_found'] == 0
+        assert scanner.stats['processed_files'] == 1
+        
+        scanner.conn.close()
+    
+    def test_images_hashed_from_single_read(self, test_images_dir, temp_db):
+        """Test images are hashed from one buffered read with the same results as the streaming path."""
+        scanner = FileScanner(temp_db)
+        scanner.connect_db()
+        
+        if not scanner._is_dependency_available('Image'):
+            pytest.skip("PIL not available")
+        
+        with patch.object(scanner, 'compute_sha256', wraps=scanner.compute_sha256) as streamed:
+            scanner.scan_folder(test_images_dir)
+        
+        # Only the non-image files went through the streaming hash
+        streamed_files = {os.path.basename(call.args[0]) for call in streamed.call_args_list}
+        assert 'test_image_100x100.png' not in streamed_files
+        
+        image_file = os.path.join(test_images_dir, 'test_image_100x100.png')
+        scanner.cursor.execute("SELECT sha256, perceptual_hash, width FROM files WHERE file_path = ?", (image_file,))
+        sha256, perceptual_hash, width = scanner.cursor.fetchone()
+        assert sha256 == scanner.compute_sha256(image_file)
+        assert perceptual_hash == scanner.compute_perceptual_hash(image_file)
+        assert width == 100
+        
+        scanner.conn.close()
+    
+    def test_scan_reuses_directory_entries(self, test_files_dir, temp_db):
+        """Test the scan walks in os.walk order and takes file sizes from the cached directory entries."""
+        scanner = FileScanner(temp_db)
+        scanner.connect_db()
+        
+        walked = [os.path.join(root, name) for root, _, files in os.walk(test_files_dir) for name in files]
+        assert [entry.path for entry in scanner._iter_file_entries(test_files_dir, True)] == walked
+        
+        with patch('os.path.getsize', side_effect=AssertionError("size looked up again")), \
+             patch('os.path.isfile', side_effect=AssertionError("file type looked up again")):
+            scanner.scan_folder(test_files_dir)
+        
+        assert scanner.stats['errors'] == 0
+        assert scanner.stats['processed_files'] > 0
+        
+        scanner.conn.close()
+    
+    def test_scan_blake3_large_files(self, temp_db, tmp_path, monkeypatch):
+        """Test large files are hashed with BLAKE3 when selected and only match digests of the same algorithm."""
+        import scan_folder
+        if not scan_folder.FileScanner(':memory:')._is_dependency_available('blake3'):
+            pytest.skip("blake3 not installed")
+        monkeypatch.setattr(scan_folder, 'BLAKE3_MIN_SIZE', 1024)
+        
+        content = os.urandom(4096)
+        (tmp_path / 'large.bin').write_bytes(content)
+        
+        scanner = FileScanner(temp_db)
+        scanner.connect_db()
+        scanner.scan_folder(str(tmp_path))
+        
+        # The same content hashed by a BLAKE3 scan is not a duplicate of the SHA256 row
+        copy_dir = tmp_path / 'copies'
+        copy_dir.mkdir()
+        (copy_dir / 'copy.bin').write_bytes(content)
+        blake3_scanner = FileScanner(temp_db, hash_algo='blake3')
+        blake3_scanner.connect_db()
+        blake3_scanner.scan_folder(str(copy_dir))
+        
+        rows = dict(blake3_scanner.cursor.execute("SELECT file_name, hash_algo FROM files").fetchall())
+        assert rows == {'large.bin': 'sha256', 'copy.bin': 'blake3'}
+        digest = blake3_scanner.cursor.execute(
+            "SELECT sha256 FROM files WHERE file_name = 'copy.bin'"
+        ).fetchone()[0]
+        assert digest == scan_folder.blake3.blake3(content).hexdigest()
+        assert blake3_scanner.stats['duplicates_found'] == 0
+        assert blake3_scanner.find_duplicates() == []
+        
+        scanner.conn.close()
+        blake3_scanner.conn.close()
+    
+    def test_quick_hash_skips_unique_files(self, temp_db, tmp_path):
+        """Test --quick-hash only fully hashes files whose size and leading bytes match another file."""
+        contents = {
+            'unique.bin': b'u' * 5000,
+            'same_size.bin': b'v' * 5000,
+            'original.bin': b'w' * 6000,
+        }
+        for name, content in contents.items():
+            (tmp_path / name).write_bytes(content)
+        
+        scanner = FileScanner(temp_db, quick_hash=True)
+        scanner.connect_db()
+        scanner.scan_folder(str(tmp_path))
+        
+        rows = dict(scanner.cursor.execute("SELECT file_name, sha256 FROM files").fetchall())
+        assert rows == {'unique.bin': None, 'same_size.bin': None, 'original.bin': None}
+        
+        # A later copy hashes itself and the stored file it matches
+        (tmp_path / 'copy.bin').write_bytes(contents['original.bin'])
+        rescanner = FileScanner(temp_db, quick_hash=True)
+        rescanner.connect_db()
+        rescanner.scan_folder(str(tmp_path))
+        
+        rows = dict(rescanner.cursor.execute("SELECT file_name, sha256 FROM files").fetchall())
+        expected = hashlib.sha256(contents['original.bin']).hexdigest()
+        assert rows == {'unique.bin': None, 'same_size.bin': None, 'original.bin': expected, 'copy.bin': expected}
+        duplicates = rescanner.find_duplicates()
+        assert [group['sha256'] for group in duplicates] == [expected]
+        
+        scanner.conn.close()
+        rescanner.conn.close()
+    
+    def test_quick_hash_hashes_deferred_file_of_hashed_size(self, temp_db, tmp_path):
+        """Test a deferred file is still hashed when another pair already hashed its size."""
+        # Same size, different leading bytes: b.bin is deferred, then c.bin hashes the size via a.bin
+        contents = {'a.bin': b'a' * 5000, 'b.bin': b'b' * 5000, 'c.bin': b'a' * 5000, 'd.bin': b'b' * 5000}
+        scanner = FileScanner(temp_db, quick_hash=True)
+        scanner.connect_db()
+        for name, content in contents.items():
+            file_path = tmp_path / name
+            file_path.write_bytes(content)
+            scanner._process_file(str(file_path))
+        
+        rows = dict(scanner.cursor.execute("SELECT file_name, sha256 FROM files").fetchall())
+        digest_a = hashlib.sha256(contents['a.bin']).hexdigest()
+        digest_b = hashlib.sha256(contents['b.bin']).hexdigest()
+        assert rows == {'a.bin': digest_a, 'b.bin': digest_b, 'c.bin': digest_a, 'd.bin': digest_b}
+        duplicates = scanner.find_duplicates()
+        assert sorted(group['sha256'] for group in duplicates) == sorted([digest_a, digest_b])
+        
+        scanner.conn.close()
+    
     def test_similarity_detection(self, test_images_dir, temp_db):
         """Test image similarity detection."""
         scanner = FileScanner(temp_db)
@@ -191,6 +394,24 @@ class TestScannerStatistics:
         for stat in expected_stats:
             assert stat in scanner.stats
     
+    def test_statistics_slots_dictionary_access(self, temp_db):
+        """Test the slot-based counters stay readable and writable by key."""
+        scanner = FileScanner(temp_db)
+        
+        scanner.stats.processed_files += 2
+        scanner.stats['errors'] += 1
+        assert scanner.stats['processed_files'] == 2
+        assert scanner.stats.errors == 1
+        
+        with pytest.raises(KeyError):
+            scanner.stats['unknown_counter']
+        with pytest.raises(AttributeError):
+            scanner.stats.unknown_counter = 1
+        
+        report = scanner.get_statistics_report()
+        assert isinstance(report, dict)
+        assert report['processed_files'] == 2
+    
     def test_statistics_tracking(self, test_files_dir, temp_db):
         """Test that statistics are properly tracked during scanning."""
         scanner = FileScanner(temp_db)
@@ -12,9 +12,6 @@ from pathlib import Path
 from datetime import datetime
 import pytest
 
-# Add backend to path for imports
-sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
-
 from scripts.scan_folder import FileScanner
 from app.core.detection import DetectionMode, DetectionConfig
 
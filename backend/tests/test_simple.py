@@ -3,11 +3,6 @@ Simple test to verify test suite setup.
 """
 
 import pytest
-import os
-import sys
-
-# Add the scripts directory to the path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
 
 from scan_folder import FileScanner
 